@@ -0,0 +1,214 @@
+"""
+Async versions of the JSON endpoints in `views.py`, served under `/api/async/`.
+
+They run on the event loop when the app is served over ASGI, so a worker
+can hold many slow clients at once. Streaming and upload endpoints stay
+sync-only in `views.py`.
+"""
+
+from ninja import Query
+from ninja.pagination import paginate
+from ninja_extra import Router
+
+from .bearer import AsyncJWTBearer
+from .conditional import conditional, project_version, task_version, user_version
+from .data_types import HttpRequest
+from .dtos import (
+    AnnotationResponseSchema,
+    CreateAnnotationSchema,
+    CreateTaskSchema,
+    DashboardMetricsSchema,
+    JobSchema,
+    LabelCountSchema,
+    Paginator,
+    ProjectDetailFilter,
+    ProjectDetailSchema,
+    ProjectOutSchema,
+    ProjectSchema,
+    RegionFilterSchema,
+    TaskResponseSchema,
+    UpdateAnnotationSchema,
+    UpdateProjectSchema,
+    UpdateTaskSchema,
+)
+from .response_cache import cached_response, project_scope, user_scope
+from .usecases import (
+    CreateAnnotationUseCase,
+    CreateProjectUseCase,
+    CreateTaskUseCase,
+    DashboardMetricsUseCase,
+    DeleteAnnotationUseCase,
+    DeleteProjectUseCase,
+    DeleteTaskUseCase,
+    GetProjectUseCase,
+    LabelStatisticsUseCase,
+    ListAnnotationsInRegionUseCase,
+    ListAnnotationsUseCase,
+    ListProjectsUseCase,
+    ListTasksUseCase,
+    UpdateAnnotationUseCase,
+    UpdateProjectUseCase,
+    UpdateTaskUseCase,
+)
+
+router = Router(
+    auth=AsyncJWTBearer(),
+    tags=["annotations (async)"],
+)
+
+
+@router.post("/projects/", response={201: ProjectOutSchema})
+async def create_project(request: HttpRequest, data: ProjectSchema):
+    project = await CreateProjectUseCase(data=data, user=request.user).aexecute()
+    return project
+
+
+@router.get("/projects/", response=list[ProjectOutSchema])
+@conditional(user_version)
+@cached_response("list_projects", user_scope)
+@paginate(Paginator)
+async def list_projects(request: HttpRequest):
+    return ListProjectsUseCase(user=request.user).execute()
+
+
+@router.put("/projects/{project_id}/", response=ProjectOutSchema)
+async def update_project(
+    request: HttpRequest, project_id: int, payload: UpdateProjectSchema
+):
+    use_case = UpdateProjectUseCase(
+        project_id=project_id,
+        data=payload,
+        user=request.user,
+    )
+    project = await use_case.aexecute()
+    return project
+
+
+@router.get("/projects/{project_id}/", response=ProjectDetailSchema)
+@conditional(project_version)
+@cached_response("get_project", project_scope)
+async def get_project(
+    request: HttpRequest, project_id: int, filters: Query[ProjectDetailFilter]
+):
+    use_case = GetProjectUseCase(
+        project_id=project_id,
+        user=request.user,
+        expand=filters.expand_set,
+        page_size=filters.page_size,
+    )
+    project = await use_case.aexecute()
+    return project
+
+
+@router.delete("/projects/{project_id}/", response={202: JobSchema, 204: None})
+async def delete_project(request, project_id: int, background: bool = False):
+    """
+    Delete a project. With `background` it disappears at once and the
+    returned job purges its tasks and annotations.
+    """
+    use_case = DeleteProjectUseCase(
+        project_id=project_id,
+        user=request.user,
+        background=background,
+    )
+    job = await use_case.aexecute()
+    if job is not None:
+        return 202, job
+    return 204, None
+
+
+@router.get("/list-tasks/{project_id}", response=list[TaskResponseSchema])
+@conditional(project_version)
+@cached_response("list_tasks", project_scope)
+@paginate(Paginator)
+async def list_tasks(request: HttpRequest, project_id: int):
+    use_case = ListTasksUseCase(project_id=project_id)
+    return use_case.execute()
+
+
+@router.put("/update-task/{task_id}/", response=TaskResponseSchema)
+async def update_task(request, task_id: int, payload: UpdateTaskSchema):
+    use_case = UpdateTaskUseCase(task_id=task_id, url=payload.url)
+    task = await use_case.aexecute()
+    return task
+
+
+@router.delete("/delete-task/{task_id}/", response={204: None})
+async def delete_task(request, task_id: int):
+    use_case = DeleteTaskUseCase(task_id=task_id)
+    await use_case.aexecute()
+    return 204, None
+
+
+@router.post("/create-task/", response=TaskResponseSchema)
+async def create_task(request: HttpRequest, payload: CreateTaskSchema):
+    use_case = CreateTaskUseCase(project_id=payload.project_id, url=payload.url)
+    task = await use_case.aexecute()
+    return task
+
+
+@router.get("/list-annotations/{task_id}/", response=list[AnnotationResponseSchema])
+@conditional(task_version)
+@paginate(Paginator)
+async def list_annotations(request: HttpRequest, task_id: int):
+    use_case = ListAnnotationsUseCase(task_id=task_id)
+    return use_case.execute()
+
+
+@router.get("/annotations/region/", response=list[AnnotationResponseSchema])
+@paginate(Paginator)
+async def list_annotations_in_region(
+    request: HttpRequest, region: Query[RegionFilterSchema]
+):
+    use_case = ListAnnotationsInRegionUseCase(user=request.user, region=region)
+    return use_case.execute()
+
+
+@router.get("/label-stats/", response=list[LabelCountSchema])
+async def label_statistics(
+    request: HttpRequest,
+    project_id: int | None = None,
+    task_id: int | None = None,
+):
+    use_case = LabelStatisticsUseCase(
+        user=request.user,
+        project_id=project_id,
+        task_id=task_id,
+    )
+    return await use_case.aexecute()
+
+
+@router.put("/update-annotation/{annotation_id}/", response=AnnotationResponseSchema)
+async def update_annotation(
+    request, annotation_id: int, payload: UpdateAnnotationSchema
+):
+    use_case = UpdateAnnotationUseCase(
+        annotation_id=annotation_id,
+        data=payload,
+    )
+    annotation = await use_case.aexecute()
+    return annotation
+
+
+@router.delete("/delete-annotation/{annotation_id}/", response={204: None})
+async def delete_annotation(request, annotation_id: int):
+    use_case = DeleteAnnotationUseCase(annotation_id=annotation_id)
+    await use_case.aexecute()
+    return 204, None
+
+
+@router.post("/create-annotation/", response=AnnotationResponseSchema)
+async def create_annotation(request: HttpRequest, payload: CreateAnnotationSchema):
+    use_case = CreateAnnotationUseCase(
+        data=payload,
+    )
+    annotation = await use_case.aexecute()
+    return annotation
+
+
+@router.get("/metrics", response=DashboardMetricsSchema)
+@conditional(user_version)
+@cached_response("dashboard_metrics", user_scope)
+async def get_dashboard_metrics(request: HttpRequest):
+    use_case = DashboardMetricsUseCase(user=request.user)
+    return await use_case.aexecute()
@@ -1,11 +1,105 @@
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
 from ninja.security import HttpBearer
+from ninja_extra.security import AsyncHttpBearer
 from ninja_jwt.authentication import JWTAuth
+from ninja_jwt.settings import api_settings
+
+from .user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+# At most one failure log per reason in this many seconds; the rest are
+# counted and reported with the next one.
+FAILURE_LOG_INTERVAL = 60
+
+
+class CachedJWTAuth(JWTAuth):
+    """`JWTAuth` that resolves users through the authenticated-user cache."""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_cache is None or user_id is None:
+            return super().get_user(validated_token)
+
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        return user
+
+    async def aget_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = None
+        if user_cache is not None and user_id is not None:
+            user = await user_cache.aget(user_id)
+        if user is None:
+            # Misses are rare once the cache is warm; reuse the sync lookup
+            # and its error handling rather than duplicating it.
+            user = await sync_to_async(super().get_user)(validated_token)
+            if user_cache is not None and user_id is not None:
+                await user_cache.aset(user_id, user)
+        return user
+
+    async def ajwt_authenticate(self, request, token: str):
+        request.user = AnonymousUser()
+        validated_token = self.get_validated_token(token)
+        user = await self.aget_user(validated_token)
+        request.user = user
+        return user
+
+
+class FailureLog:
+    """Log authentication failures without flooding the logs."""
+
+    def __init__(self, interval: int):
+        self.interval = interval
+        self.last_logged: dict[str, float] = {}
+        self.suppressed: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def record(self, request, error: Exception) -> None:
+        reason = type(error).__name__
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_logged.get(reason, float("-inf")) < self.interval:
+                self.suppressed[reason] = self.suppressed.get(reason, 0) + 1
+                return
+            self.last_logged[reason] = now
+            suppressed = self.suppressed.pop(reason, 0)
+
+        logger.warning(
+            "JWT authentication failed",
+            extra={
+                "reason": reason,
+                "detail": str(error),
+                "path": request.path,
+                "suppressed": suppressed,
+            },
+        )
+
+
+jwt_auth = CachedJWTAuth()
+failure_log = FailureLog(interval=FAILURE_LOG_INTERVAL)
 
 
 class JWTBearer(HttpBearer):
     def authenticate(self, request, token):
         try:
-            return JWTAuth().authenticate(request, token)
+            return jwt_auth.authenticate(request, token)
+        except Exception as e:
+            failure_log.record(request, e)
+            raise
+
+
+class AsyncJWTBearer(AsyncHttpBearer):
+    async def authenticate(self, request, token):
+        try:
+            return await jwt_auth.ajwt_authenticate(request, token)
         except Exception as e:
-            print(f"JWT Authentication failed: {str(e)}")
+            failure_log.record(request, e)
             raise
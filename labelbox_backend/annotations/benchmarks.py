@@ -0,0 +1,577 @@
+"""
+Microbenchmarks of the use cases and the paginator on synthetic data.
+
+Cases are registered with `@case`. Each iteration runs in a transaction
+that is rolled back, so writes leave the dataset as `seed_synthetic`
+wrote it and every iteration sees the same rows; a case's `setup` runs
+inside that transaction, outside the timing. Derivative generation is
+switched off while cases run: fetching images is not what they measure.
+"""
+
+import math
+import statistics
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from . import usecases
+from .derivatives import derivative_pool
+from .dtos import (
+    CreateAnnotationSchema,
+    CreateJobSchema,
+    Paginator,
+    ProjectSchema,
+    RegionFilterSchema,
+    SignupSchema,
+    TileViewportSchema,
+    UpdateAnnotationSchema,
+    UpdateProjectSchema,
+)
+from .models import Annotations, ImageUpload, Job, Project, Task, TilePyramid
+from .synthetic import SYNTHETIC_PREFIX, synthetic_users
+
+PAGE_SIZE = 50
+BULK_ROWS = 100
+
+# Use cases without a case, and why.
+SKIPPED = {
+    "BaseUseCase": "base class",
+    "BulkRowsUseCase": "base class",
+    "BulkUpdateUseCase": "base class",
+    "UploadImageUseCase": "writes to the storage backend",
+    "StartImageUploadUseCase": "writes to the storage backend",
+    "StartImportJobUseCase": "stages a file outside the database",
+    "DownloadExportUseCase": "reads a file outside the database",
+}
+
+
+@dataclass
+class Fixture:
+    """The synthetic rows the cases work on."""
+
+    user: User
+    project: Project
+    task: Task
+    annotation: Annotations
+    task_ids: list[int]
+    annotation_ids: list[int]
+    paginator: Paginator
+    request: Any
+
+
+@dataclass
+class Case:
+    name: str
+    run: Callable[[Fixture, Any], Any]
+    use_case: type | None = None
+    setup: Callable[[Fixture], Any] | None = None
+
+
+cases: dict[str, Case] = {}
+
+
+def case(name: str, use_case: type | None = None, setup=None):
+    def decorator(run):
+        cases[name] = Case(name=name, run=run, use_case=use_case, setup=setup)
+        return run
+
+    return decorator
+
+
+def build_fixture(prefix: str = SYNTHETIC_PREFIX) -> Fixture:
+    user = synthetic_users(prefix).order_by("id").first()
+    if user is None:
+        raise ValueError(f"No synthetic users named '{prefix}-*'.")
+
+    project = Project.objects.filter(user=user).order_by("id").first()
+    # The busiest task, so per-task cases see the long tail.
+    task = (
+        Task.objects.filter(project=project)
+        .annotate(total=Count("annotations"))
+        .order_by("-total", "id")
+        .first()
+    )
+    request = RequestFactory().get("/api/benchmark/")
+    request.user = user
+    return Fixture(
+        user=user,
+        project=project,
+        task=task,
+        annotation=Annotations.objects.filter(task=task).order_by("id").first(),
+        task_ids=list(
+            Task.objects.filter(project=project)
+            .order_by("id")
+            .values_list("id", flat=True)[:BULK_ROWS]
+        ),
+        annotation_ids=list(
+            Annotations.objects.filter(task__project=project)
+            .order_by("id")
+            .values_list("id", flat=True)[:BULK_ROWS]
+        ),
+        paginator=Paginator(),
+        request=request,
+    )
+
+
+def paginate(fixture: Fixture, queryset, **pagination) -> list:
+    """One page as the list views serve it."""
+    page = fixture.paginator.paginate_queryset(
+        queryset,
+        Paginator.Input(page_size=PAGE_SIZE, **pagination),
+        fixture.request,
+    )
+    return list(page["data"])
+
+
+def project_annotations(fixture: Fixture):
+    return Annotations.objects.filter(task__project=fixture.project)
+
+
+def uncovered() -> list[str]:
+    """Use cases that have neither a case nor a reason to be skipped."""
+    covered = {case.use_case.__name__ for case in cases.values() if case.use_case}
+    return sorted(
+        name
+        for name, value in vars(usecases).items()
+        if isinstance(value, type)
+        and name.endswith("UseCase")
+        and value.__module__ == usecases.__name__
+        and name not in covered
+        and name not in SKIPPED
+    )
+
+
+def nearest_rank(ordered: list[float], fraction: float) -> float:
+    """The smallest value at least `fraction` of the sorted `ordered` reach."""
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def measure(case: Case, fixture: Fixture, repeat: int, warmup: int) -> dict:
+    """
+    Time `repeat` runs of a case after `warmup` untimed ones, then count
+    the queries of one more run; counting is not timed, as it slows the
+    cursor down.
+    """
+    timings, queries = [], None
+    for iteration in range(warmup + repeat + 1):
+        with transaction.atomic():
+            prepared = case.setup(fixture) if case.setup else None
+            if iteration == warmup + repeat:
+                with CaptureQueriesContext(connection) as captured:
+                    case.run(fixture, prepared)
+                queries = len(captured)
+            else:
+                started_at = time.perf_counter()
+                case.run(fixture, prepared)
+                elapsed = time.perf_counter() - started_at
+                if iteration >= warmup:
+                    timings.append(elapsed)
+            transaction.set_rollback(True)
+
+    timings.sort()
+    return {
+        "iterations": repeat,
+        "min_ms": round(timings[0] * 1000, 3),
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(nearest_rank(timings, 0.95) * 1000, 3),
+        "queries": queries,
+    }
+
+
+def run_cases(fixture: Fixture, names: list[str], repeat: int, warmup: int):
+    """Yield `(name, result)` for each case in `names`."""
+    with mock.patch.object(derivative_pool, "request"):
+        for name in names:
+            yield name, measure(cases[name], fixture, repeat, warmup)
+
+
+def compare(
+    results: dict[str, dict],
+    baseline: dict[str, dict],
+    threshold: float,
+    noise_ms: float,
+) -> list[str]:
+    """
+    Describe the cases that regressed against `baseline`: any that run
+    more queries, or whose median grew by more than `threshold` (a
+    fraction) and by more than `noise_ms`.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["queries"] > before["queries"]:
+            regressions.append(
+                f"{name}: {before['queries']} -> {result['queries']} queries"
+            )
+        slower = result["median_ms"] - before["median_ms"]
+        if slower > noise_ms and slower > before["median_ms"] * threshold:
+            regressions.append(
+                f"{name}: median {before['median_ms']} -> {result['median_ms']} ms"
+            )
+    return regressions
+
+
+# Projects
+
+
+@case("dashboard_metrics", usecases.DashboardMetricsUseCase)
+def dashboard_metrics(fixture, _):
+    return usecases.DashboardMetricsUseCase(fixture.user).execute()
+
+
+@case("create_project", usecases.CreateProjectUseCase)
+def create_project(fixture, _):
+    data = ProjectSchema(name="Benchmark", description="A benchmark project.")
+    return usecases.CreateProjectUseCase(data, fixture.user).execute()
+
+
+@case("list_projects", usecases.ListProjectsUseCase)
+def list_projects(fixture, _):
+    return paginate(fixture, usecases.ListProjectsUseCase(fixture.user).execute())
+
+
+@case("update_project", usecases.UpdateProjectUseCase)
+def update_project(fixture, _):
+    data = UpdateProjectSchema(description="Updated by a benchmark.")
+    return usecases.UpdateProjectUseCase(
+        fixture.project.id, fixture.user, data
+    ).execute()
+
+
+@case("get_project", usecases.GetProjectUseCase)
+def get_project(fixture, _):
+    return usecases.GetProjectUseCase(fixture.project.id, fixture.user).execute()
+
+
+@case("get_project_expanded", usecases.GetProjectUseCase)
+def get_project_expanded(fixture, _):
+    project = usecases.GetProjectUseCase(
+        fixture.project.id, fixture.user, expand={"annotations"}
+    ).execute()
+    return [list(task.expanded_annotations) for task in project.task_page]
+
+
+@case("export_project_ndjson", usecases.ExportProjectUseCase)
+def export_project_ndjson(fixture, _):
+    return list(
+        usecases.ExportProjectUseCase(
+            fixture.project.id, fixture.user, "ndjson"
+        ).execute()
+    )
+
+
+@case("export_project_coco", usecases.ExportProjectUseCase)
+def export_project_coco(fixture, _):
+    return list(
+        usecases.ExportProjectUseCase(
+            fixture.project.id, fixture.user, "coco"
+        ).execute()
+    )
+
+
+@case("delete_project", usecases.DeleteProjectUseCase)
+def delete_project(fixture, _):
+    return usecases.DeleteProjectUseCase(fixture.project.id, fixture.user).execute()
+
+
+@case("delete_project_background", usecases.DeleteProjectUseCase)
+def delete_project_background(fixture, _):
+    return usecases.DeleteProjectUseCase(
+        fixture.project.id, fixture.user, background=True
+    ).execute()
+
+
+# Tasks
+
+
+@case("create_task", usecases.CreateTaskUseCase)
+def create_task(fixture, _):
+    return usecases.CreateTaskUseCase(
+        fixture.project.id, "https://images.example.com/benchmark/new.jpg"
+    ).execute()
+
+
+@case("import_tasks", usecases.ImportTasksUseCase)
+def import_tasks(fixture, _):
+    urls = (
+        f"https://images.example.com/benchmark/import/{index}.jpg"
+        for index in range(BULK_ROWS)
+    )
+    return list(
+        usecases.ImportTasksUseCase(fixture.project.id, urls, fixture.user).execute()
+    )
+
+
+@case("update_task", usecases.UpdateTaskUseCase)
+def update_task(fixture, _):
+    return usecases.UpdateTaskUseCase(
+        fixture.task.id, "https://images.example.com/benchmark/updated.jpg"
+    ).execute()
+
+
+@case("list_tasks", usecases.ListTasksUseCase)
+def list_tasks(fixture, _):
+    return paginate(fixture, usecases.ListTasksUseCase(fixture.project.id).execute())
+
+
+@case("delete_task", usecases.DeleteTaskUseCase)
+def delete_task(fixture, _):
+    return usecases.DeleteTaskUseCase(fixture.task.id).execute()
+
+
+@case("bulk_update_tasks", usecases.BulkUpdateTasksUseCase)
+def bulk_update_tasks(fixture, _):
+    rows = [
+        {"id": task_id, "fields": {"url": f"https://images.example.com/b/{task_id}"}}
+        for task_id in fixture.task_ids
+    ]
+    return usecases.BulkUpdateTasksUseCase(rows, fixture.user).execute()
+
+
+# Annotations
+
+
+@case("create_annotation", usecases.CreateAnnotationUseCase)
+def create_annotation(fixture, _):
+    data = CreateAnnotationSchema(
+        task_id=fixture.task.id,
+        coordinates="[10, 20, 30, 40]",
+        labels="car, truck",
+        data={"confidence": 0.9},
+    )
+    return usecases.CreateAnnotationUseCase(data).execute()
+
+
+@case("bulk_create_annotations", usecases.BulkCreateAnnotationsUseCase)
+def bulk_create_annotations(fixture, _):
+    rows = [
+        {
+            "task_id": task_id,
+            "coordinates": "[10, 20, 30, 40]",
+            "labels": "car",
+            "data": {"confidence": 0.5},
+        }
+        for task_id in fixture.task_ids
+    ]
+    return usecases.BulkCreateAnnotationsUseCase(rows, fixture.user).execute()
+
+
+@case("list_annotations", usecases.ListAnnotationsUseCase)
+def list_annotations(fixture, _):
+    return paginate(fixture, usecases.ListAnnotationsUseCase(fixture.task.id).execute())
+
+
+@case("list_annotations_in_region", usecases.ListAnnotationsInRegionUseCase)
+def list_annotations_in_region(fixture, _):
+    region = RegionFilterSchema(
+        project_id=fixture.project.id, x_min=0, y_min=0, x_max=1024, y_max=1024
+    )
+    return paginate(
+        fixture,
+        usecases.ListAnnotationsInRegionUseCase(fixture.user, region).execute(),
+    )
+
+
+@case("label_statistics_project", usecases.LabelStatisticsUseCase)
+def label_statistics_project(fixture, _):
+    return usecases.LabelStatisticsUseCase(
+        fixture.user, fixture.project.id, None
+    ).execute()
+
+
+@case("label_statistics_task", usecases.LabelStatisticsUseCase)
+def label_statistics_task(fixture, _):
+    return usecases.LabelStatisticsUseCase(
+        fixture.user, None, fixture.task.id
+    ).execute()
+
+
+@case("update_annotation", usecases.UpdateAnnotationUseCase)
+def update_annotation(fixture, _):
+    data = UpdateAnnotationSchema(labels="bus, car", version=fixture.annotation.version)
+    return usecases.UpdateAnnotationUseCase(fixture.annotation.id, data).execute()
+
+
+@case("delete_annotation", usecases.DeleteAnnotationUseCase)
+def delete_annotation(fixture, _):
+    return usecases.DeleteAnnotationUseCase(fixture.annotation.id).execute()
+
+
+@case("bulk_update_annotations", usecases.BulkUpdateAnnotationsUseCase)
+def bulk_update_annotations(fixture, _):
+    rows = [
+        {"id": annotation_id, "fields": {"labels": "bus, car"}}
+        for annotation_id in fixture.annotation_ids
+    ]
+    return usecases.BulkUpdateAnnotationsUseCase(rows, fixture.user).execute()
+
+
+# Images and tiles
+
+
+def create_upload(fixture: Fixture) -> ImageUpload:
+    return ImageUpload.objects.create(
+        user=fixture.user,
+        backend="local",
+        file_name="benchmark.jpg",
+        content_type="image/jpeg",
+        size=1024,
+    )
+
+
+def create_pyramid(fixture: Fixture) -> TilePyramid:
+    return TilePyramid.objects.update_or_create(
+        source_url=fixture.task.url,
+        defaults={
+            "status": TilePyramid.Status.DONE,
+            "width": 4096,
+            "height": 4096,
+            "tile_size": 256,
+            "overlap": 1,
+            "format": "jpeg",
+            "max_level": 12,
+        },
+    )[0]
+
+
+@case("get_image_upload", usecases.GetImageUploadUseCase, setup=create_upload)
+def get_image_upload(fixture, upload):
+    return usecases.GetImageUploadUseCase(upload.id, fixture.user).execute()
+
+
+@case("get_tile_pyramid", usecases.GetTilePyramidUseCase, setup=create_pyramid)
+def get_tile_pyramid(fixture, _):
+    return usecases.GetTilePyramidUseCase(fixture.task.id, fixture.user).execute()
+
+
+@case("list_viewport_tiles", usecases.ListViewportTilesUseCase, setup=create_pyramid)
+def list_viewport_tiles(fixture, _):
+    viewport = TileViewportSchema(level=12, x_min=0, y_min=0, x_max=1920, y_max=1080)
+    return usecases.ListViewportTilesUseCase(
+        fixture.task.id, fixture.user, viewport
+    ).execute()
+
+
+# Jobs and accounts
+
+
+def create_job(fixture: Fixture) -> Job:
+    return Job.objects.create(
+        user=fixture.user,
+        kind="export_project",
+        params={"project_id": fixture.project.id, "format": "ndjson"},
+    )
+
+
+@case("create_job", usecases.CreateJobUseCase)
+def create_export_job(fixture, _):
+    data = CreateJobSchema(
+        kind="export_project", params={"project_id": fixture.project.id}
+    )
+    return usecases.CreateJobUseCase(data, fixture.user).execute()
+
+
+@case("list_jobs", usecases.ListJobsUseCase, setup=create_job)
+def list_jobs(fixture, _):
+    return paginate(fixture, usecases.ListJobsUseCase(fixture.user).execute())
+
+
+@case("get_job", usecases.GetJobUseCase, setup=create_job)
+def get_job(fixture, job):
+    return usecases.GetJobUseCase(job.id, fixture.user).execute()
+
+
+@case("cancel_job", usecases.CancelJobUseCase, setup=create_job)
+def cancel_job(fixture, job):
+    return usecases.CancelJobUseCase(job.id, fixture.user).execute()
+
+
+@case("signup", usecases.SignupUseCase)
+def signup(fixture, _):
+    data = SignupSchema(
+        username="benchmark-signup",
+        email="benchmark-signup@example.com",
+        password="benchmark-password-1",
+    )
+    return usecases.SignupUseCase(data).execute()
+
+
+# Paginator, over every annotation of the project
+
+
+def deep_page(fixture: Fixture) -> int:
+    return max(project_annotations(fixture).count() // PAGE_SIZE, 1)
+
+
+def deep_cursor(fixture: Fixture) -> str:
+    """A cursor just before the last page in `id` order."""
+    row = (
+        project_annotations(fixture)
+        .order_by("-id")
+        .values_list("id", flat=True)[PAGE_SIZE : PAGE_SIZE + 1]
+        .first()
+    )
+    return Paginator.encode_cursor({"o": "id", "v": row, "id": row, "r": False})
+
+
+@case("paginator_page_first")
+def paginator_page_first(fixture, _):
+    return paginate(fixture, project_annotations(fixture))
+
+
+@case("paginator_page_deep", setup=deep_page)
+def paginator_page_deep(fixture, page_index):
+    return paginate(fixture, project_annotations(fixture), page_index=page_index)
+
+
+@case("paginator_page_ordered")
+def paginator_page_ordered(fixture, _):
+    return paginate(fixture, project_annotations(fixture), ordering="-created_at")
+
+
+@case("paginator_cursor_first")
+def paginator_cursor_first(fixture, _):
+    return paginate(fixture, project_annotations(fixture), mode="cursor")
+
+
+@case("paginator_cursor_deep", setup=deep_cursor)
+def paginator_cursor_deep(fixture, cursor):
+    return paginate(fixture, project_annotations(fixture), cursor=cursor)
+
+
+@case("paginator_cursor_ordered")
+def paginator_cursor_ordered(fixture, _):
+    return paginate(
+        fixture, project_annotations(fixture), mode="cursor", ordering="-created_at"
+    )
+
+
+@case("apaginator_page_first")
+def apaginator_page_first(fixture, _):
+    page = async_to_sync(fixture.paginator.apaginate_queryset)(
+        project_annotations(fixture),
+        Paginator.Input(page_size=PAGE_SIZE),
+        fixture.request,
+    )
+    return page["data"]
+
+
+@case("apaginator_cursor_deep", setup=deep_cursor)
+def apaginator_cursor_deep(fixture, cursor):
+    page = async_to_sync(fixture.paginator.apaginate_queryset)(
+        project_annotations(fixture),
+        Paginator.Input(page_size=PAGE_SIZE, cursor=cursor),
+        fixture.request,
+    )
+    return page["data"]
@@ -0,0 +1,94 @@
+from typing import Any
+
+from django.db import connection
+from django.db.models import Model
+from django.utils import timezone
+
+
+def update_from_values(
+    model: type[Model],
+    fields: list[str],
+    rows: list[tuple[Any, ...]],
+    versioned: bool = False,
+    owner: tuple[str, int] | None = None,
+) -> dict[int, int | None]:
+    """
+    Give each row its own values with one `UPDATE ... FROM (VALUES ...)`.
+
+    A row holds the primary key, then, with `versioned`, the version the
+    change is based on (None to skip the check), then one value per field.
+    Versioned rows whose version has moved on are left alone, and updated
+    ones have their version incremented. With an `owner` of a lookup path
+    to the row's project and a user id, rows are only updated while that
+    user's project is live, even if it changed since the rows were checked.
+    Returns the primary keys that were updated, mapped to their new
+    version when `versioned`.
+    """
+    quote = connection.ops.quote_name
+    meta = model._meta
+    table = quote(meta.db_table)
+    columns = [meta.pk]
+    if versioned:
+        columns.append(meta.get_field("version"))
+    columns.extend(meta.get_field(name) for name in fields)
+
+    # PostgreSQL types a VALUES list from its first row, where parameters
+    # are untyped literals, so every value is cast to its column's type.
+    if connection.vendor == "postgresql":
+        placeholders = [f"CAST(%s AS {f.cast_db_type(connection)})" for f in columns]
+    else:
+        placeholders = ["%s"] * len(columns)
+    row_sql = f"({', '.join(placeholders)})"
+
+    first_value = 3 if versioned else 2
+    assignments = [
+        f"{quote(field.column)} = v.column{number}"
+        for number, field in enumerate(columns[first_value - 1 :], start=first_value)
+    ]
+    params = []
+    for field in meta.concrete_fields:
+        if getattr(field, "auto_now", False):
+            assignments.append(f"{quote(field.column)} = %s")
+            params.append(field.get_db_prep_save(timezone.now(), connection))
+    sources = [f"(VALUES {', '.join([row_sql] * len(rows))}) AS v"]
+    conditions = [f"{table}.{quote(meta.pk.column)} = v.column1"]
+    returning = [f"{table}.{quote(meta.pk.column)}"]
+    if versioned:
+        assignments.append(f"version = {table}.version + 1")
+        conditions.append(f"(v.column2 IS NULL OR {table}.version = v.column2)")
+        returning.append(f"{table}.version")
+
+    for row in rows:
+        params.extend(
+            field.get_db_prep_save(value, connection)
+            for field, value in zip(columns, row, strict=True)
+        )
+
+    if owner is not None:
+        path, user_id = owner
+        alias, related = table, model
+        for number, name in enumerate(path.split("__")):
+            field = related._meta.get_field(name)
+            related = field.related_model
+            joined = f"o{number}"
+            sources.append(f"{quote(related._meta.db_table)} AS {joined}")
+            conditions.append(
+                f"{joined}.{quote(related._meta.pk.column)} = "
+                f"{alias}.{quote(field.column)}"
+            )
+            alias = joined
+        user_column = quote(related._meta.get_field("user").column)
+        deleted_column = quote(related._meta.get_field("deleted_at").column)
+        conditions.append(f"{alias}.{user_column} = %s")
+        conditions.append(f"{alias}.{deleted_column} IS NULL")
+        params.append(user_id)
+
+    sql = (
+        f"UPDATE {table} SET {', '.join(assignments)} "
+        f"FROM {', '.join(sources)} "
+        f"WHERE {' AND '.join(conditions)} "
+        f"RETURNING {', '.join(returning)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0]: row[1] if versioned else None for row in cursor.fetchall()}
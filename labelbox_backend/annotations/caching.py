@@ -0,0 +1,70 @@
+import time
+
+from django.core.cache import BaseCache, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Model
+
+# Write generations and the entries built against them have to be seen by
+# every worker, so they live in the cache that can be shared (Redis).
+SHARED_CACHE_ALIAS = "responses"
+
+
+def shared_cache() -> BaseCache | None:
+    """
+    The cache every worker process sees, or None when it is configured
+    as a per-process cache.
+    """
+    store = caches[SHARED_CACHE_ALIAS]
+    if isinstance(store, (LocMemCache, DummyCache)):
+        return None
+    return store
+
+
+def generation_key(model: type[Model]) -> str:
+    return f"generation:{model._meta.label_lower}"
+
+
+def get_version(key: str, store: BaseCache = cache) -> int:
+    """
+    Return the counter stored at `key` in `store`.
+
+    The counter is seeded with a nanosecond timestamp rather than 0 so
+    that a key lost to eviction never comes back as a value that older
+    cache entries were built against.
+    """
+    version = store.get(key)
+    if version is None:
+        store.add(key, time.time_ns(), timeout=None)
+        version = store.get(key)
+    return version
+
+
+def bump_version(key: str, store: BaseCache = cache) -> None:
+    try:
+        store.incr(key)
+    except ValueError:
+        store.set(key, time.time_ns(), timeout=None)
+
+
+def get_generation(model: type[Model]) -> int:
+    """Return the current write generation of `model`."""
+    return get_version(generation_key(model), caches[SHARED_CACHE_ALIAS])
+
+
+def bump_generation(*models: type[Model]) -> None:
+    """Invalidate every cache entry built against the given models."""
+    store = caches[SHARED_CACHE_ALIAS]
+    for model in models:
+        bump_version(generation_key(model), store)
+
+
+async def abump_generation(*models: type[Model]) -> None:
+    """Async `bump_generation`."""
+    store = caches[SHARED_CACHE_ALIAS]
+    for model in models:
+        key = generation_key(model)
+        try:
+            await store.aincr(key)
+        except ValueError:
+            await store.aset(key, time.time_ns(), timeout=None)
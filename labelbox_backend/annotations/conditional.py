@@ -0,0 +1,119 @@
+from collections.abc import Callable
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control, quote_etag
+from django.utils.http import parse_etags
+from ninja.decorators import decorate_view
+
+from .data_types import HttpRequest
+from .models import ProjectCounters, UserCounters
+
+
+def user_version(request: HttpRequest, **kwargs) -> str | None:
+    version = (
+        UserCounters.objects.filter(user_id=request.user.id)
+        .values_list("version", flat=True)
+        .first()
+    )
+    return None if version is None else f"u{request.user.id}.{version}"
+
+
+def project_version(request: HttpRequest, project_id: int, **kwargs) -> str | None:
+    version = (
+        ProjectCounters.objects.filter(
+            project_id=project_id,
+            project__user_id=request.user.id,
+            project__deleted_at__isnull=True,
+        )
+        .values_list("version", flat=True)
+        .first()
+    )
+    return None if version is None else f"p{project_id}.{version}"
+
+
+def task_version(request: HttpRequest, task_id: int, **kwargs) -> str | None:
+    """The version of the task's project, which every annotation write bumps."""
+    version = (
+        ProjectCounters.objects.filter(
+            project__tasks__id=task_id,
+            project__user_id=request.user.id,
+            project__deleted_at__isnull=True,
+        )
+        .values_list("version", flat=True)
+        .first()
+    )
+    return None if version is None else f"t{task_id}.{version}"
+
+
+def is_current(request: HttpRequest, etag: str) -> bool:
+    """Weak comparison of `etag` against the request's If-None-Match."""
+    tags = parse_etags(request.headers.get("If-None-Match", ""))
+    return "*" in tags or etag.removeprefix("W/") in {
+        tag.removeprefix("W/") for tag in tags
+    }
+
+
+def add_etag(request: HttpRequest, response):
+    etag = getattr(request, "etag", None)
+    if etag is not None and response.status_code == 200:  # noqa: PLR2004
+        response["ETag"] = etag
+        # Always revalidate; responses depend on the bearer token.
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def set_etag(run: Callable) -> Callable:
+    if iscoroutinefunction(run):
+
+        @wraps(run)
+        async def wrapper(request: HttpRequest, *args, **kwargs):
+            return add_etag(request, await run(request, *args, **kwargs))
+
+    else:
+
+        @wraps(run)
+        def wrapper(request: HttpRequest, *args, **kwargs):
+            return add_etag(request, run(request, *args, **kwargs))
+
+    return wrapper
+
+
+def conditional(version: Callable[..., str | None]):
+    """
+    Answer a GET with 304 Not Modified when the client's `If-None-Match`
+    holds the resource's current version, skipping the view's queries and
+    serialization; otherwise send the version as a weak ETag.
+
+    `version(request, **path_params)` runs after authentication, so it can
+    scope the version to `request.user`. When it returns None the view
+    runs as usual.
+    """
+
+    def decorator(view: Callable) -> Callable:
+        if iscoroutinefunction(view):
+            aversion = sync_to_async(version)
+
+            @wraps(view)
+            async def wrapper(request: HttpRequest, *args, **kwargs):
+                tag = await aversion(request, **kwargs)
+                request.etag = None if tag is None else f"W/{quote_etag(tag)}"
+                if request.etag is not None and is_current(request, request.etag):
+                    return HttpResponseNotModified(headers={"ETag": request.etag})
+                return await view(request, *args, **kwargs)
+
+        else:
+
+            @wraps(view)
+            def wrapper(request: HttpRequest, *args, **kwargs):
+                tag = version(request, **kwargs)
+                request.etag = None if tag is None else f"W/{quote_etag(tag)}"
+                if request.etag is not None and is_current(request, request.etag):
+                    return HttpResponseNotModified(headers={"ETag": request.etag})
+                return view(request, *args, **kwargs)
+
+        return decorate_view(set_etag)(wrapper)
+
+    return decorator
@@ -0,0 +1,118 @@
+from collections import defaultdict
+from collections.abc import Iterable
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Annotations, Project, ProjectCounters, Task, UserCounters
+from .response_cache import invalidate_responses
+
+
+def _apply(model, lookup: dict, deltas: dict) -> None:
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    changes["version"] = F("version") + 1
+    if not model.objects.filter(**lookup).update(**changes):
+        model.objects.bulk_create([model(**lookup)], ignore_conflicts=True)
+        model.objects.filter(**lookup).update(**changes)
+
+
+def adjust_counters(
+    user_id: int,
+    project_id: int | None = None,
+    *,
+    projects: int = 0,
+    tasks: int = 0,
+    annotations: int = 0,
+) -> None:
+    """
+    Add the given deltas to a user's counters and, when `project_id` is
+    set, to that project's counters, and bump their versions. Once the
+    transaction commits, their cached responses are invalidated. Writes
+    that change no count still call it, without deltas, for the version
+    bump and the invalidation.
+
+    Call it inside the transaction that performs the write so that the
+    counters commit or roll back together with the rows they count.
+    """
+    _apply(
+        UserCounters,
+        {"user_id": user_id},
+        {"projects": projects, "tasks": tasks, "annotations": annotations},
+    )
+    if project_id is not None:
+        _apply(
+            ProjectCounters,
+            {"project_id": project_id},
+            {"tasks": tasks, "annotations": annotations},
+        )
+    transaction.on_commit(lambda: invalidate_responses(user_id, project_id))
+
+
+def rebuild_counters(user_ids: Iterable[int] | None = None) -> int:
+    """
+    Recompute counters from the source tables with GROUP BY queries.
+
+    Rebuilds every user when `user_ids` is None. Returns the number of
+    users whose counters were rewritten.
+    """
+    projects = Project.objects.all()
+    if user_ids is not None:
+        projects = projects.filter(user_id__in=list(user_ids))
+
+    task_counts = dict(
+        Task.objects.filter(project__in=projects)
+        .values_list("project_id")
+        .annotate(total=Count("id"))
+    )
+    annotation_counts = dict(
+        Annotations.objects.filter(task__project__in=projects)
+        .values_list("task__project_id")
+        .annotate(total=Count("id"))
+    )
+
+    project_rows, user_rows = [], defaultdict(lambda: defaultdict(int))
+    for project_id, user_id in projects.values_list("id", "user_id"):
+        tasks = task_counts.get(project_id, 0)
+        annotations = annotation_counts.get(project_id, 0)
+        project_rows.append(
+            ProjectCounters(project_id=project_id, tasks=tasks, annotations=annotations)
+        )
+        user_rows[user_id]["projects"] += 1
+        user_rows[user_id]["tasks"] += tasks
+        user_rows[user_id]["annotations"] += annotations
+
+    if user_ids is not None:
+        for user_id in user_ids:
+            user_rows.setdefault(user_id, defaultdict(int))
+
+    with transaction.atomic():
+        stale_projects = ProjectCounters.objects.all()
+        stale_users = UserCounters.objects.all()
+        if user_ids is not None:
+            stale_projects = stale_projects.filter(project__user_id__in=user_rows)
+            stale_users = stale_users.filter(user_id__in=user_rows)
+        stale_projects.delete()
+        stale_users.delete()
+
+        # Upserts, so concurrent rebuilds of the same users cannot collide.
+        ProjectCounters.objects.bulk_create(
+            project_rows,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["project"],
+            update_fields=["tasks", "annotations", "version"],
+        )
+        UserCounters.objects.bulk_create(
+            [
+                UserCounters(user_id=user_id, **rows)
+                for user_id, rows in user_rows.items()
+            ],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=["projects", "tasks", "annotations", "version"],
+        )
+
+    for user_id in user_rows:
+        invalidate_responses(user_id)
+    return len(user_rows)
@@ -0,0 +1,149 @@
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import BaseCache
+from django.db import connections
+from django.db.models import QuerySet
+
+from .caching import get_generation, shared_cache
+
+
+class CountStrategy:
+    """
+    Work out the `total` of a paginated list.
+
+    `count` returns a `(total, exact)` pair; `exact` is False when the
+    total is a planner estimate.
+    """
+
+    def count(self, queryset, request) -> tuple[int, bool]:
+        raise NotImplementedError
+
+    async def acount(self, queryset, request) -> tuple[int, bool]:
+        return await sync_to_async(self.count)(queryset, request)
+
+
+class ExactCount(CountStrategy):
+    def count(self, queryset, request) -> tuple[int, bool]:
+        if isinstance(queryset, QuerySet):
+            return queryset.order_by().count(), True
+        return len(queryset), True
+
+    async def acount(self, queryset, request) -> tuple[int, bool]:
+        if isinstance(queryset, QuerySet):
+            return await queryset.order_by().acount(), True
+        return len(queryset), True
+
+
+class EstimatedCount(CountStrategy):
+    """
+    Use the PostgreSQL planner's row estimate for large result sets.
+
+    Unfiltered querysets read `pg_class.reltuples`; filtered ones run a
+    plain `EXPLAIN`. When the estimate is below `threshold`, or the
+    database cannot provide one, the exact `fallback` is used instead.
+    """
+
+    def __init__(self, threshold: int, fallback: CountStrategy):
+        self.threshold = threshold
+        self.fallback = fallback
+
+    def count(self, queryset, request) -> tuple[int, bool]:
+        estimate = self.estimate(queryset) if isinstance(queryset, QuerySet) else None
+        if estimate is None or estimate < self.threshold:
+            return self.fallback.count(queryset, request)
+        return estimate, False
+
+    @staticmethod
+    def estimate(queryset: QuerySet) -> int | None:
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+
+        queryset = queryset.order_by()
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+                rows = row[0] if row else -1
+            else:
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                rows = plan[0]["Plan"]["Plan Rows"]
+
+        # reltuples is -1 for tables that have never been analyzed.
+        return int(rows) if rows >= 0 else None
+
+
+class CachedCount(CountStrategy):
+    """
+    Cache the wrapped strategy's result per user, endpoint and filter.
+
+    The key includes the write generation of the queryset's model, so any
+    write to that model invalidates the cached totals. `store` must be
+    shared by every worker, or a worker would keep serving totals that
+    writes through the others made stale.
+    """
+
+    def __init__(self, wrapped: CountStrategy, store: BaseCache, timeout: int):
+        self.wrapped = wrapped
+        self.store = store
+        self.timeout = timeout
+
+    def cache_key(self, queryset: QuerySet, request) -> str:
+        sql, params = queryset.order_by().query.sql_with_params()
+        query_hash = hashlib.sha256(f"{sql}{params}".encode()).hexdigest()[:32]
+        user_id = getattr(request.user, "pk", None)
+        return (
+            f"count:{queryset.model._meta.label_lower}:"
+            f"{get_generation(queryset.model)}:{user_id}:{request.path}:{query_hash}"
+        )
+
+    def count(self, queryset, request) -> tuple[int, bool]:
+        if not isinstance(queryset, QuerySet):
+            return self.wrapped.count(queryset, request)
+
+        key = self.cache_key(queryset, request)
+        cached = self.store.get(key)
+        if cached is not None:
+            return tuple(cached)
+
+        result = self.wrapped.count(queryset, request)
+        self.store.set(key, result, timeout=self.timeout)
+        return result
+
+
+def build_count_strategy(name: str) -> CountStrategy:
+    """
+    Build the strategy named by the `PAGINATION_COUNT_STRATEGY` setting.
+
+    Totals are only cached in a cache shared by every worker; without one
+    "cached" counts exactly and "estimated" estimates on every request.
+    """
+    if name == "exact":
+        return ExactCount()
+
+    if name == "cached":
+        strategy = ExactCount()
+    elif name == "estimated":
+        strategy = EstimatedCount(
+            threshold=settings.PAGINATION_ESTIMATE_THRESHOLD,
+            fallback=ExactCount(),
+        )
+    else:
+        raise ValueError(f"Unknown count strategy '{name}'.")
+
+    store = shared_cache()
+    if store is None:
+        return strategy
+    return CachedCount(
+        strategy, store=store, timeout=settings.PAGINATION_COUNT_CACHE_TIMEOUT
+    )
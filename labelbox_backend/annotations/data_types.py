@@ -2,7 +2,7 @@ import typing
 from typing import Annotated
 
 from django.http import HttpRequest as DjangoHttpRequest
-from pydantic import HttpUrl
+from pydantic import AfterValidator, HttpUrl, TypeAdapter
 
 if typing.TYPE_CHECKING:
     from django.contrib.auth.models import User
@@ -12,4 +12,13 @@ class HttpRequest(DjangoHttpRequest):
     user: "User"
 
 
-HttpUrlType = Annotated[str, HttpUrl]
+http_url_adapter = TypeAdapter(HttpUrl)
+
+
+def validate_http_url(value: str) -> str:
+    # Pydantic's HttpUrl normalises the URL; keep the string as given.
+    http_url_adapter.validate_python(value)
+    return value
+
+
+HttpUrlType = Annotated[str, AfterValidator(validate_http_url)]
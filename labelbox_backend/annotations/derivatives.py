@@ -0,0 +1,201 @@
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import TilePyramid
+from .pyramids import THUMBNAIL_NAME, build_pyramid
+from .remote import open_public_url
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = 60
+
+
+def fetch_source(url: str, directory: str) -> str:
+    """Return a local path of the image at `url`, downloading it if needed."""
+    path = get_storage().local_path(url)
+    if path is not None:
+        return path
+
+    target = os.path.join(directory, "source")
+    with (
+        open_public_url(url, timeout=DOWNLOAD_TIMEOUT) as response,
+        open(target, "wb") as output,
+    ):
+        shutil.copyfileobj(response, output, DOWNLOAD_CHUNK_SIZE)
+    return target
+
+
+def store_derivatives(pyramid: TilePyramid, directory: str) -> str:
+    """Store every generated file and return the thumbnail URL."""
+    storage = get_storage()
+    thumbnail_url = ""
+    for root, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            path = os.path.join(root, file_name)
+            name = os.path.relpath(path, directory).replace(os.sep, "/")
+            url = storage.save_as(path, pyramid.storage_name(name))
+            if name == THUMBNAIL_NAME:
+                thumbnail_url = url
+    return thumbnail_url
+
+
+def stale_before() -> datetime:
+    return timezone.now() - timedelta(seconds=settings.DERIVATIVE_STALE_SECONDS)
+
+
+def retryable(cutoff: datetime) -> Q:
+    """
+    Pyramids a new build may take over: failed ones, and pending or
+    processing ones untouched since `cutoff`, which a stopped process
+    left unfinished.
+    """
+    return Q(status=TilePyramid.Status.FAILED) | Q(
+        status__in=[TilePyramid.Status.PENDING, TilePyramid.Status.PROCESSING],
+        updated_at__lt=cutoff,
+    )
+
+
+def is_abandoned(pyramid: TilePyramid) -> bool:
+    """Whether an unfinished pyramid was left behind by a stopped process."""
+    return (
+        pyramid.status in (TilePyramid.Status.PENDING, TilePyramid.Status.PROCESSING)
+        and pyramid.updated_at < stale_before()
+    )
+
+
+def mark_pyramid(pyramid_id: int, **fields) -> None:
+    TilePyramid.objects.filter(id=pyramid_id).update(
+        updated_at=timezone.now(), **fields
+    )
+
+
+class DerivativePool:
+    """
+    Build thumbnails and tile pyramids off the request path.
+
+    `request` returns at once. A coordinator thread claims the image's
+    `TilePyramid` row, which doubles as the cache of what has been
+    generated, fetches the source and hands the CPU-bound build to a
+    process pool before storing the results. Processes are spawned rather
+    than forked so a threaded server is never forked. With no workers,
+    requests are ignored: nothing is built on the request path, and the
+    pyramid is built by a job once it is first read. `build` itself then
+    runs inline, which the job workers and `generate_derivatives` rely on.
+
+    At most `queue_limit` requests wait per process; later ones are
+    dropped. Dropped and lost requests leave no row, or one that turns
+    stale, so the next read of the image's pyramid requests it again.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.slots = threading.BoundedSemaphore(queue_limit)
+        self.lock = threading.Lock()
+        self.threads = None
+        self.processes = None
+
+    def get_executors(self) -> tuple[ThreadPoolExecutor, ProcessPoolExecutor]:
+        with self.lock:
+            if self.threads is None:
+                self.processes = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self.threads = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="derivatives"
+                )
+            return self.threads, self.processes
+
+    def request(self, source_url: str) -> None:
+        """Queue derivatives for an image unless they exist or are underway."""
+        if not self.workers:
+            return
+        if not self.slots.acquire(blocking=False):
+            logger.warning("Derivative queue is full", extra={"url": source_url})
+            return
+        threads, _ = self.get_executors()
+        future = threads.submit(self.run, source_url)
+        future.add_done_callback(self.release)
+
+    def release(self, *args) -> None:
+        self.slots.release()
+
+    @staticmethod
+    def claim(source_url: str) -> TilePyramid | None:
+        pyramid, created = TilePyramid.objects.get_or_create(source_url=source_url)
+        if created:
+            return pyramid
+
+        # Failed and abandoned builds are retried, each by one caller.
+        retried = TilePyramid.objects.filter(
+            retryable(stale_before()), id=pyramid.id
+        ).update(status=TilePyramid.Status.PENDING, error="", updated_at=timezone.now())
+        return pyramid if retried else None
+
+    def run(self, source_url: str) -> None:
+        close_old_connections()
+        try:
+            self.generate(source_url)
+        finally:
+            close_old_connections()
+
+    def generate(self, source_url: str) -> None:
+        try:
+            pyramid = self.claim(source_url)
+            if pyramid is not None:
+                self.build(pyramid)
+        except Exception:
+            logger.exception("Could not queue derivatives", extra={"url": source_url})
+
+    def build(self, pyramid: TilePyramid) -> None:
+        mark_pyramid(pyramid.id, status=TilePyramid.Status.PROCESSING)
+        workdir = tempfile.mkdtemp(prefix="derivatives-")
+        try:
+            output_dir = os.path.join(workdir, "tiles")
+            arguments = (
+                fetch_source(pyramid.source_url, workdir),
+                output_dir,
+                settings.DERIVATIVE_TILE_SIZE,
+                settings.DERIVATIVE_TILE_OVERLAP,
+                settings.DERIVATIVE_THUMBNAIL_SIZE,
+                settings.DERIVATIVE_MAX_PIXELS,
+            )
+            if self.workers:
+                _, processes = self.get_executors()
+                geometry = processes.submit(build_pyramid, *arguments).result()
+            else:
+                geometry = build_pyramid(*arguments)
+            thumbnail_url = store_derivatives(pyramid, output_dir)
+        except Exception as e:
+            logger.exception(
+                "Derivative generation failed", extra={"pyramid_id": pyramid.id}
+            )
+            mark_pyramid(pyramid.id, status=TilePyramid.Status.FAILED, error=str(e))
+        else:
+            mark_pyramid(
+                pyramid.id,
+                status=TilePyramid.Status.DONE,
+                thumbnail_url=thumbnail_url,
+                **geometry,
+            )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+derivative_pool = DerivativePool(
+    workers=settings.DERIVATIVE_WORKERS,
+    queue_limit=settings.DERIVATIVE_QUEUE_LIMIT,
+)
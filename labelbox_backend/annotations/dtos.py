@@ -1,15 +1,22 @@
-from datetime import date
-from typing import Any, Generic, Optional, TypeVar
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Generic, Literal, Optional, TypeVar
 
 from django.conf import settings
-from django.core.exceptions import FieldError
+from django.core.exceptions import FieldDoesNotExist, FieldError, ValidationError
+from django.db.models import Q, QuerySet
+from django.urls import reverse
 from ninja import Field, ModelSchema, Schema
-from ninja.pagination import PaginationBase
-from pydantic import BaseModel, EmailStr, conint, validator
+from ninja.errors import HttpError
+from ninja.pagination import AsyncPaginationBase
+from pydantic import BaseModel, EmailStr, conint, model_validator, validator
 
+from .counting import build_count_strategy
 from .data_types import HttpUrlType
 from .exceptions_manager import InvalidInputError
-from .models import Project
+from .models import ImageUpload, Job, Project, TilePyramid
 
 GenericResultsType = TypeVar("GenericResultsType")
 
@@ -34,24 +41,7 @@ class TaskResponseSchema(Schema):
     id: int
     url: str
     project_id: int
-    created_at: date
-
-
-class ProjectDetailSchema(ModelSchema):
-    tasks: list[TaskResponseSchema]
-
-    class Meta:
-        model = Project
-        fields = [
-            "id",
-            "name",
-            "description",
-            "created_at",
-        ]
-
-    @staticmethod
-    def resolve_tasks(root: Project):
-        return root.tasks
+    created_at: datetime
 
 
 class TaskSchema(Schema):
@@ -66,7 +56,25 @@ class AnnotationSchema(Schema):
 
 class CreateTaskSchema(Schema):
     project_id: int
-    url: str
+    url: HttpUrlType
+
+
+class GeometrySchema(Schema):
+    type: Literal["bbox", "polygon"]
+    points: list[float] = Field(
+        ...,
+        description="Flat [x1, y1, x2, y2, ...] list; a bbox is two opposite corners",
+    )
+
+    @model_validator(mode="after")
+    def points_check(self):
+        if len(self.points) % 2:
+            raise ValueError("points must hold x, y pairs")
+        if self.type == "bbox" and len(self.points) != 4:  # noqa: PLR2004
+            raise ValueError("a bbox needs exactly two corner points")
+        if self.type == "polygon" and len(self.points) < 6:  # noqa: PLR2004
+            raise ValueError("a polygon needs at least three points")
+        return self
 
 
 class CreateAnnotationSchema(Schema):
@@ -74,6 +82,7 @@ class CreateAnnotationSchema(Schema):
     coordinates: Optional[str]
     labels: Optional[str]
     data: dict
+    geometry: Optional[GeometrySchema] = None
 
 
 class AnnotationResponseSchema(Schema):
@@ -82,7 +91,200 @@ class AnnotationResponseSchema(Schema):
     coordinates: str
     labels: str
     data: dict
-    created_at: date
+    geometry: Optional[GeometrySchema] = None
+    version: int
+    created_at: datetime
+
+
+class TaskDetailSchema(TaskResponseSchema):
+    annotations: Optional[list[AnnotationResponseSchema]] = Field(
+        None, description="Only included with `expand=annotations`"
+    )
+
+    @staticmethod
+    def resolve_annotations(root):
+        return getattr(root, "expanded_annotations", None)
+
+
+class ProjectDetailFilter(Schema):
+    expand: Optional[str] = Field(
+        None, description="Comma separated relations to include: `annotations`"
+    )
+    page_size: conint(ge=1, le=100) = 20  # type: ignore
+
+    @property
+    def expand_set(self) -> set[str]:
+        names = (name.strip() for name in (self.expand or "").split(","))
+        return {name for name in names if name}
+
+
+class ProjectDetailSchema(ModelSchema):
+    task_count: int
+    tasks: list[TaskDetailSchema]
+    tasks_next: Optional[str] = Field(
+        None, description="Cursor link to the rest of the tasks on `/list-tasks/`"
+    )
+
+    class Meta:
+        model = Project
+        fields = [
+            "id",
+            "name",
+            "description",
+            "created_at",
+        ]
+
+    @staticmethod
+    def resolve_task_count(root: Project):
+        counters = getattr(root, "counters", None)
+        return counters.tasks if counters else 0
+
+    @staticmethod
+    def resolve_tasks(root: Project):
+        return root.task_page
+
+    @staticmethod
+    def resolve_tasks_next(root: Project, context):
+        if root.task_cursor is None:
+            return None
+        # Link within the API that served the request, sync or async.
+        namespace = context["request"].resolver_match.namespace
+        path = reverse(f"{namespace}:list_tasks", kwargs={"project_id": root.id})
+        return f"{settings.LIVE_URL}{path}?cursor={root.task_cursor}&page_size={root.task_page_size}"  # noqa
+
+
+class ImageUploadSchema(ModelSchema):
+    class Meta:
+        model = ImageUpload
+        fields = [
+            "id",
+            "status",
+            "file_name",
+            "content_type",
+            "size",
+            "url",
+            "error",
+            "created_at",
+            "updated_at",
+        ]
+
+
+class TilePyramidSchema(ModelSchema):
+    class Meta:
+        model = TilePyramid
+        fields = [
+            "status",
+            "width",
+            "height",
+            "tile_size",
+            "overlap",
+            "format",
+            "max_level",
+            "thumbnail_url",
+            "error",
+        ]
+
+
+class TileViewportSchema(Schema):
+    level: int = Field(..., ge=0, description="Pyramid level; 0 is one pixel")
+    x_min: float = Field(..., description="Full-resolution pixels")
+    y_min: float
+    x_max: float
+    y_max: float
+
+
+class TileSchema(Schema):
+    level: int
+    col: int
+    row: int
+    x: int = Field(..., description="Left edge in level pixels, without overlap")
+    y: int
+    width: int
+    height: int
+    url: str
+
+
+class JobSchema(ModelSchema):
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "progress",
+            "result",
+            "error",
+            "attempts",
+            "cancel_requested",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+
+
+class CreateJobSchema(Schema):
+    kind: str
+    params: dict[str, Any] = {}
+
+
+class ExportJobParamsSchema(Schema):
+    project_id: int
+    format: Literal["ndjson", "coco"] = "ndjson"
+
+
+class ImportJobParamsSchema(Schema):
+    project_id: int
+    manifest_path: str
+    format: Literal["csv", "ndjson"]
+
+
+class RebuildCountersJobParamsSchema(Schema):
+    pass
+
+
+class PurgeProjectJobParamsSchema(Schema):
+    project_id: int
+
+
+class BuildPyramidJobParamsSchema(Schema):
+    pyramid_id: int
+
+
+class LabelCountSchema(Schema):
+    label_id: int
+    name: str
+    count: int
+
+
+class RegionFilterSchema(Schema):
+    task_id: Optional[int] = None
+    project_id: Optional[int] = None
+    x_min: float
+    y_min: float
+    x_max: float
+    y_max: float
+
+
+class BulkRowResultSchema(Schema):
+    index: int
+    success: bool
+    id: Optional[int] = None
+    version: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkCreateResultSchema(Schema):
+    total: int
+    created: int
+    failed: int
+    results: list[BulkRowResultSchema]
+
+
+class BulkUpdateResultSchema(Schema):
+    total: int
+    updated: int
+    failed: int
+    results: list[BulkRowResultSchema]
 
 
 class SignupSchema(Schema):
@@ -110,13 +312,29 @@ class UpdateProjectSchema(Schema):
 
 
 class UpdateTaskSchema(Schema):
-    url: str = None
+    url: HttpUrlType = None
 
 
 class UpdateAnnotationSchema(Schema):
     coordinates: str = None
     labels: str = None
     data: dict = None
+    geometry: GeometrySchema = None
+    version: Optional[int] = Field(
+        None,
+        description="Version the edit is based on; if the annotation has changed "
+        "since, the update is rejected with 409",
+    )
+
+
+class TaskPatchSchema(Schema):
+    id: int
+    fields: UpdateTaskSchema
+
+
+class AnnotationPatchSchema(Schema):
+    id: int
+    fields: UpdateAnnotationSchema
 
 
 class PageFilter(Schema):
@@ -125,6 +343,12 @@ class PageFilter(Schema):
     ordering: Optional[str] = Field(
         None, alias="ordering", description="Ordering of the results"
     )
+    mode: Literal["page", "cursor"] = Field(
+        "page", description="`cursor` switches to keyset pagination"
+    )
+    cursor: Optional[str] = Field(
+        None, description="Opaque cursor from a `next`/`previous` link"
+    )
 
     @validator("page_index")
     def page_index_check(cls, page_index):  # noqa: N805
@@ -136,7 +360,7 @@ class PageFilter(Schema):
         self,
         *,
         exclude_none=True,
-        exclude={"page_index", "page_size", "ordering"},
+        exclude={"page_index", "page_size", "ordering", "mode", "cursor"},
         by_alias: bool = False,
         skip_defaults: bool = None,
         exclude_unset: bool = False,
@@ -152,38 +376,39 @@ class PageFilter(Schema):
         )
 
 
-class Paginator(PaginationBase):
+class Paginator(AsyncPaginationBase):
     class Input(PageFilter): ...
 
     class Output(BaseModel, Generic[GenericResultsType]):
         message: Optional[str] = None
         success: bool = True
-        total: int
+        total: Optional[int]
+        total_is_estimate: bool = False
         page_size: int
-        page_index: int
-        nb_pages: int
+        page_index: Optional[int]
+        nb_pages: Optional[int]
         previous: Optional[str]
         next: Optional[str]
         data: list[GenericResultsType]
 
     items_attribute: str = "data"
 
-    def paginate_queryset(
-        self,
-        queryset,
-        pagination: PageFilter,
-        request,
-        **params,
-    ):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.count_strategy = build_count_strategy(settings.PAGINATION_COUNT_STRATEGY)
+
+    def order_page(self, queryset, pagination: PageFilter):
         if pagination.ordering:
             try:
                 queryset = queryset.order_by(pagination.ordering)
             except FieldError:
                 raise InvalidInputError(data=f"Ordering Field '{pagination.ordering}'")
+        return queryset
 
+    def page_result(
+        self, total: int, exact: bool, data, pagination: PageFilter, request
+    ) -> dict:
         offset = (pagination.page_index - 1) * pagination.page_size
-        total = self._items_count(queryset)
-
         next, prev = None, None
 
         if pagination.page_index > 1:
@@ -194,19 +419,174 @@ class Paginator(PaginationBase):
 
         return {
             "total": total,
+            "total_is_estimate": not exact,
             "page_size": pagination.page_size,
             "page_index": pagination.page_index,
             "nb_pages": (total + pagination.page_size - 1) // pagination.page_size,
             "next": next,
             "previous": prev,
-            "data": queryset[offset : offset + pagination.page_size],
+            "data": data,
         }
 
+    def paginate_queryset(
+        self,
+        queryset,
+        pagination: PageFilter,
+        request,
+        **params,
+    ):
+        if pagination.cursor or pagination.mode == "cursor":
+            return self.paginate_by_cursor(queryset, pagination, request)
+
+        queryset = self.order_page(queryset, pagination)
+        offset = (pagination.page_index - 1) * pagination.page_size
+        total, exact = self.count_strategy.count(queryset, request)
+        data = queryset[offset : offset + pagination.page_size]
+        return self.page_result(total, exact, data, pagination, request)
+
+    async def apaginate_queryset(
+        self,
+        queryset,
+        pagination: PageFilter,
+        request,
+        **params,
+    ):
+        if pagination.cursor or pagination.mode == "cursor":
+            return await self.apaginate_by_cursor(queryset, pagination, request)
+
+        queryset = self.order_page(queryset, pagination)
+        offset = (pagination.page_index - 1) * pagination.page_size
+        total, exact = await self.count_strategy.acount(queryset, request)
+        data = queryset[offset : offset + pagination.page_size]
+        if isinstance(data, QuerySet):
+            data = [row async for row in data]
+        return self.page_result(total, exact, data, pagination, request)
+
+    @staticmethod
+    def encode_cursor(payload: dict) -> str:
+        # `str` keeps full microsecond precision on datetimes, which the
+        # keyset comparison needs; DjangoJSONEncoder rounds to milliseconds.
+        raw = json.dumps(payload, default=str, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> dict:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            payload = json.loads(raw)
+        except (binascii.Error, ValueError):
+            raise HttpError(400, "Invalid cursor.")
+
+        if (
+            not isinstance(payload, dict)
+            or not {"o", "v", "id"} <= payload.keys()
+            or not isinstance(payload["o"], str)
+            or payload["v"] is None
+            or payload["id"] is None
+        ):
+            raise HttpError(400, "Invalid cursor.")
+        return payload
+
+    def cursor_queryset(self, queryset, pagination: PageFilter) -> tuple[Any, dict]:
+        """
+        Keyset pagination on `(ordering field, id)`.
+
+        Pages are fetched with a `WHERE (field, id) > (value, last_id)` style
+        filter instead of an OFFSET, and no COUNT is issued, so every page
+        costs the same however deep it is. The cursor carries the ordering,
+        the boundary row and the direction, which keeps links opaque.
+
+        Returns the page query, one row longer than the page to detect more
+        rows, and the state `cursor_page` needs to build the links.
+        """
+        cursor = self.decode_cursor(pagination.cursor) if pagination.cursor else None
+        ordering = cursor["o"] if cursor else (pagination.ordering or "id")
+        backwards = bool(cursor and cursor.get("r"))
+
+        descending = ordering.startswith("-")
+        try:
+            field = queryset.model._meta.get_field(ordering.lstrip("-"))
+        except FieldDoesNotExist:
+            field = None
+        if field is None or not field.concrete:
+            raise HttpError(400, f"Cannot order by '{ordering}'.")
+        name = field.attname
+
+        if cursor:
+            # The cursor comes back from the client: only typed values may
+            # reach the filter, or a tampered one fails inside the query.
+            try:
+                value = field.to_python(cursor["v"])
+                last_id = int(cursor["id"])
+            except (TypeError, ValueError, ValidationError):
+                raise HttpError(400, "Invalid cursor.")
+
+        scan_descending = descending != backwards
+        if scan_descending:
+            queryset = queryset.order_by(f"-{name}", "-id")
+        else:
+            queryset = queryset.order_by(name, "id")
+
+        if cursor:
+            lookup = "lt" if scan_descending else "gt"
+            if name == "id":
+                queryset = queryset.filter(**{f"id__{lookup}": last_id})
+            else:
+                queryset = queryset.filter(
+                    Q(**{f"{name}__{lookup}": value})
+                    | Q(**{name: value, f"id__{lookup}": last_id})
+                )
+
+        state = {
+            "cursor": cursor,
+            "ordering": ordering,
+            "name": name,
+            "backwards": backwards,
+        }
+        return queryset[: pagination.page_size + 1], state
+
+    def cursor_page(
+        self, rows: list, state: dict, pagination: PageFilter, request
+    ) -> dict:
+        ordering, name, backwards = state["ordering"], state["name"], state["backwards"]
+        has_more = len(rows) > pagination.page_size
+        rows = rows[: pagination.page_size]
+        if backwards:
+            rows.reverse()
+
+        has_next = has_more if not backwards else bool(rows)
+        has_previous = has_more if backwards else state["cursor"] is not None
+
+        def link(row, reverse: bool) -> str:
+            token = self.encode_cursor(
+                {"o": ordering, "v": getattr(row, name), "id": row.id, "r": reverse}
+            )
+            return f"{settings.LIVE_URL}{request.path}?cursor={token}&page_size={pagination.page_size}"  # noqa
+
+        return {
+            "total": None,
+            "page_size": pagination.page_size,
+            "page_index": None,
+            "nb_pages": None,
+            "next": link(rows[-1], reverse=False) if has_next and rows else None,
+            "previous": link(rows[0], reverse=True) if has_previous and rows else None,
+            "data": rows,
+        }
+
+    def paginate_by_cursor(self, queryset, pagination: PageFilter, request):
+        queryset, state = self.cursor_queryset(queryset, pagination)
+        return self.cursor_page(list(queryset), state, pagination, request)
+
+    async def apaginate_by_cursor(self, queryset, pagination: PageFilter, request):
+        queryset, state = self.cursor_queryset(queryset, pagination)
+        rows = [row async for row in queryset]
+        return self.cursor_page(rows, state, pagination, request)
+
 
 class RecentAnnotationSchema(Schema):
     coordinates: Optional[str]
     labels: Optional[str]
-    created_at: date
+    created_at: datetime
 
 
 class DashboardMetricsSchema(Schema):
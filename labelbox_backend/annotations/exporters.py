@@ -0,0 +1,183 @@
+import json
+import os
+from collections.abc import Iterator
+from typing import Any
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .geometry import POLYGON, polygon_area
+from .models import AnnotationLabel, Annotations, Label, Task
+
+EXPORT_FORMATS = ("ndjson", "coco")
+# Label ids start at 1, so 0 is free for annotations without labels.
+UNLABELED_CATEGORY_ID = 0
+
+TASK_EXPORT_FIELDS = ("id", "url", "created_at")
+ANNOTATION_EXPORT_FIELDS = (
+    "id",
+    "task_id",
+    "coordinates",
+    "labels",
+    "data",
+    "geometry_type",
+    "points",
+    "bbox_x_min",
+    "bbox_y_min",
+    "bbox_x_max",
+    "bbox_y_max",
+    "created_at",
+)
+
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, cls=DjangoJSONEncoder)
+
+
+def buffered(chunks: Iterator[str], size: int = 64 * 1024) -> Iterator[bytes]:
+    """Group small string chunks into byte blocks of roughly `size` bytes."""
+    buffer, buffered_size = [], 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        buffer.append(data)
+        buffered_size += len(data)
+        if buffered_size >= size:
+            yield b"".join(buffer)
+            buffer, buffered_size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def export_path(job_id: int) -> str:
+    """Where the file of an `export_project` job is kept."""
+    return os.path.join(settings.EXPORT_DIR, f"{job_id}.export")
+
+
+def iter_tasks(project_id: int, chunk_size: int) -> Iterator[dict]:
+    return (
+        Task.objects.filter(project_id=project_id)
+        .order_by("id")
+        .values(*TASK_EXPORT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def iter_annotations(project_id: int, chunk_size: int) -> Iterator[dict]:
+    return (
+        Annotations.objects.filter(task__project_id=project_id)
+        .order_by("task_id", "id")
+        .values(*ANNOTATION_EXPORT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def iter_annotation_labels(
+    project_id: int, chunk_size: int
+) -> Iterator[tuple[int, int, int]]:
+    return (
+        AnnotationLabel.objects.filter(task__project_id=project_id)
+        .order_by("task_id", "annotation_id", "label_id")
+        .values_list("task_id", "annotation_id", "label_id")
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def iter_ndjson_export(project_id: int, chunk_size: int) -> Iterator[str]:
+    """
+    Yield one JSON line per task with its annotations embedded.
+
+    Tasks and annotations are read through two server-side cursors sorted
+    on the task id and merged as they stream, so only the annotations of
+    the current task are held in memory.
+    """
+    annotations = iter_annotations(project_id, chunk_size)
+    pending = next(annotations, None)
+
+    for task in iter_tasks(project_id, chunk_size):
+        task_annotations = []
+        while pending is not None and pending["task_id"] <= task["id"]:
+            if pending["task_id"] == task["id"]:
+                task_annotations.append(pending)
+            pending = next(annotations, None)
+
+        yield dumps({**task, "annotations": task_annotations}) + "\n"
+
+
+def iter_coco_export(project_id: int, chunk_size: int) -> Iterator[str]:
+    """
+    Yield a COCO JSON document in pieces.
+
+    Images are written first, then annotations. COCO gives an annotation
+    one category, so an annotation with several labels is written once
+    per label; categories are the project's `Label` rows, plus
+    "unlabeled" when an annotation has none. Label links are read through
+    a third cursor merged on `(task_id, annotation_id)` like the NDJSON
+    export merges annotations into tasks.
+    """
+    yield '{"images": ['
+    separator = ""
+    for task in iter_tasks(project_id, chunk_size):
+        image = {
+            "id": task["id"],
+            "file_name": task["url"],
+            "coco_url": task["url"],
+            "date_captured": task["created_at"],
+        }
+        yield separator + dumps(image)
+        separator = ","
+
+    yield '], "annotations": ['
+    links = iter_annotation_labels(project_id, chunk_size)
+    pending = next(links, None)
+    unlabeled = False
+    item_id = 0
+    separator = ""
+    for annotation in iter_annotations(project_id, chunk_size):
+        key = (annotation["task_id"], annotation["id"])
+        label_ids = []
+        while pending is not None and pending[:2] <= key:
+            if pending[:2] == key:
+                label_ids.append(pending[2])
+            pending = next(links, None)
+        if not label_ids:
+            label_ids, unlabeled = [UNLABELED_CATEGORY_ID], True
+
+        item = {
+            "image_id": annotation["task_id"],
+            "iscrowd": 0,
+            "attributes": {
+                "annotation_id": annotation["id"],
+                "coordinates": annotation["coordinates"],
+                "data": annotation["data"],
+            },
+        }
+        if annotation["geometry_type"]:
+            width = annotation["bbox_x_max"] - annotation["bbox_x_min"]
+            height = annotation["bbox_y_max"] - annotation["bbox_y_min"]
+            item["bbox"] = [
+                annotation["bbox_x_min"],
+                annotation["bbox_y_min"],
+                width,
+                height,
+            ]
+            item["area"] = width * height
+        if annotation["geometry_type"] == POLYGON:
+            item["segmentation"] = [annotation["points"]]
+            item["area"] = polygon_area(annotation["points"])
+
+        for label_id in label_ids:
+            item_id += 1
+            yield separator + dumps({"id": item_id, "category_id": label_id, **item})
+            separator = ","
+
+    categories = [
+        {"id": label_id, "name": name}
+        for label_id, name in Label.objects.filter(project_id=project_id)
+        .order_by("id")
+        .values_list("id", "name")
+    ]
+    if unlabeled:
+        categories.append({"id": UNLABELED_CATEGORY_ID, "name": "unlabeled"})
+    yield '], "categories": '
+    yield dumps(categories)
+    yield "}"
@@ -0,0 +1,85 @@
+import json
+
+BBOX = "bbox"
+POLYGON = "polygon"
+GEOMETRY_FIELDS = (
+    "geometry_type",
+    "points",
+    "bbox_x_min",
+    "bbox_y_min",
+    "bbox_x_max",
+    "bbox_y_max",
+)
+EMPTY_GEOMETRY = {
+    "geometry_type": "",
+    "points": [],
+    "bbox_x_min": None,
+    "bbox_y_min": None,
+    "bbox_x_max": None,
+    "bbox_y_max": None,
+}
+
+
+def parse_bbox(coordinates: str) -> list[float] | None:
+    """
+    Read an `[x, y, width, height]` box from free-form coordinates.
+
+    Accepts a JSON array or a comma separated string of four numbers and
+    returns None for anything else.
+    """
+    if not coordinates:
+        return None
+    try:
+        values = json.loads(coordinates)
+    except ValueError:
+        values = coordinates.split(",")
+
+    if not isinstance(values, list) or len(values) != 4:  # noqa: PLR2004
+        return None
+    try:
+        return [float(value) for value in values]
+    except (TypeError, ValueError):
+        return None
+
+
+def geometry_values(geometry: dict | None, coordinates: str | None = None) -> dict:
+    """
+    Return the `Annotations` field values for a geometry.
+
+    `geometry` is `{"type": ..., "points": [x1, y1, x2, y2, ...]}`; a bbox
+    is given by two opposite corners. Without a geometry, a box is derived
+    from `coordinates` when they hold one. Returns an empty dict when
+    there is nothing to store.
+    """
+    if geometry is None:
+        bbox = parse_bbox(coordinates or "")
+        if bbox is None:
+            return {}
+        x, y, width, height = bbox
+        geometry = {"type": BBOX, "points": [x, y, x + width, y + height]}
+
+    points = [float(value) for value in geometry["points"]]
+    xs, ys = points[0::2], points[1::2]
+    return {
+        "geometry_type": geometry["type"],
+        "points": points,
+        "bbox_x_min": min(xs),
+        "bbox_y_min": min(ys),
+        "bbox_x_max": max(xs),
+        "bbox_y_max": max(ys),
+    }
+
+
+def replaced_geometry(geometry: dict | None, coordinates: str | None) -> dict:
+    """
+    Return the field values that replace an annotation's geometry, which
+    clear it when the new coordinates hold no box.
+    """
+    return {**EMPTY_GEOMETRY, **geometry_values(geometry, coordinates)}
+
+
+def polygon_area(points: list[float]) -> float:
+    """Area enclosed by a flat `[x1, y1, x2, y2, ...]` ring (shoelace formula)."""
+    xs, ys = points[0::2], points[1::2]
+    twice = sum(xs[i] * ys[i - 1] - xs[i - 1] * ys[i] for i in range(len(xs)))
+    return abs(twice) / 2
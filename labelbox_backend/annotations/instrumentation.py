@@ -0,0 +1,359 @@
+"""
+Per-endpoint request metrics in the Prometheus text format.
+
+`RequestMetricsMiddleware` times every request and, through a database
+execute wrapper installed on each new connection, counts and times its
+SQL queries. Queries that async views run in `sync_to_async` threads are
+attributed through a context variable, which asgiref copies into those
+threads.
+
+Each process aggregates in memory and writes its totals to its own file
+in `METRICS_DIR` at most every `METRICS_FLUSH_INTERVAL` seconds; the
+metrics view sums the files of every worker, so any gunicorn worker can
+answer a scrape. Files are named by PID and a random suffix, so a worker
+that reuses a dead one's PID starts a new file, and the files of dead
+workers are folded into `retained.json` so their counts never drop out.
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass
+from inspect import iscoroutinefunction
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from .data_types import HttpRequest
+from .query_budgets import check_budget
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+RETAINED_FILE = "retained.json"
+LOCK_FILE = ".lock"
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    query_seconds: float = 0.0
+
+
+current_request: ContextVar[RequestStats | None] = ContextVar(
+    "current_request", default=None
+)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper charging queries to the current request."""
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_seconds += time.perf_counter() - started_at
+
+
+def bucket_counts(buckets: tuple, value: float) -> list[int]:
+    """Cumulative histogram counts of one observation."""
+    return [int(value <= bound) for bound in buckets]
+
+
+class Registry:
+    """This process's totals per (endpoint, method, status)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series: dict[tuple[str, str, str], dict] = {}
+        self.flushed_at = 0.0
+        self.pid = None
+        self.file_name = ""
+
+    def claim(self) -> None:
+        """
+        Start this process's own totals and file. Called with the lock held:
+        a worker forked after import inherits the registry, and must
+        neither count its parent's requests nor write to its file.
+        """
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.file_name = f"{self.pid}-{uuid.uuid4().hex}.json"
+            self.series = {}
+
+    def observe(
+        self,
+        key: tuple[str, str, str],
+        seconds: float,
+        stats: RequestStats,
+        size: int,
+    ) -> None:
+        latency = bucket_counts(LATENCY_BUCKETS, seconds)
+        queries = bucket_counts(QUERY_BUCKETS, stats.queries)
+        with self.lock:
+            self.claim()
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {
+                    "requests": 0,
+                    "seconds": 0.0,
+                    "latency": [0] * len(LATENCY_BUCKETS),
+                    "queries": 0,
+                    "query_buckets": [0] * len(QUERY_BUCKETS),
+                    "query_seconds": 0.0,
+                    "bytes": 0,
+                }
+            series["requests"] += 1
+            series["seconds"] += seconds
+            series["queries"] += stats.queries
+            series["query_seconds"] += stats.query_seconds
+            series["bytes"] += size
+            for index, hit in enumerate(latency):
+                series["latency"][index] += hit
+            for index, hit in enumerate(queries):
+                series["query_buckets"][index] += hit
+
+        if time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write this process's totals to its file, replacing it atomically."""
+        with self.lock:
+            self.claim()
+            self.flushed_at = time.monotonic()
+            rows = [[*key, series] for key, series in self.series.items()]
+            file_name = self.file_name
+        if not rows:
+            return
+
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        write_rows(os.path.join(settings.METRICS_DIR, file_name), rows)
+
+
+registry = Registry()
+
+
+def write_rows(destination: str, rows: list) -> None:
+    """Replace `destination` with `rows` atomically."""
+    descriptor, path = tempfile.mkstemp(dir=settings.METRICS_DIR, suffix=".tmp")
+    with os.fdopen(descriptor, "w") as output:
+        json.dump(rows, output)
+    os.replace(path, destination)
+
+
+def read_rows(path: str) -> list:
+    try:
+        with open(path) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return []
+
+
+def add_rows(totals: dict[tuple[str, str, str], dict], rows: list) -> None:
+    for endpoint, method, status, series in rows:
+        key = (endpoint, method, status)
+        total = totals.get(key)
+        if total is None:
+            totals[key] = series
+            continue
+        for field, value in series.items():
+            if isinstance(value, list):
+                total[field] = [a + b for a, b in zip(total[field], value)]
+            else:
+                total[field] += value
+
+
+def is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def worker_pid(name: str) -> int | None:
+    """The PID in a worker file's name, None for other files."""
+    pid, _, rest = name.partition("-")
+    if not rest.endswith(".json") or not pid.isdigit():
+        return None
+    return int(pid)
+
+
+def collect() -> dict[tuple[str, str, str], dict]:
+    """
+    Sum the totals every process has written, folding those of workers
+    that are gone into the retained file first. Runs under a file lock so
+    concurrent scrapes never count a folded file twice or not at all.
+    """
+    registry.flush()
+    directory = settings.METRICS_DIR
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retained_path = os.path.join(directory, RETAINED_FILE)
+        retained = {}
+        add_rows(retained, read_rows(retained_path))
+
+        totals, dead = {}, []
+        for name in os.listdir(directory):
+            pid = worker_pid(name)
+            if pid is None:
+                continue
+            path = os.path.join(directory, name)
+            if is_running(pid):
+                add_rows(totals, read_rows(path))
+            else:
+                add_rows(retained, read_rows(path))
+                dead.append(path)
+
+        if dead:
+            write_rows(
+                retained_path, [[*key, series] for key, series in retained.items()]
+            )
+            for path in dead:
+                os.remove(path)
+        add_rows(totals, [[*key, series] for key, series in retained.items()])
+    return totals
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def labels(endpoint: str, method: str, status: str, **extra: str) -> str:
+    pairs = {"endpoint": endpoint, "method": method, "status": status, **extra}
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs.items()) + "}"
+
+
+def histogram(name: str, key: tuple, buckets: tuple, counts: list, total, count):
+    for bound, cumulative in zip(buckets, counts):
+        yield f"{name}_bucket{labels(*key, le=f'{bound:g}')} {cumulative}"
+    yield f"{name}_bucket{labels(*key, le='+Inf')} {count}"
+    yield f"{name}_sum{labels(*key)} {total}"
+    yield f"{name}_count{labels(*key)} {count}"
+
+
+def render(totals: dict[tuple[str, str, str], dict]) -> str:
+    lines = [
+        "# HELP http_request_duration_seconds Time to produce the response.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for key, series in sorted(totals.items()):
+        lines.extend(
+            histogram(
+                "http_request_duration_seconds",
+                key,
+                LATENCY_BUCKETS,
+                series["latency"],
+                series["seconds"],
+                series["requests"],
+            )
+        )
+
+    lines += [
+        "# HELP http_request_db_queries SQL queries run for a request.",
+        "# TYPE http_request_db_queries histogram",
+    ]
+    for key, series in sorted(totals.items()):
+        lines.extend(
+            histogram(
+                "http_request_db_queries",
+                key,
+                QUERY_BUCKETS,
+                series["query_buckets"],
+                series["queries"],
+                series["requests"],
+            )
+        )
+
+    for name, field, help_text in (
+        (
+            "http_request_db_query_duration_seconds_total",
+            "query_seconds",
+            "Time spent in SQL queries.",
+        ),
+        ("http_response_size_bytes_total", "bytes", "Bytes of response bodies."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for key, series in sorted(totals.items()):
+            lines.append(f"{name}{labels(*key)} {series[field]}")
+    return "\n".join(lines) + "\n"
+
+
+def prometheus_metrics(request: HttpRequest) -> HttpResponse:
+    """Request metrics of every worker, for a Prometheus scrape."""
+    token = settings.METRICS_TOKEN
+    if not token:
+        # Per-endpoint traffic is not public: without a token, nobody may
+        # scrape.
+        return HttpResponse(status=403)
+    if not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
+
+
+class RequestMetricsMiddleware:
+    """Record latency, SQL queries, response size and status per endpoint."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started_at = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.observe(request, response, time.perf_counter() - started_at, stats)
+        return response
+
+    async def __acall__(self, request: HttpRequest):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started_at = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.observe(request, response, time.perf_counter() - started_at, stats)
+        return response
+
+    @staticmethod
+    def observe(request: HttpRequest, response, seconds: float, stats) -> None:
+        match = request.resolver_match
+        endpoint = match.route if match is not None else "unmatched"
+        size = 0 if response.streaming else len(response.content)
+        key = (endpoint, request.method, str(response.status_code))
+        registry.observe(key, seconds, stats, size)
+        check_budget(request, stats.queries)
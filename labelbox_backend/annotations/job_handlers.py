@@ -0,0 +1,105 @@
+import os
+import tempfile
+
+from django.conf import settings
+
+from .counters import rebuild_counters
+from .derivatives import derivative_pool
+from .dtos import (
+    BuildPyramidJobParamsSchema,
+    ExportJobParamsSchema,
+    ImportJobParamsSchema,
+    PurgeProjectJobParamsSchema,
+    RebuildCountersJobParamsSchema,
+)
+from .exporters import buffered, export_path
+from .jobs import JobContext, register
+from .models import Job, TilePyramid
+from .parsers import iter_manifest_urls
+from .purging import purge_project
+from .uploads import discard_staged_file
+from .usecases import ExportProjectUseCase, ImportTasksUseCase
+
+
+@register("export_project", ExportJobParamsSchema)
+def export_project(
+    job: Job, params: ExportJobParamsSchema, context: JobContext
+) -> dict:
+    """
+    Write a project export to `EXPORT_DIR`. The file is private: only the
+    job's user may fetch it, from `/jobs/{job_id}/download/`.
+    """
+    chunks = ExportProjectUseCase(
+        project_id=params.project_id, user=job.user, fmt=params.format
+    ).execute()
+    extension = "json" if params.format == "coco" else "ndjson"
+
+    os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+    descriptor, path = tempfile.mkstemp(dir=settings.EXPORT_DIR, suffix=".tmp")
+    try:
+        size = 0
+        with os.fdopen(descriptor, "wb") as output:
+            for block in buffered(chunks):
+                output.write(block)
+                size += len(block)
+                context.report({"bytes": size})
+        os.replace(path, export_path(job.id))
+    finally:
+        discard_staged_file(path)
+    return {
+        "file_name": f"project-{params.project_id}.{extension}",
+        "size": size,
+        "download_url": f"/api/jobs/{job.id}/download/",
+    }
+
+
+def discard_manifest(params: ImportJobParamsSchema) -> None:
+    discard_staged_file(params.manifest_path)
+
+
+@register("import_tasks", ImportJobParamsSchema, public=False, discard=discard_manifest)
+def import_tasks(job: Job, params: ImportJobParamsSchema, context: JobContext) -> dict:
+    """
+    Import a staged manifest. Batches are committed as they go, so a
+    cancelled import keeps the tasks created so far.
+    """
+    try:
+        with open(params.manifest_path, "rb") as manifest:
+            use_case = ImportTasksUseCase(
+                project_id=params.project_id,
+                urls=iter_manifest_urls(manifest, params.format),
+                user=job.user,
+            )
+            report = {}
+            for report in use_case.execute():
+                context.report(report)
+    finally:
+        discard_manifest(params)
+    return report
+
+
+@register("rebuild_counters", RebuildCountersJobParamsSchema)
+def rebuild_user_counters(
+    job: Job, params: RebuildCountersJobParamsSchema, context: JobContext
+) -> dict:
+    """Recompute the dashboard counters of the job's user."""
+    return {"users": rebuild_counters(user_ids=[job.user_id])}
+
+
+@register("purge_project", PurgeProjectJobParamsSchema, public=False, cancellable=False)
+def purge_deleted_project(
+    job: Job, params: PurgeProjectJobParamsSchema, context: JobContext
+) -> dict:
+    """Delete the rows of a project that was deleted in the background."""
+    return purge_project(params.project_id, settings.PURGE_BATCH_SIZE, context.report)
+
+
+@register("build_pyramid", BuildPyramidJobParamsSchema, public=False)
+def build_pyramid(
+    job: Job, params: BuildPyramidJobParamsSchema, context: JobContext
+) -> dict:
+    """Build the thumbnail and tiles of an image first read without them."""
+    pyramid = TilePyramid.objects.get(id=params.pyramid_id)
+    derivative_pool.build(pyramid)
+    pyramid.refresh_from_db()
+    return {"status": pyramid.status}
@@ -0,0 +1,200 @@
+import logging
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from ninja import Schema
+
+from .models import Job
+from .uploads import fail_stale_uploads
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelledError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class JobHandler:
+    function: Callable
+    params: type[Schema]
+    # Only public kinds may be enqueued with client-supplied params.
+    public: bool
+    # Whether the job's user may cancel it; jobs that finish work the user
+    # already asked for, like purging a deleted project, run to the end.
+    cancellable: bool
+    # Releases what the params refer to when a queued job is cancelled.
+    discard: Callable | None
+
+
+handlers: dict[str, JobHandler] = {}
+
+
+def register(
+    kind: str,
+    params: type[Schema],
+    public: bool = True,
+    cancellable: bool = True,
+    discard: Callable | None = None,
+):
+    """
+    Register the decorated function as the handler of `kind`.
+
+    It is called as `function(job, params, context)` with `params` parsed
+    into the given schema, and returns the JSON-serialisable job result.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        handlers[kind] = JobHandler(
+            function=function,
+            params=params,
+            public=public,
+            cancellable=cancellable,
+            discard=discard,
+        )
+        return function
+
+    return decorator
+
+
+class JobContext:
+    """Lets a running handler report progress and notice cancellation."""
+
+    def __init__(self, job: Job):
+        self.job = job
+        self.interval = settings.JOB_PROGRESS_INTERVAL
+        self.reported_at = 0.0
+
+    def report(self, progress: dict, force: bool = False) -> None:
+        """
+        Save progress, at most once per `JOB_PROGRESS_INTERVAL` unless
+        forced. Saving also refreshes the heartbeat and raises
+        `JobCancelledError` once the job was asked to stop.
+        """
+        if not force and time.monotonic() - self.reported_at < self.interval:
+            return
+        self.reported_at = time.monotonic()
+
+        now = timezone.now()
+        updated = Job.objects.filter(id=self.job.id, cancel_requested=False).update(
+            progress=progress, heartbeat_at=now, updated_at=now
+        )
+        if not updated:
+            raise JobCancelledError
+
+
+def claim_job(worker: str) -> Job | None:
+    """
+    Take the oldest queued job. `SKIP LOCKED` lets concurrent workers claim
+    different rows without waiting on each other.
+    """
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.Status.QUEUED)
+            .order_by("id")
+            .first()
+        )
+        if job is None:
+            return None
+
+        now = timezone.now()
+        job.status = Job.Status.RUNNING
+        job.worker = worker
+        job.attempts += 1
+        job.started_at = job.heartbeat_at = job.updated_at = now
+        job.save(
+            update_fields=[
+                "status",
+                "worker",
+                "attempts",
+                "started_at",
+                "heartbeat_at",
+                "updated_at",
+            ]
+        )
+    return job
+
+
+def finish_job(job: Job, status: str, **fields) -> None:
+    now = timezone.now()
+    Job.objects.filter(id=job.id, status=Job.Status.RUNNING).update(
+        status=status, finished_at=now, updated_at=now, **fields
+    )
+
+
+def run_job(job: Job) -> None:
+    context = JobContext(job)
+    try:
+        handler = handlers.get(job.kind)
+        if handler is None:
+            raise ValueError(f"Unknown job kind '{job.kind}'.")
+        params = handler.params.model_validate(job.params)
+        result = handler.function(job, params, context)
+    except JobCancelledError:
+        finish_job(job, Job.Status.CANCELLED)
+    except Exception as e:
+        logger.exception("Job failed", extra={"job_id": job.id, "kind": job.kind})
+        finish_job(job, Job.Status.FAILED, error=str(e))
+    else:
+        finish_job(job, Job.Status.SUCCEEDED, result=result or {})
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Requeue running jobs whose worker stopped sending heartbeats, or fail
+    them once they have used up `JOB_MAX_ATTEMPTS`.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.Status.RUNNING,
+        heartbeat_at__lt=now - timedelta(seconds=settings.JOB_STALE_SECONDS),
+    )
+    failed = stale.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS).update(
+        status=Job.Status.FAILED,
+        error="Worker stopped responding.",
+        finished_at=now,
+        updated_at=now,
+    )
+    requeued = stale.update(status=Job.Status.QUEUED, worker="", updated_at=now)
+    return failed + requeued
+
+
+class Worker:
+    """
+    Claims and runs jobs until stopped. With `burst` it exits once the
+    queue is empty instead of polling.
+    """
+
+    def __init__(self, name: str, poll_interval: float, burst: bool = False):
+        self.name = name
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.stopped = threading.Event()
+
+    def stop(self, *args) -> None:
+        self.stopped.set()
+
+    def run(self) -> int:
+        processed = 0
+        while not self.stopped.is_set():
+            close_old_connections()
+            job = claim_job(self.name)
+            if job is not None:
+                run_job(job)
+                processed += 1
+                continue
+
+            if requeue_stale_jobs():
+                continue
+            fail_stale_uploads()
+            if self.burst:
+                break
+            self.stopped.wait(self.poll_interval)
+        return processed
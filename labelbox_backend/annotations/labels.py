@@ -0,0 +1,85 @@
+import json
+from collections.abc import Iterable
+
+from .models import AnnotationLabel, Annotations, Label
+
+LABEL_SEPARATORS = (";", "\n")
+LABEL_MAX_LENGTH = Label._meta.get_field("name").max_length
+
+
+def parse_labels(labels: str) -> list[str]:
+    """
+    Split a free-form `labels` string into distinct label names.
+
+    Accepts a JSON array of strings or names separated by commas,
+    semicolons or newlines. Order is kept and duplicates are dropped.
+    """
+    if not labels or not labels.strip():
+        return []
+
+    names = None
+    if labels.lstrip().startswith("["):
+        try:
+            decoded = json.loads(labels)
+        except ValueError:
+            decoded = None
+        if isinstance(decoded, list):
+            names = [str(name) for name in decoded]
+
+    if names is None:
+        for separator in LABEL_SEPARATORS:
+            labels = labels.replace(separator, ",")
+        names = labels.split(",")
+
+    cleaned = (name.strip()[:LABEL_MAX_LENGTH] for name in names)
+    return list(dict.fromkeys(name for name in cleaned if name))
+
+
+def sync_annotation_labels(
+    annotations: Iterable[tuple[Annotations, int]],
+    replace: bool = False,
+) -> None:
+    """
+    Link annotations to their project's `Label` rows.
+
+    Takes `(annotation, project_id)` pairs. Missing labels are created in
+    one insert, looked up in one query, and all links are written with a
+    single `bulk_create`. With `replace`, existing links are removed first.
+    """
+    parsed = [
+        (annotation, project_id, parse_labels(annotation.labels))
+        for annotation, project_id in annotations
+    ]
+    if replace:
+        AnnotationLabel.objects.filter(
+            annotation_id__in=[annotation.id for annotation, _, _ in parsed]
+        ).delete()
+
+    wanted = {(project_id, name) for _, project_id, names in parsed for name in names}
+    if not wanted:
+        return
+
+    Label.objects.bulk_create(
+        [Label(project_id=project_id, name=name) for project_id, name in wanted],
+        ignore_conflicts=True,
+    )
+    label_ids = {
+        (project_id, name): label_id
+        for label_id, project_id, name in Label.objects.filter(
+            project_id__in={project_id for project_id, _ in wanted},
+            name__in={name for _, name in wanted},
+        ).values_list("id", "project_id", "name")
+    }
+
+    AnnotationLabel.objects.bulk_create(
+        [
+            AnnotationLabel(
+                annotation_id=annotation.id,
+                label_id=label_ids[project_id, name],
+                task_id=annotation.task_id,
+            )
+            for annotation, project_id, names in parsed
+            for name in names
+        ],
+        batch_size=1000,
+    )
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+async def read_response(reader: asyncio.StreamReader) -> tuple[int, bool]:
+    """
+    Read one HTTP/1.1 response; return its status code and whether the
+    server keeps the connection open. Gunicorn's sync workers close it
+    after every response.
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Server closed the connection.")
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding") == "chunked":
+        while size := int((await reader.readline()).split(b";")[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers.get("connection", "").lower() != "close"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure requests per second of running API servers. Start the WSGI "
+        "and ASGI servers, e.g. `gunicorn -w 4 labelbox_backend.wsgi` and "
+        "`gunicorn -w 4 -k uvicorn.workers.UvicornWorker labelbox_backend.asgi "
+        "-b :8001`, then pass one --target per server, such as "
+        "`wsgi=http://127.0.0.1:8000/api` and "
+        "`asgi=http://127.0.0.1:8001/api/async`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            action="append",
+            required=True,
+            help="name=base_url of a server to benchmark; repeatable.",
+        )
+        parser.add_argument(
+            "--path",
+            action="append",
+            help="Path under each base URL to request; repeatable.",
+        )
+        parser.add_argument("--token", help="JWT access token to send.")
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--warmup", type=float, default=2.0)
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    async def client(self, base_url, paths, headers, deadline, latencies, statuses):
+        url = urlsplit(base_url)
+        writer = None
+        try:
+            index = 0
+            while time.perf_counter() < deadline:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(
+                        url.hostname, url.port or 80
+                    )
+                path = f"{url.path.rstrip('/')}{paths[index % len(paths)]}"
+                index += 1
+                request = f"GET {path} HTTP/1.1\r\nHost: {url.netloc}\r\n{headers}\r\n"
+
+                started_at = time.perf_counter()
+                writer.write(request.encode())
+                await writer.drain()
+                status, keep_alive = await read_response(reader)
+                latencies.append(time.perf_counter() - started_at)
+                statuses[status] = statuses.get(status, 0) + 1
+                if not keep_alive:
+                    writer.close()
+                    writer = None
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def run_target(self, base_url, paths, headers, duration, concurrency):
+        latencies, statuses = [], {}
+        deadline = time.perf_counter() + duration
+        started_at = time.perf_counter()
+        await asyncio.gather(
+            *(
+                self.client(base_url, paths, headers, deadline, latencies, statuses)
+                for _ in range(concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - started_at
+        return latencies, statuses, elapsed
+
+    def benchmark(self, base_url, paths, options) -> dict:
+        headers = "Connection: keep-alive\r\n"
+        if options["token"]:
+            headers += f"Authorization: Bearer {options['token']}\r\n"
+
+        if options["warmup"]:
+            asyncio.run(
+                self.run_target(
+                    base_url, paths, headers, options["warmup"], options["concurrency"]
+                )
+            )
+        latencies, statuses, elapsed = asyncio.run(
+            self.run_target(
+                base_url, paths, headers, options["duration"], options["concurrency"]
+            )
+        )
+        if not latencies:
+            raise CommandError(f"No responses from {base_url}.")
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        return {
+            "base_url": base_url,
+            "requests": len(latencies),
+            "requests_per_second": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentiles[49] * 1000, 2),
+            "p95_ms": round(percentiles[94] * 1000, 2),
+            "p99_ms": round(percentiles[98] * 1000, 2),
+            "statuses": statuses,
+        }
+
+    def handle(self, *args, **options):
+        paths = options["path"] or ["/projects/", "/metrics"]
+        results = {}
+        for target in options["target"]:
+            name, _, base_url = target.partition("=")
+            if not base_url:
+                raise CommandError(f"Expected name=base_url, got '{target}'.")
+
+            result = self.benchmark(base_url, paths, options)
+            results[name] = result
+            self.stdout.write(
+                f"{name}: {result['requests_per_second']} req/s, "
+                f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+                f"p99 {result['p99_ms']} ms, statuses {result['statuses']}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(
+                    {
+                        "paths": paths,
+                        "concurrency": options["concurrency"],
+                        "duration": options["duration"],
+                        "targets": results,
+                    },
+                    output,
+                    indent=2,
+                )
@@ -0,0 +1,127 @@
+import json
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.utils import timezone
+from ninja.parser import Parser
+from ninja.renderers import JSONRenderer
+
+from annotations.dtos import AnnotationResponseSchema, Paginator
+from annotations.renderers import (
+    FastJSONParser,
+    FastJSONRenderer,
+    encoder,
+    loads,
+    orjson,
+)
+
+
+def annotation_page(size: int, data_keys: int) -> dict:
+    """A page of annotations as ninja hands it to the renderer."""
+    now = timezone.now()
+    rows = []
+    for index in range(size):
+        x, y = random.uniform(0, 1000), random.uniform(0, 1000)
+        rows.append(
+            AnnotationResponseSchema(
+                id=index + 1,
+                task_id=index // 10 + 1,
+                coordinates=f"{x:.1f},{y:.1f},{x + 50:.1f},{y + 40:.1f}",
+                labels="car, truck",
+                data={
+                    f"attribute_{key}": {
+                        "value": random.random(),
+                        "tags": ["occluded", "truncated"],
+                        "reviewer": {"id": key, "accepted": key % 2 == 0},
+                    }
+                    for key in range(data_keys)
+                },
+                geometry={"type": "bbox", "points": [x, y, x + 50, y + 40]},
+                created_at=now - timedelta(seconds=index),
+            )
+        )
+    return Paginator.Output[AnnotationResponseSchema](
+        total=size,
+        page_size=size,
+        page_index=1,
+        nb_pages=1,
+        previous=None,
+        next=None,
+        data=rows,
+    ).model_dump()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of ninja's default JSON renderer and parser "
+        "with the ones the APIs use, on pages of annotations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=1000)
+        parser.add_argument(
+            "--data-keys",
+            type=int,
+            default=8,
+            help="Entries in each annotation's nested `data` object.",
+        )
+        parser.add_argument("--iterations", type=int, default=50)
+
+    def measure(self, function, iterations: int) -> float:
+        function()
+        started_at = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        return (time.perf_counter() - started_at) / iterations
+
+    def report(self, name: str, baseline: float, fast: float, size: int) -> None:
+        self.stdout.write(
+            f"{name}: "
+            f"json {baseline * 1000:.2f} ms ({size / baseline / 1e6:.1f} MB/s), "
+            f"fast {fast * 1000:.2f} ms ({size / fast / 1e6:.1f} MB/s), "
+            f"{baseline / fast:.1f}x"
+        )
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        page = annotation_page(options["page_size"], options["data_keys"])
+        self.stdout.write(
+            f"Encoder: {'orjson ' + orjson.__version__ if orjson else 'json'}; "
+            f"{options['page_size']} annotations per page"
+        )
+
+        renderers = (JSONRenderer(), FastJSONRenderer())
+        content = [
+            renderer.render(None, page, response_status=200) for renderer in renderers
+        ]
+        if loads(content[1]) != json.loads(encoder.encode(page)):
+            self.stderr.write("orjson and the json fallback disagree on the page.")
+        self.report(
+            "render",
+            *(
+                self.measure(
+                    lambda renderer=renderer: renderer.render(
+                        None, page, response_status=200
+                    ),
+                    iterations,
+                )
+                for renderer in renderers
+            ),
+            len(content[1]),
+        )
+
+        body = content[0].encode()
+        request = RequestFactory().post("/", body, content_type="application/json")
+        self.report(
+            "parse",
+            *(
+                self.measure(
+                    lambda parser=parser: parser.parse_body(request), iterations
+                )
+                for parser in (Parser(), FastJSONParser())
+            ),
+            len(body),
+        )
@@ -0,0 +1,155 @@
+import json
+import os
+import platform
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from annotations.benchmarks import (
+    SKIPPED,
+    build_fixture,
+    cases,
+    compare,
+    run_cases,
+    uncovered,
+)
+from annotations.models import Annotations, Project, Task
+from annotations.synthetic import SYNTHETIC_PREFIX, synthetic_users
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every use case and paginator path on the data `seed_synthetic` "
+        "wrote, save the results under the current commit and, with "
+        "--compare, fail on regressions against an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prefix", default=SYNTHETIC_PREFIX)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument(
+            "--case",
+            action="append",
+            help="Only run cases whose name contains this; repeatable.",
+        )
+        parser.add_argument(
+            "--output",
+            help="JSON file for the results; by default "
+            "benchmarks/usecases-<commit>.json.",
+        )
+        parser.add_argument("--compare", help="Results of an earlier run.")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Fraction a median may grow by before it counts as a regression.",
+        )
+        parser.add_argument(
+            "--noise-ms",
+            type=float,
+            default=0.5,
+            help="Median growth below this many milliseconds is ignored.",
+        )
+
+    def dataset(self, prefix: str) -> dict:
+        users = synthetic_users(prefix)
+        return {
+            "prefix": prefix,
+            "users": users.count(),
+            "projects": Project.objects.filter(user__in=users).count(),
+            "tasks": Task.objects.filter(project__user__in=users).count(),
+            "annotations": Annotations.objects.filter(
+                task__project__user__in=users
+            ).count(),
+        }
+
+    def handle(self, *args, **options):
+        try:
+            fixture = build_fixture(options["prefix"])
+        except ValueError as e:
+            raise CommandError(f"{e} Run `seed_synthetic` first.")
+
+        names = [
+            name
+            for name in cases
+            if not options["case"] or any(part in name for part in options["case"])
+        ]
+        if not names:
+            raise CommandError("No case matches --case.")
+        for name in uncovered():
+            self.stderr.write(f"{name} has no benchmark case.")
+
+        results = {}
+        for name, result in run_cases(
+            fixture, names, options["repeat"], options["warmup"]
+        ):
+            results[name] = result
+            self.stdout.write(
+                f"{name:<28} median {result['median_ms']:>9.3f} ms  "
+                f"p95 {result['p95_ms']:>9.3f} ms  {result['queries']:>3} queries"
+            )
+
+        revision = git_revision()
+        report = {
+            "revision": revision,
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "count_strategy": settings.PAGINATION_COUNT_STRATEGY,
+            "dataset": self.dataset(options["prefix"]),
+            "repeat": options["repeat"],
+            "skipped": SKIPPED,
+            "cases": results,
+        }
+        output = options["output"] or os.path.join(
+            settings.BASE_DIR, "benchmarks", f"usecases-{revision}.json"
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as destination:
+            json.dump(report, destination, indent=2)
+        self.stdout.write(f"Saved the results to {output}.")
+
+        if options["compare"]:
+            self.check_baseline(report, options)
+
+    def check_baseline(self, report: dict, options: dict) -> None:
+        with open(options["compare"]) as source:
+            baseline = json.load(source)
+
+        for key in ("database", "dataset"):
+            if baseline.get(key) != report[key]:
+                self.stderr.write(
+                    f"The baseline ran with a different {key}: {baseline.get(key)}."
+                )
+
+        regressions = compare(
+            report["cases"],
+            baseline["cases"],
+            options["threshold"],
+            options["noise_ms"],
+        )
+        if regressions:
+            raise CommandError(
+                f"Regressions against {baseline['revision']}:\n"
+                + "\n".join(regressions)
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"No regressions against {baseline['revision']}.")
+        )
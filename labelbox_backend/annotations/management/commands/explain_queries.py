@@ -0,0 +1,109 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from annotations.models import Annotations, Project, ProjectCounters, Task
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the query plans and timings of the hot list queries. Run it "
+        "before and after a schema change and compare the saved outputs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="User id to query for.")
+        parser.add_argument("--project", type=int, help="Project id to query for.")
+        parser.add_argument("--task", type=int, help="Task id to query for.")
+        parser.add_argument("--runs", type=int, default=20)
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+
+    def pick_targets(self, options) -> tuple[int, int, int]:
+        """Default to the busiest project and task so plans reflect real load."""
+        project_id = options["project"]
+        if project_id is None:
+            project_id = (
+                ProjectCounters.objects.order_by("-annotations")
+                .values_list("project_id", flat=True)
+                .first()
+            )
+        task_id = options["task"]
+        if task_id is None:
+            task_id = (
+                Annotations.objects.filter(task__project_id=project_id)
+                .values_list("task_id")
+                .annotate(total=Count("id"))
+                .order_by("-total")
+                .values_list("task_id", flat=True)
+                .first()
+            )
+        user_id = options["user"]
+        if user_id is None:
+            user_id = (
+                Project.objects.filter(id=project_id)
+                .values_list("user_id", flat=True)
+                .first()
+            )
+        if None in (project_id, task_id, user_id):
+            raise CommandError("No data to explain; pass --user/--project/--task.")
+        return user_id, project_id, task_id
+
+    def time_query(self, queryset, runs: int) -> float:
+        timings = []
+        for _ in range(runs):
+            started_at = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - started_at) * 1000)
+        return round(statistics.median(timings), 3)
+
+    def handle(self, *args, **options):
+        user_id, project_id, task_id = self.pick_targets(options)
+
+        queries = {
+            "list_projects": Project.objects.filter(user_id=user_id).order_by(
+                "-created_at"
+            )[:10],
+            "list_tasks": Task.objects.filter(project_id=project_id).order_by(
+                "-created_at"
+            )[:10],
+            "list_annotations": Annotations.objects.filter(task_id=task_id).order_by(
+                "-created_at"
+            )[:10],
+            "recent_annotations": Annotations.objects.filter(
+                task__project__user_id=user_id
+            ).order_by("-created_at", "-id")[:5],
+        }
+
+        explain_options = {}
+        if connection.vendor == "postgresql":
+            explain_options = {"analyze": True, "buffers": True}
+
+        results = {}
+        for name, queryset in queries.items():
+            plan = queryset.explain(**explain_options)
+            median_ms = self.time_query(queryset, options["runs"])
+            results[name] = {"median_ms": median_ms, "plan": plan}
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name}: {median_ms} ms"))
+            self.stdout.write(plan)
+            self.stdout.write("")
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(
+                    {
+                        "vendor": connection.vendor,
+                        "targets": {
+                            "user": user_id,
+                            "project": project_id,
+                            "task": task_id,
+                        },
+                        "queries": results,
+                    },
+                    output,
+                    indent=2,
+                )
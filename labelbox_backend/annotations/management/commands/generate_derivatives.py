@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from annotations.derivatives import derivative_pool, retryable
+from annotations.models import Task, TilePyramid
+
+
+class Command(BaseCommand):
+    help = (
+        "Build thumbnails and tile pyramids that are missing, failed, or were "
+        "left unfinished by a restarted server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stale-minutes",
+            type=int,
+            default=settings.DERIVATIVE_STALE_SECONDS // 60,
+            help="Rebuild pending or processing pyramids untouched for this long.",
+        )
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Also build pyramids for task images that never had one.",
+        )
+
+    def handle(self, *args, **options):
+        stale_before = timezone.now() - timedelta(minutes=options["stale_minutes"])
+        pyramids = TilePyramid.objects.filter(retryable(stale_before)).order_by("id")
+
+        built = 0
+        for pyramid in pyramids.iterator():
+            derivative_pool.build(pyramid)
+            built += 1
+
+        if options["missing"]:
+            urls = (
+                Task.objects.exclude(url__in=TilePyramid.objects.values("source_url"))
+                .values_list("url", flat=True)
+                .distinct()
+            )
+            for url in urls.iterator():
+                derivative_pool.generate(url)
+                built += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {built} images."))
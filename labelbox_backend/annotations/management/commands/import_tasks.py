@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from annotations.models import Project
+from annotations.parsers import (
+    MANIFEST_FORMATS,
+    guess_manifest_format,
+    iter_manifest_urls,
+)
+from annotations.usecases import ImportTasksUseCase
+
+
+class Command(BaseCommand):
+    help = "Create tasks for a project from a CSV or NDJSON manifest of image URLs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("project_id", type=int)
+        parser.add_argument("manifest", help="Path to the manifest file.")
+        parser.add_argument("--format", choices=MANIFEST_FORMATS)
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(id=options["project_id"])
+        except Project.DoesNotExist:
+            raise CommandError("Project does not exist.")
+
+        fmt = options["format"] or guess_manifest_format(options["manifest"], None)
+
+        with open(options["manifest"], "rb") as manifest:
+            use_case = ImportTasksUseCase(
+                project_id=project.id,
+                urls=iter_manifest_urls(manifest, fmt),
+                user=project.user,
+            )
+            for report in use_case.execute():
+                self.stdout.write(
+                    "processed={processed} created={created} "
+                    "duplicates={duplicates} invalid={invalid} "
+                    "rows/s={rows_per_second}".format(**report)
+                )
+
+        self.stdout.write(self.style.SUCCESS("Import finished."))
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from annotations.models import Project
+from annotations.purging import purge_project
+
+
+class Command(BaseCommand):
+    help = (
+        "Purge projects that were deleted in the background but whose purge "
+        "job failed, was cancelled or never ran."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        project_ids = Project.all_objects.filter(deleted_at__isnull=False).values_list(
+            "id", flat=True
+        )
+
+        for project_id in project_ids:
+            purged = purge_project(
+                project_id, options["batch_size"], lambda progress: None
+            )
+            self.stdout.write(
+                f"Project {project_id}: {purged['tasks']} tasks, "
+                f"{purged['annotations']} annotations."
+            )
+        self.stdout.write(self.style.SUCCESS(f"Purged {len(project_ids)} projects."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from annotations.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user and per-project dashboard counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Only rebuild this user id. May be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_counters(user_ids=options["user_ids"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters for {rebuilt} users."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from annotations import async_views, views  # noqa: F401
+from annotations.response_cache import cached_endpoints, stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Show response cache hits and misses per endpoint. Counts cover every "
+        "process only when the cache is shared (RESPONSE_CACHE_URL)."
+    )
+
+    def handle(self, *args, **options):
+        for name, counts in sorted(stats(sorted(cached_endpoints)).items()):
+            lookups = counts["hits"] + counts["misses"]
+            hit_rate = counts["hits"] / lookups if lookups else 0.0
+            self.stdout.write(
+                f"{name}: {counts['hits']} hits, {counts['misses']} misses "
+                f"({hit_rate:.1%}), {counts['oversized']} too large to store"
+            )
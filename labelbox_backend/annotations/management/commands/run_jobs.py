@@ -0,0 +1,81 @@
+import multiprocessing
+import os
+import signal
+import socket
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def work(name: str, poll_interval: float, burst: bool) -> int:
+    """Run one worker until it is sent SIGTERM or SIGINT."""
+    from annotations.jobs import Worker
+
+    worker = Worker(name=name, poll_interval=poll_interval, burst=burst)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    return worker.run()
+
+
+def spawned_work(name: str, poll_interval: float, burst: bool) -> None:
+    import django
+
+    django.setup()
+    work(name, poll_interval, burst)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background jobs. Workers claim queued jobs with SELECT ... FOR "
+        "UPDATE SKIP LOCKED, so any number of them may run on any host."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=settings.JOB_WORKER_PROCESSES,
+            help="Worker processes to start; 1 runs in this process.",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=settings.JOB_POLL_INTERVAL
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue is empty instead of waiting for jobs.",
+        )
+
+    def handle(self, *args, **options):
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        poll_interval, burst = options["poll_interval"], options["burst"]
+
+        if options["processes"] <= 1:
+            processed = work(prefix, poll_interval, burst)
+            self.stdout.write(self.style.SUCCESS(f"Ran {processed} jobs."))
+            return
+
+        connections.close_all()
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(
+                target=spawned_work,
+                args=(f"{prefix}/{index}", poll_interval, burst),
+                name=f"job-worker-{index}",
+            )
+            for index in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+
+        def forward(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    os.kill(process.pid, signal.SIGTERM)
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
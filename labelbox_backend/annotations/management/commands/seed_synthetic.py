@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from annotations.synthetic import SYNTHETIC_PREFIX, SyntheticDataset, synthetic_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users, projects, tasks and annotations for "
+        "benchmarks. Each unit of --scale is one user with its projects."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=int, default=1)
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed; the same scale and seed give the same data.",
+        )
+        parser.add_argument(
+            "--prefix",
+            default=SYNTHETIC_PREFIX,
+            help="Usernames are '<prefix>-<n>'.",
+        )
+        parser.add_argument("--projects-per-user", type=int, default=4)
+        parser.add_argument("--tasks-per-project", type=int, default=250)
+        parser.add_argument(
+            "--annotations-per-task",
+            type=int,
+            default=8,
+            help="Mean of a long-tailed distribution.",
+        )
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Delete an existing dataset with the same prefix first.",
+        )
+
+    def handle(self, *args, **options):
+        if options["scale"] < 1:
+            raise CommandError("--scale must be at least 1.")
+
+        existing = synthetic_users(options["prefix"])
+        if options["replace"]:
+            deleted, _ = existing.delete()
+            self.stdout.write(f"Deleted {deleted} rows of the previous dataset.")
+
+        dataset = SyntheticDataset(
+            scale=options["scale"],
+            seed=options["seed"],
+            prefix=options["prefix"],
+            projects_per_user=options["projects_per_user"],
+            tasks_per_project=options["tasks_per_project"],
+            annotations_per_task=options["annotations_per_task"],
+        )
+        started_at = time.monotonic()
+        try:
+            for stats in dataset.generate():
+                self.stdout.write(
+                    f"{stats['users']}/{options['scale']} users, "
+                    f"{stats['projects']} projects, {stats['tasks']} tasks, "
+                    f"{stats['annotations']} annotations"
+                )
+        except ValueError as e:
+            raise CommandError(f"{e} Pass --replace or another --prefix.")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {dataset.stats['annotations']} annotations in "
+                f"{time.monotonic() - started_at:.1f}s."
+            )
+        )
@@ -0,0 +1,87 @@
+# Generated by Django 5.1.4 on 2026-10-17 03:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    Project = apps.get_model("annotations", "Project")
+    Task = apps.get_model("annotations", "Task")
+    Annotations = apps.get_model("annotations", "Annotations")
+    ProjectCounters = apps.get_model("annotations", "ProjectCounters")
+    UserCounters = apps.get_model("annotations", "UserCounters")
+
+    task_counts = dict(
+        Task.objects.values_list("project_id").annotate(total=Count("id"))
+    )
+    annotation_counts = dict(
+        Annotations.objects.values_list("task__project_id").annotate(total=Count("id"))
+    )
+
+    project_rows, user_rows = [], {}
+    for project_id, user_id in Project.objects.values_list("id", "user_id"):
+        tasks = task_counts.get(project_id, 0)
+        annotations = annotation_counts.get(project_id, 0)
+        project_rows.append(
+            ProjectCounters(project_id=project_id, tasks=tasks, annotations=annotations)
+        )
+        totals = user_rows.setdefault(
+            user_id, {"projects": 0, "tasks": 0, "annotations": 0}
+        )
+        totals["projects"] += 1
+        totals["tasks"] += tasks
+        totals["annotations"] += annotations
+
+    ProjectCounters.objects.bulk_create(project_rows, batch_size=1000)
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=uid, **totals) for uid, totals in user_rows.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("annotations", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectCounters",
+            fields=[
+                (
+                    "project",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="counters",
+                        serialize=False,
+                        to="annotations.project",
+                    ),
+                ),
+                ("tasks", models.BigIntegerField(default=0)),
+                ("annotations", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="UserCounters",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="counters",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("projects", models.BigIntegerField(default=0)),
+                ("tasks", models.BigIntegerField(default=0)),
+                ("annotations", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Step 1 of moving created_at/updated_at from DateField to DateTimeField
+# without rewriting or locking populated tables: add nullable shadow columns.
+# Adding a nullable column without a default is a metadata-only change.
+
+from django.db import migrations, models
+
+MODELS = ["project", "task", "annotations"]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("annotations", "0002_counters"),
+    ]
+
+    operations = [
+        operation
+        for model_name in MODELS
+        for operation in (
+            migrations.AddField(
+                model_name=model_name,
+                name="created_at_ts",
+                field=models.DateTimeField(null=True),
+            ),
+            migrations.AddField(
+                model_name=model_name,
+                name="updated_at_ts",
+                field=models.DateTimeField(null=True),
+            ),
+        )
+    ]
@@ -0,0 +1,109 @@
+# Step 2: give the shadow columns a database default so rows written by the
+# still-running old code are covered, backfill existing rows in id-range
+# batches (each batch commits on its own), then make the columns NOT NULL.
+# On PostgreSQL the NOT NULL is proven by a CHECK constraint that is added
+# NOT VALID and validated separately, so no step scans the table while
+# holding an exclusive lock.
+
+from django.db import migrations, models
+from django.db.models.functions import Cast
+
+from annotations.migration_operations import RunSQLOnPostgres
+
+BATCH_SIZE = 10000
+TABLES = {
+    "project": "annotations_project",
+    "task": "annotations_task",
+    "annotations": "annotations_annotations",
+}
+COLUMNS = ["created_at_ts", "updated_at_ts"]
+
+
+def backfill(apps, schema_editor):
+    for model_name in TABLES:
+        model = apps.get_model("annotations", model_name)
+        last_id = model.objects.order_by("-id").values_list("id", flat=True).first()
+        for start in range(0, (last_id or 0) + 1, BATCH_SIZE):
+            model.objects.filter(
+                id__gte=start,
+                id__lt=start + BATCH_SIZE,
+                created_at_ts__isnull=True,
+            ).update(
+                created_at_ts=Cast("created_at", models.DateTimeField()),
+                updated_at_ts=Cast("updated_at", models.DateTimeField()),
+            )
+
+
+def set_default_sql(table: str) -> RunSQLOnPostgres:
+    return RunSQLOnPostgres(
+        sql=[
+            f"ALTER TABLE {table} ALTER COLUMN {column} SET DEFAULT now()"
+            for column in COLUMNS
+        ],
+        reverse_sql=[
+            f"ALTER TABLE {table} ALTER COLUMN {column} DROP DEFAULT"
+            for column in COLUMNS
+        ],
+    )
+
+
+def not_null_check_sql(table: str) -> list[RunSQLOnPostgres]:
+    return [
+        RunSQLOnPostgres(
+            sql=[
+                f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_not_null "
+                f"CHECK ({column} IS NOT NULL) NOT VALID"
+                for column in COLUMNS
+            ],
+            reverse_sql=[
+                f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS "
+                f"{table}_{column}_not_null"
+                for column in COLUMNS
+            ],
+        ),
+        RunSQLOnPostgres(
+            sql=[
+                f"ALTER TABLE {table} VALIDATE CONSTRAINT {table}_{column}_not_null"
+                for column in COLUMNS
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
+
+
+def drop_check_sql(table: str) -> RunSQLOnPostgres:
+    return RunSQLOnPostgres(
+        sql=[
+            f"ALTER TABLE {table} DROP CONSTRAINT {table}_{column}_not_null"
+            for column in COLUMNS
+        ],
+        reverse_sql=migrations.RunSQL.noop,
+    )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("annotations", "0003_add_timestamp_columns"),
+    ]
+
+    operations = [
+        *[set_default_sql(table) for table in TABLES.values()],
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        *[
+            operation
+            for table in TABLES.values()
+            for operation in not_null_check_sql(table)
+        ],
+        *[
+            migrations.AlterField(
+                model_name=model_name,
+                name=column,
+                field=models.DateTimeField(),
+            )
+            for model_name in TABLES
+            for column in COLUMNS
+        ],
+        *[drop_check_sql(table) for table in TABLES.values()],
+    ]
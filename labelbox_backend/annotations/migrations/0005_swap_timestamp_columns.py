@@ -0,0 +1,57 @@
+# Step 3: swap the backfilled columns in for the old DateFields. Dropping
+# and renaming columns only touches the catalog, so the exclusive lock this
+# transaction takes is held for milliseconds. Rows the old code inserts
+# after this point still get a value: it writes a date, which PostgreSQL
+# casts to a timestamp.
+
+from django.db import migrations, models
+
+from annotations.migration_operations import RunSQLOnPostgres
+
+TABLES = {
+    "project": "annotations_project",
+    "task": "annotations_task",
+    "annotations": "annotations_annotations",
+}
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("annotations", "0004_backfill_timestamp_columns"),
+    ]
+
+    operations = [
+        operation
+        for model_name, table in TABLES.items()
+        for operation in (
+            migrations.RemoveField(model_name=model_name, name="created_at"),
+            migrations.RemoveField(model_name=model_name, name="updated_at"),
+            migrations.RenameField(
+                model_name=model_name,
+                old_name="created_at_ts",
+                new_name="created_at",
+            ),
+            migrations.RenameField(
+                model_name=model_name,
+                old_name="updated_at_ts",
+                new_name="updated_at",
+            ),
+            migrations.AlterField(
+                model_name=model_name,
+                name="created_at",
+                field=models.DateTimeField(auto_now_add=True),
+            ),
+            migrations.AlterField(
+                model_name=model_name,
+                name="updated_at",
+                field=models.DateTimeField(auto_now=True),
+            ),
+            RunSQLOnPostgres(
+                sql=[
+                    f"ALTER TABLE {table} ALTER COLUMN created_at DROP DEFAULT",
+                    f"ALTER TABLE {table} ALTER COLUMN updated_at DROP DEFAULT",
+                ],
+                reverse_sql=migrations.RunSQL.noop,
+            ),
+        )
+    ]
@@ -0,0 +1,35 @@
+# Step 4: composite indexes for the hot list queries, built with
+# CREATE INDEX CONCURRENTLY on PostgreSQL so writes are not blocked.
+
+from django.db import migrations, models
+
+from annotations.migration_operations import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("annotations", "0005_swap_timestamp_columns"),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name="project",
+            index=models.Index(
+                fields=["user", "created_at"], name="project_user_created_idx"
+            ),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name="task",
+            index=models.Index(
+                fields=["project", "created_at"], name="task_project_created_idx"
+            ),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name="annotations",
+            index=models.Index(
+                fields=["task", "created_at"], name="annotation_task_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.1.4 on 2026-10-17 03:59
+
+import json
+
+from django.db import migrations, models
+
+from annotations.migration_operations import AddIndexConcurrentlyIfSupported
+
+BATCH_SIZE = 5000
+GEOMETRY_FIELDS = (
+    "geometry_type",
+    "points",
+    "bbox_x_min",
+    "bbox_y_min",
+    "bbox_x_max",
+    "bbox_y_max",
+)
+
+
+# A frozen copy of how `annotations.geometry` read boxes from coordinates
+# when this migration was written, so later changes cannot alter the backfill.
+def parse_bbox(coordinates):
+    """Read an `[x, y, width, height]` box, or return None."""
+    try:
+        values = json.loads(coordinates)
+    except ValueError:
+        values = coordinates.split(",")
+
+    if not isinstance(values, list) or len(values) != 4:  # noqa: PLR2004
+        return None
+    try:
+        return [float(value) for value in values]
+    except (TypeError, ValueError):
+        return None
+
+
+def backfill_geometry(apps, schema_editor):
+    """Derive boxes for existing annotations whose coordinates hold one."""
+    Annotations = apps.get_model("annotations", "Annotations")
+    last_id = Annotations.objects.order_by("-id").values_list("id", flat=True).first()
+    for start in range(0, (last_id or 0) + 1, BATCH_SIZE):
+        batch = Annotations.objects.filter(
+            id__gte=start, id__lt=start + BATCH_SIZE, geometry_type=""
+        ).exclude(coordinates="")
+        updated = []
+        for annotation in batch.only("id", "coordinates"):
+            bbox = parse_bbox(annotation.coordinates)
+            if bbox is None:
+                continue
+            x, y, width, height = bbox
+            annotation.geometry_type = "bbox"
+            annotation.points = [x, y, x + width, y + height]
+            annotation.bbox_x_min = min(x, x + width)
+            annotation.bbox_y_min = min(y, y + height)
+            annotation.bbox_x_max = max(x, x + width)
+            annotation.bbox_y_max = max(y, y + height)
+            updated.append(annotation)
+        Annotations.objects.bulk_update(updated, GEOMETRY_FIELDS)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("annotations", "0006_timestamp_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="annotations",
+            name="bbox_x_max",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="annotations",
+            name="bbox_x_min",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="annotations",
+            name="bbox_y_max",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="annotations",
+            name="bbox_y_min",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="annotations",
+            name="geometry_type",
+            field=models.CharField(
+                blank=True,
+                choices=[("bbox", "Bounding box"), ("polygon", "Polygon")],
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="annotations",
+            name="points",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(backfill_geometry, migrations.RunPython.noop),
+        AddIndexConcurrentlyIfSupported(
+            model_name="annotations",
+            index=models.Index(
+                fields=["task", "bbox_x_min", "bbox_y_min", "bbox_x_max", "bbox_y_max"],
+                name="annotation_task_bbox_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.1.4 on 2026-10-17 04:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("annotations", "0007_annotation_geometry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Label",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=256)),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="labels",
+                        to="annotations.project",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="AnnotationLabel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "annotation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="label_links",
+                        to="annotations.annotations",
+                    ),
+                ),
+                (
+                    "task",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="annotations.task",
+                    ),
+                ),
+                (
+                    "label",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="annotation_links",
+                        to="annotations.label",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="annotations",
+            name="label_set",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="annotations",
+                through="annotations.AnnotationLabel",
+                to="annotations.label",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="label",
+            constraint=models.UniqueConstraint(
+                fields=("project", "name"), name="label_project_name_unique"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="annotationlabel",
+            index=models.Index(
+                fields=["task", "label"], name="annotation_label_task_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="annotationlabel",
+            constraint=models.UniqueConstraint(
+                fields=("annotation", "label"), name="annotation_label_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# One-time backfill of the label taxonomy from the free-form `labels` text.
+# Runs outside a single transaction so each batch commits on its own.
+# The parser is a frozen copy of `annotations.labels.parse_labels` as it was
+# when this migration was written, so later changes to the app cannot alter
+# or break the backfill.
+
+import json
+
+from django.db import migrations
+
+BATCH_SIZE = 5000
+LABEL_SEPARATORS = (";", "\n")
+LABEL_MAX_LENGTH = 256
+
+
+def parse_labels(labels):
+    if not labels or not labels.strip():
+        return []
+
+    names = None
+    if labels.lstrip().startswith("["):
+        try:
+            decoded = json.loads(labels)
+        except ValueError:
+            decoded = None
+        if isinstance(decoded, list):
+            names = [str(name) for name in decoded]
+
+    if names is None:
+        for separator in LABEL_SEPARATORS:
+            labels = labels.replace(separator, ",")
+        names = labels.split(",")
+
+    cleaned = (name.strip()[:LABEL_MAX_LENGTH] for name in names)
+    return list(dict.fromkeys(name for name in cleaned if name))
+
+
+def backfill_labels(apps, schema_editor):
+    Annotations = apps.get_model("annotations", "Annotations")
+    Label = apps.get_model("annotations", "Label")
+    AnnotationLabel = apps.get_model("annotations", "AnnotationLabel")
+
+    label_ids = {}
+    last_id = Annotations.objects.order_by("-id").values_list("id", flat=True).first()
+    for start in range(0, (last_id or 0) + 1, BATCH_SIZE):
+        batch = (
+            Annotations.objects.filter(id__gte=start, id__lt=start + BATCH_SIZE)
+            .exclude(labels="")
+            .values_list("id", "task_id", "task__project_id", "labels")
+        )
+        rows = [
+            (annotation_id, task_id, project_id, parse_labels(labels))
+            for annotation_id, task_id, project_id, labels in batch
+        ]
+
+        missing = {
+            (project_id, name)
+            for _, _, project_id, names in rows
+            for name in names
+            if (project_id, name) not in label_ids
+        }
+        if missing:
+            Label.objects.bulk_create(
+                [
+                    Label(project_id=project_id, name=name)
+                    for project_id, name in missing
+                ],
+                ignore_conflicts=True,
+            )
+            for label_id, project_id, name in Label.objects.filter(
+                project_id__in={project_id for project_id, _ in missing},
+                name__in={name for _, name in missing},
+            ).values_list("id", "project_id", "name"):
+                label_ids[project_id, name] = label_id
+
+        AnnotationLabel.objects.bulk_create(
+            [
+                AnnotationLabel(
+                    annotation_id=annotation_id,
+                    task_id=task_id,
+                    label_id=label_ids[project_id, name],
+                )
+                for annotation_id, task_id, project_id, names in rows
+                for name in names
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("annotations", "0008_label_taxonomy"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_labels, migrations.RunPython.noop),
+    ]
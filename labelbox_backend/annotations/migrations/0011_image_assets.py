@@ -0,0 +1,45 @@
+# Generated by Django 5.1.4 on 2026-10-17 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("annotations", "0010_image_uploads"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="imageupload",
+            name="sha256",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name="ImageAsset",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("sha256", models.CharField(max_length=64)),
+                ("backend", models.CharField(max_length=32)),
+                ("url", models.URLField(max_length=1024)),
+                ("content_type", models.CharField(max_length=128)),
+                ("size", models.BigIntegerField()),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("sha256", "backend"), name="image_asset_hash_unique"
+                    )
+                ],
+            },
+        ),
+    ]
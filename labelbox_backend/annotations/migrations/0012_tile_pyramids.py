@@ -0,0 +1,53 @@
+# Generated by Django 5.1.4 on 2026-10-17 04:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("annotations", "0011_image_assets"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TilePyramid",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("source_url", models.URLField(max_length=1024, unique=True)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("processing", "Processing"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("width", models.PositiveIntegerField(blank=True, null=True)),
+                ("height", models.PositiveIntegerField(blank=True, null=True)),
+                ("tile_size", models.PositiveSmallIntegerField(blank=True, null=True)),
+                ("overlap", models.PositiveSmallIntegerField(blank=True, null=True)),
+                ("format", models.CharField(blank=True, max_length=8)),
+                ("max_level", models.PositiveSmallIntegerField(blank=True, null=True)),
+                ("thumbnail_url", models.URLField(blank=True, max_length=1024)),
+                ("error", models.TextField(blank=True)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
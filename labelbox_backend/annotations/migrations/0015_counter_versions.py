@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-17 04:24
+
+import time
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("annotations", "0014_project_deleted_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="projectcounters",
+            name="version",
+            field=models.BigIntegerField(default=time.time_ns),
+        ),
+        migrations.AddField(
+            model_name="usercounters",
+            name="version",
+            field=models.BigIntegerField(default=time.time_ns),
+        ),
+    ]
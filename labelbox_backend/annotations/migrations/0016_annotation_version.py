@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-17 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("annotations", "0015_counter_versions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="annotations",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -1,11 +1,15 @@
+import time
+
 from django.contrib.auth.models import User
 from django.db import models
 from django.forms.models import model_to_dict
 
+from .geometry import BBOX, POLYGON
+
 
 class BaseModel(models.Model):
-    created_at = models.DateField(auto_now_add=True)
-    updated_at = models.DateField(auto_now=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         abstract = True
@@ -14,6 +18,13 @@ class BaseModel(models.Model):
         return model_to_dict(self)
 
 
+class AliveManager(models.Manager):
+    """Leaves out rows that are marked deleted and waiting to be purged."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Project(BaseModel):
     user = models.ForeignKey(
         User,
@@ -22,6 +33,19 @@ class Project(BaseModel):
     )
     name = models.CharField(max_length=256, db_index=True)
     description = models.TextField(blank=True)
+    # Set when the project is deleted in the background; its rows are purged
+    # by a `purge_project` job.
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = AliveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "created_at"], name="project_user_created_idx"
+            ),
+        ]
 
 
 class Task(BaseModel):
@@ -32,6 +56,13 @@ class Task(BaseModel):
         related_name="tasks",
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["project", "created_at"], name="task_project_created_idx"
+            ),
+        ]
+
 
 class Annotations(BaseModel):
     task = models.ForeignKey(
@@ -42,3 +73,238 @@ class Annotations(BaseModel):
     coordinates = models.TextField(blank=True)
     labels = models.TextField(blank=True)
     data = models.JSONField()
+    geometry_type = models.CharField(
+        max_length=16,
+        blank=True,
+        choices=[(BBOX, "Bounding box"), (POLYGON, "Polygon")],
+    )
+    # Flat [x1, y1, x2, y2, ...] list; the bbox_* columns are derived from it.
+    points = models.JSONField(default=list, blank=True)
+    bbox_x_min = models.FloatField(null=True, blank=True)
+    bbox_y_min = models.FloatField(null=True, blank=True)
+    bbox_x_max = models.FloatField(null=True, blank=True)
+    bbox_y_max = models.FloatField(null=True, blank=True)
+    # Incremented by every update; edits based on an older version are
+    # rejected instead of overwriting someone else's changes.
+    version = models.PositiveIntegerField(default=1)
+    label_set = models.ManyToManyField(
+        "Label",
+        through="AnnotationLabel",
+        related_name="annotations",
+        blank=True,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["task", "created_at"], name="annotation_task_created_idx"
+            ),
+            models.Index(
+                fields=[
+                    "task",
+                    "bbox_x_min",
+                    "bbox_y_min",
+                    "bbox_x_max",
+                    "bbox_y_max",
+                ],
+                name="annotation_task_bbox_idx",
+            ),
+        ]
+
+    @property
+    def geometry(self) -> dict | None:
+        if not self.geometry_type:
+            return None
+        return {"type": self.geometry_type, "points": self.points}
+
+
+class Label(models.Model):
+    """A class name in a project's label taxonomy."""
+
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name="labels",
+    )
+    name = models.CharField(max_length=256)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["project", "name"], name="label_project_name_unique"
+            ),
+        ]
+
+
+class AnnotationLabel(models.Model):
+    annotation = models.ForeignKey(
+        Annotations,
+        on_delete=models.CASCADE,
+        related_name="label_links",
+    )
+    label = models.ForeignKey(
+        Label,
+        on_delete=models.CASCADE,
+        related_name="annotation_links",
+    )
+    # Copied from the annotation so per-task statistics are an index-only
+    # GROUP BY instead of a join through annotations.
+    task = models.ForeignKey(
+        Task,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["annotation", "label"], name="annotation_label_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["task", "label"], name="annotation_label_task_idx"),
+        ]
+
+
+class UserCounters(models.Model):
+    """Running totals behind the dashboard, kept in step by the use cases."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="counters",
+    )
+    projects = models.BigIntegerField(default=0)
+    tasks = models.BigIntegerField(default=0)
+    annotations = models.BigIntegerField(default=0)
+    # Bumped by every write to the user's data; ETags are derived from it. A
+    # nanosecond seed keeps a recreated row from repeating an old version.
+    version = models.BigIntegerField(default=time.time_ns)
+
+
+class ProjectCounters(models.Model):
+    project = models.OneToOneField(
+        Project,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="counters",
+    )
+    tasks = models.BigIntegerField(default=0)
+    annotations = models.BigIntegerField(default=0)
+    version = models.BigIntegerField(default=time.time_ns)
+
+
+class ImageAsset(BaseModel):
+    """A stored image, indexed by content hash so copies are stored once."""
+
+    sha256 = models.CharField(max_length=64)
+    backend = models.CharField(max_length=32)
+    url = models.URLField(max_length=1024)
+    content_type = models.CharField(max_length=128)
+    size = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["sha256", "backend"], name="image_asset_hash_unique"
+            ),
+        ]
+
+
+class ImageUpload(BaseModel):
+    """An image upload handed to the storage backend in the background."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        UPLOADING = "uploading"
+        DONE = "done"
+        FAILED = "failed"
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="image_uploads",
+    )
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    backend = models.CharField(max_length=32)
+    file_name = models.CharField(max_length=256)
+    content_type = models.CharField(max_length=128)
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)
+    url = models.URLField(max_length=1024, blank=True)
+    error = models.TextField(blank=True)
+
+
+class TilePyramid(BaseModel):
+    """
+    Thumbnail and deep-zoom tiles generated for an image URL.
+
+    Keyed by URL, so an image shared by many tasks is processed once.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        PROCESSING = "processing"
+        DONE = "done"
+        FAILED = "failed"
+
+    source_url = models.URLField(max_length=1024, unique=True)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    tile_size = models.PositiveSmallIntegerField(null=True, blank=True)
+    overlap = models.PositiveSmallIntegerField(null=True, blank=True)
+    format = models.CharField(max_length=8, blank=True)
+    max_level = models.PositiveSmallIntegerField(null=True, blank=True)
+    thumbnail_url = models.URLField(max_length=1024, blank=True)
+    error = models.TextField(blank=True)
+
+    def storage_name(self, name: str) -> str:
+        return f"derivatives/{self.id}/{name}"
+
+
+class Job(BaseModel):
+    """
+    Work deferred from a request and run by `manage.py run_jobs` workers.
+
+    `kind` names a handler registered in `annotations.jobs`; `params` are its
+    arguments and `result` what it returned.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued"
+        RUNNING = "running"
+        SUCCEEDED = "succeeded"
+        FAILED = "failed"
+        CANCELLED = "cancelled"
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="jobs",
+    )
+    kind = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.QUEUED
+    )
+    params = models.JSONField(default=dict, blank=True)
+    progress = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    cancel_requested = models.BooleanField(default=False)
+    worker = models.CharField(max_length=128, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"], name="job_status_idx"),
+            models.Index(fields=["user", "created_at"], name="job_user_created_idx"),
+        ]
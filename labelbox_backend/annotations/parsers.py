@@ -0,0 +1,109 @@
+import csv
+from collections.abc import Iterable, Iterator
+from typing import Any, NamedTuple
+
+from ninja.errors import HttpError
+
+from .data_types import HttpRequest
+from .renderers import loads
+
+NDJSON_CONTENT_TYPES = {
+    "application/x-ndjson",
+    "application/ndjson",
+    "application/jsonlines",
+}
+MANIFEST_FORMATS = ("csv", "ndjson")
+
+
+class MalformedRow(NamedTuple):
+    error: str
+
+
+def iter_text_lines(lines: Iterable[bytes | str]) -> Iterator[str]:
+    for line in lines:
+        if isinstance(line, bytes):
+            yield line.decode("utf-8", errors="replace")
+        else:
+            yield line
+
+
+def iter_ndjson(lines: Iterable[bytes | str]) -> Iterator[Any]:
+    """
+    Decode one JSON document per line, skipping blank lines.
+
+    Lines that are not valid JSON are yielded as `MalformedRow` so the
+    caller can report them without aborting the rest of the stream.
+    """
+    for raw_line in iter_text_lines(lines):
+        line = raw_line.strip()
+        if not line:
+            continue
+        try:
+            yield loads(line)
+        except ValueError as e:
+            yield MalformedRow(error=f"Invalid JSON: {e}")
+
+
+def guess_manifest_format(filename: str | None, content_type: str | None) -> str:
+    if content_type in NDJSON_CONTENT_TYPES:
+        return "ndjson"
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+
+def iter_manifest_urls(lines: Iterable[bytes | str], fmt: str) -> Iterator[str]:
+    """
+    Yield image URLs from a CSV or NDJSON manifest, one row at a time.
+
+    CSV manifests use the `url` column when the header has one and the
+    first column otherwise. NDJSON rows may be plain strings or objects
+    with a `url` key. Unusable rows are yielded as `MalformedRow`.
+    """
+    if fmt == "ndjson":
+        for row in iter_ndjson(lines):
+            if isinstance(row, MalformedRow):
+                yield row
+            elif isinstance(row, str):
+                yield row.strip()
+            elif isinstance(row, dict) and isinstance(row.get("url"), str):
+                yield row["url"].strip()
+            else:
+                yield MalformedRow(error="Row has no url.")
+        return
+
+    url_column = 0
+    for line_number, row in enumerate(csv.reader(iter_text_lines(lines))):
+        if not row:
+            continue
+        if line_number == 0:
+            header = [column.strip().lower() for column in row]
+            if "url" in header:
+                url_column = header.index("url")
+                continue
+        if url_column >= len(row):
+            yield MalformedRow(error="Row has no url.")
+            continue
+        yield row[url_column].strip()
+
+
+def iter_request_rows(request: HttpRequest) -> Iterator[Any]:
+    """
+    Yield the rows of a JSON array or NDJSON request body.
+
+    NDJSON bodies are read line by line from the request stream instead
+    of being loaded into memory as a whole.
+    """
+    if request.content_type in NDJSON_CONTENT_TYPES:
+        yield from iter_ndjson(request)
+        return
+
+    try:
+        payload = loads(request.body)
+    except ValueError:
+        raise HttpError(400, "Request body must be a JSON array or NDJSON.")
+
+    if not isinstance(payload, list):
+        raise HttpError(400, "Request body must be a JSON array or NDJSON.")
+
+    yield from payload
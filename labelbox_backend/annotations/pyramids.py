@@ -0,0 +1,95 @@
+"""
+Deep-zoom (DZI) tile pyramids and thumbnails.
+
+This module only depends on Pillow so it can run in spawned worker
+processes without setting Django up.
+"""
+
+import math
+import os
+
+from PIL import Image
+
+TILE_FORMAT = "jpg"
+THUMBNAIL_NAME = f"thumbnail.{TILE_FORMAT}"
+
+
+def max_level(width: int, height: int) -> int:
+    """Level of the full-resolution image; level 0 is a single pixel."""
+    return math.ceil(math.log2(max(width, height, 1)))
+
+
+def level_size(width: int, height: int, level: int, top: int) -> tuple[int, int]:
+    scale = 2 ** (top - level)
+    return math.ceil(width / scale), math.ceil(height / scale)
+
+
+def tile_box(
+    col: int, row: int, size: tuple[int, int], tile_size: int, overlap: int
+) -> tuple[int, int, int, int]:
+    """Crop box of a tile, including its overlap with the neighbouring tiles."""
+    width, height = size
+    return (
+        max(col * tile_size - overlap, 0),
+        max(row * tile_size - overlap, 0),
+        min((col + 1) * tile_size + overlap, width),
+        min((row + 1) * tile_size + overlap, height),
+    )
+
+
+def tile_name(level: int, col: int, row: int) -> str:
+    return f"{level}/{col}_{row}.{TILE_FORMAT}"
+
+
+def build_pyramid(
+    source_path: str,
+    output_dir: str,
+    tile_size: int,
+    overlap: int,
+    thumbnail_size: int,
+    max_pixels: int,
+) -> dict:
+    """
+    Write the tiles of every level and a thumbnail under `output_dir`.
+
+    The image is decoded once and only converted when it is not RGB
+    already, so a single full-resolution copy is held. Each lower level is
+    produced by halving the previous one, which is then dropped, so the
+    whole pyramid costs about a third more than tiling the full-resolution
+    level alone. Returns the pyramid geometry.
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    with Image.open(source_path) as source:
+        source.load()
+        image = source if source.mode == "RGB" else source.convert("RGB")
+
+    width, height = image.size
+    top = max_level(width, height)
+    thumbnail = None
+
+    for level in range(top, -1, -1):
+        if thumbnail is None and max(image.size) <= 2 * thumbnail_size:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((thumbnail_size, thumbnail_size))
+
+        level_dir = os.path.join(output_dir, str(level))
+        os.makedirs(level_dir, exist_ok=True)
+        cols = math.ceil(image.width / tile_size)
+        rows = math.ceil(image.height / tile_size)
+        for col in range(cols):
+            for row in range(rows):
+                tile = image.crop(tile_box(col, row, image.size, tile_size, overlap))
+                tile.save(os.path.join(output_dir, tile_name(level, col, row)))
+
+        if level:
+            image = image.reduce(2)
+
+    thumbnail.save(os.path.join(output_dir, THUMBNAIL_NAME))
+    return {
+        "width": width,
+        "height": height,
+        "tile_size": tile_size,
+        "overlap": overlap,
+        "format": TILE_FORMAT,
+        "max_level": top,
+    }
@@ -0,0 +1,60 @@
+"""
+Declared SQL query budgets of API operations.
+
+`@query_budget(n)`, placed right under an operation's router decorator,
+states the most queries one call may run, however large the page or
+the data behind it. The tests call every operation and fail when one
+goes over its budget, and `RequestMetricsMiddleware` logs a warning
+when a live request does.
+"""
+
+import logging
+from collections.abc import Callable
+
+from ninja import Router
+
+from .data_types import HttpRequest
+
+logger = logging.getLogger(__name__)
+
+
+def query_budget(queries: int) -> Callable:
+    def decorator(view: Callable) -> Callable:
+        view.query_budget = queries
+        return view
+
+    return decorator
+
+
+def router_budgets(router: Router) -> dict[tuple[str, str], int | None]:
+    """Map each operation of `router` to its budget, None when undeclared."""
+    return {
+        (method, path): getattr(operation.view_func, "query_budget", None)
+        for path, path_view in router.path_operations.items()
+        for operation in path_view.operations
+        for method in operation.methods
+    }
+
+
+def request_budget(request: HttpRequest) -> int | None:
+    """The budget of the operation that served `request`, if it has one."""
+    match = request.resolver_match
+    path_view = getattr(match.func, "__self__", None) if match is not None else None
+    for operation in getattr(path_view, "operations", ()):
+        if request.method in operation.methods:
+            return getattr(operation.view_func, "query_budget", None)
+    return None
+
+
+def check_budget(request: HttpRequest, queries: int) -> None:
+    budget = request_budget(request)
+    if budget is not None and queries > budget:
+        logger.warning(
+            "Query budget exceeded",
+            extra={
+                "path": request.path,
+                "method": request.method,
+                "queries": queries,
+                "budget": budget,
+            },
+        )
@@ -0,0 +1,102 @@
+"""
+Fetching user-supplied URLs from the server.
+
+Task URLs come from clients, so a plain `urlopen` would let them read
+local files (`file://`) or reach services on the server's own network.
+`open_public_url` only speaks HTTP(S) and checks every address it is
+about to connect to, redirects included, so a host that resolves to a
+loopback, private or link-local address is refused at connect time.
+"""
+
+import http.client
+import ipaddress
+import socket
+import urllib.request
+from urllib.parse import urlsplit
+
+ALLOWED_SCHEMES = ("http", "https")
+
+
+class ForbiddenURLError(ValueError):
+    pass
+
+
+def public_addresses(host: str, port: int) -> list[tuple]:
+    """Resolve `host`, refusing it unless every address is public."""
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ForbiddenURLError(f"Cannot resolve '{host}'.") from e
+
+    for *_, sockaddr in infos:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if not address.is_global:
+            raise ForbiddenURLError(f"'{host}' resolves to a non-public address.")
+    return infos
+
+
+def connect_public(
+    address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None
+):
+    """`socket.create_connection` to the checked addresses of a host only."""
+    host, port = address
+    error = None
+    for family, socktype, proto, _, sockaddr in public_addresses(host, port):
+        sock = socket.socket(family, socktype, proto)
+        try:
+            if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                sock.settimeout(timeout)
+            if source_address:
+                sock.bind(source_address)
+            sock.connect(sockaddr)
+        except OSError as e:
+            sock.close()
+            error = e
+        else:
+            return sock
+    raise error
+
+
+class PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = connect_public
+
+
+class PublicHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = connect_public
+
+
+class PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, request):
+        return self.do_open(PublicHTTPConnection, request)
+
+
+class PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, request):
+        return self.do_open(PublicHTTPSConnection, request, context=self._context)
+
+
+def build_opener() -> urllib.request.OpenerDirector:
+    # Unlike `urllib.request.build_opener`, no file, FTP, data or proxy
+    # handlers: a redirect to another scheme fails as an unknown URL type.
+    opener = urllib.request.OpenerDirector()
+    for handler in (
+        PublicHTTPHandler(),
+        PublicHTTPSHandler(),
+        urllib.request.HTTPRedirectHandler(),
+        urllib.request.HTTPDefaultErrorHandler(),
+        urllib.request.HTTPErrorProcessor(),
+    ):
+        opener.add_handler(handler)
+    return opener
+
+
+def open_public_url(url: str, timeout: float):
+    """Open an http(s) URL on a public host; raises `ForbiddenURLError`."""
+    parts = urlsplit(url)
+    if parts.scheme not in ALLOWED_SCHEMES or not parts.hostname:
+        raise ForbiddenURLError(f"Only http(s) URLs can be fetched, not '{url}'.")
+    return build_opener().open(url, timeout=timeout)
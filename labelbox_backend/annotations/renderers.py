@@ -0,0 +1,67 @@
+"""
+JSON encoding for the APIs, backed by orjson when it is installed.
+
+orjson serializes the response dicts ninja builds several times faster
+than the standard library and parses request bodies straight from
+bytes. Without it, both fall back to `json`, so the dependency stays
+optional. The two paths write the same output: datetimes and times keep
+their microseconds, and UTC is written as "Z".
+"""
+
+import json
+from datetime import datetime, time
+from typing import Any
+
+from django.http import HttpRequest
+from ninja.parser import Parser
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class Encoder(NinjaJSONEncoder):
+    """ninja's encoder (Decimals, UUIDs, models) without its millisecond cut."""
+
+    def default(self, o: Any) -> Any:
+        if isinstance(o, (datetime, time)):
+            text = o.isoformat()
+            if text.endswith("+00:00"):
+                text = text.removesuffix("+00:00") + "Z"
+            return text
+        return super().default(o)
+
+
+encoder = Encoder(separators=(",", ":"))
+
+if orjson is not None:
+    DUMPS_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value, default=encoder.default, option=DUMPS_OPTIONS)
+
+    def loads(raw: bytes | str) -> Any:
+        return orjson.loads(raw)
+
+else:  # pragma: no cover
+
+    def dumps(value: Any) -> bytes:
+        return encoder.encode(value).encode("utf-8")
+
+    def loads(raw: bytes | str) -> Any:
+        return json.loads(raw)
+
+
+class FastJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+
+    def render(self, request: HttpRequest, data: Any, *, response_status: int) -> Any:
+        return dumps(data)
+
+
+class FastJSONParser(Parser):
+    def parse_body(self, request: HttpRequest) -> Any:
+        return loads(request.body)
@@ -0,0 +1,167 @@
+"""
+Cache of serialized responses for the polled read endpoints.
+
+Entries are keyed by endpoint, user, invalidation scope and full path.
+The key includes the scope's version, which `invalidate_responses` bumps
+after every committed write, so a write orphans the scope's entries
+instead of deleting them one by one; the cache's size limit and timeout
+evict them.
+"""
+
+import hashlib
+from collections.abc import Callable
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from ninja.decorators import decorate_view
+
+from .caching import bump_version, get_version
+from .data_types import HttpRequest
+
+CACHE_ALIAS = "responses"
+STAT_EVENTS = ("hits", "misses", "oversized")
+
+cached_endpoints: set[str] = set()
+
+
+def scope_key(scope: str) -> str:
+    return f"response-scope:{scope}"
+
+
+def user_scope(request: HttpRequest, **kwargs) -> str:
+    return f"u{request.user.id}"
+
+
+def project_scope(request: HttpRequest, project_id: int, **kwargs) -> str:
+    return f"p{project_id}"
+
+
+def invalidate_responses(user_id: int, project_id: int | None = None) -> None:
+    """Orphan the cached responses of a user and, optionally, a project."""
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return
+    store = caches[CACHE_ALIAS]
+    bump_version(scope_key(f"u{user_id}"), store)
+    if project_id is not None:
+        bump_version(scope_key(f"p{project_id}"), store)
+
+
+def record(name: str, event: str) -> None:
+    store = caches[CACHE_ALIAS]
+    key = f"response-stats:{name}:{event}"
+    try:
+        store.incr(key)
+    except ValueError:
+        store.add(key, 1, timeout=None)
+
+
+def stats(names: list[str]) -> dict[str, dict[str, int]]:
+    """Hit, miss and oversized counts per endpoint, over every process."""
+    store = caches[CACHE_ALIAS]
+    keys = {f"response-stats:{n}:{e}": (n, e) for n in names for e in STAT_EVENTS}
+    values = store.get_many(list(keys))
+    result = {name: dict.fromkeys(STAT_EVENTS, 0) for name in names}
+    for key, value in values.items():
+        name, event = keys[key]
+        result[name][event] = value
+    return result
+
+
+def lookup(name: str, scope: str, request: HttpRequest) -> HttpResponse | None:
+    """
+    Return the cached response, or None after noting on the request the
+    key the rendered response should be stored under.
+    """
+    store = caches[CACHE_ALIAS]
+    version = get_version(scope_key(scope), store)
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    key = f"response:{name}:{request.user.id}:{scope}.{version}:{path}"
+
+    entry = store.get(key)
+    if entry is None:
+        record(name, "misses")
+        request.response_cache = (name, key)
+        return None
+
+    record(name, "hits")
+    content_type, content = entry
+    response = HttpResponse(content, content_type=content_type)
+    response["X-Cache"] = "hit"
+    return response
+
+
+def store_response(request: HttpRequest, response):
+    name, key = getattr(request, "response_cache", (None, None))
+    if key is None or response.status_code != 200 or response.streaming:  # noqa: PLR2004
+        return response
+
+    response["X-Cache"] = "miss"
+    if len(response.content) > settings.RESPONSE_CACHE_MAX_ENTRY_BYTES:
+        record(name, "oversized")
+        return response
+    caches[CACHE_ALIAS].set(
+        key,
+        (response["Content-Type"], response.content),
+        settings.RESPONSE_CACHE_TIMEOUT,
+    )
+    return response
+
+
+def store_rendered(run: Callable) -> Callable:
+    if iscoroutinefunction(run):
+
+        @wraps(run)
+        async def wrapper(request: HttpRequest, *args, **kwargs):
+            response = await run(request, *args, **kwargs)
+            return await sync_to_async(store_response)(request, response)
+
+    else:
+
+        @wraps(run)
+        def wrapper(request: HttpRequest, *args, **kwargs):
+            return store_response(request, run(request, *args, **kwargs))
+
+    return wrapper
+
+
+def cached_response(name: str, scope: Callable[..., str]):
+    """
+    Serve a GET from the response cache when `RESPONSE_CACHE_ENABLED`.
+
+    `scope(request, **path_params)` names what invalidates the response:
+    `user_scope` for per-user data, `project_scope` for one project's.
+    Keys always include the user, so responses are never shared between
+    users. Only 200 responses up to `RESPONSE_CACHE_MAX_ENTRY_BYTES` are
+    stored; they carry an `X-Cache` header.
+    """
+    cached_endpoints.add(name)
+
+    def decorator(view: Callable) -> Callable:
+        if iscoroutinefunction(view):
+            alookup = sync_to_async(lookup)
+
+            @wraps(view)
+            async def wrapper(request: HttpRequest, *args, **kwargs):
+                if settings.RESPONSE_CACHE_ENABLED:
+                    cached = await alookup(name, scope(request, **kwargs), request)
+                    if cached is not None:
+                        return cached
+                return await view(request, *args, **kwargs)
+
+        else:
+
+            @wraps(view)
+            def wrapper(request: HttpRequest, *args, **kwargs):
+                if settings.RESPONSE_CACHE_ENABLED:
+                    cached = lookup(name, scope(request, **kwargs), request)
+                    if cached is not None:
+                        return cached
+                return view(request, *args, **kwargs)
+
+        return decorate_view(store_rendered)(wrapper)
+
+    return decorator
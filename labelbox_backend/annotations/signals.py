@@ -0,0 +1,36 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import bump_generation
+from .instrumentation import record_query
+from .models import Annotations, Project, Task
+from .user_cache import invalidate_user
+
+
+# Deletes bump the generations in their use cases, once per delete: a
+# post_delete receiver would make Django load and signal every row of the
+# cascade instead of deleting it with one query per table.
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Annotations)
+def invalidate_model_generation(sender, **kwargs):
+    # Bumped only once the write is visible: a read between the bump and
+    # the commit would cache the old data under the new generation.
+    transaction.on_commit(lambda: bump_generation(sender))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the cached copy so deactivation or a new password apply at once."""
+    invalidate_user(instance.pk)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Charge every query on the new connection to the current request."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
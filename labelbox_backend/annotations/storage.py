@@ -0,0 +1,104 @@
+import os
+import uuid
+from functools import cache
+
+from cloudinary import uploader, utils
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.http import Http404
+from django.views.static import serve
+
+from .data_types import HttpRequest
+
+
+class StorageBackend:
+    """Stores an image file and returns the public URL it is served from."""
+
+    name: str
+
+    def save(self, path: str, file_name: str, content_type: str) -> str:
+        raise NotImplementedError
+
+    def save_as(self, path: str, name: str) -> str:
+        """Store a file under a fixed name, replacing any previous one."""
+        raise NotImplementedError
+
+    def url(self, name: str) -> str:
+        raise NotImplementedError
+
+    def local_path(self, url: str) -> str | None:
+        """Path of the file behind `url` when it is on this machine."""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    """Files under `MEDIA_ROOT`, served from `LIVE_URL` + `MEDIA_URL`."""
+
+    name = "local"
+
+    def __init__(self, location: str, base_url: str):
+        self.storage = FileSystemStorage(location=location, base_url=base_url)
+
+    def save(self, path: str, file_name: str, content_type: str) -> str:
+        extension = os.path.splitext(file_name)[1].lower()
+        with open(path, "rb") as content:
+            name = self.storage.save(
+                f"uploads/{uuid.uuid4().hex}{extension}", File(content)
+            )
+        return self.url(name)
+
+    def save_as(self, path: str, name: str) -> str:
+        self.storage.delete(name)
+        with open(path, "rb") as content:
+            self.storage.save(name, File(content))
+        return self.url(name)
+
+    def url(self, name: str) -> str:
+        return f"{settings.LIVE_URL.rstrip('/')}/{self.storage.url(name).lstrip('/')}"
+
+    def local_path(self, url: str) -> str | None:
+        prefix = self.url("")
+        if not url.startswith(prefix):
+            return None
+        return self.storage.path(url.removeprefix(prefix))
+
+
+class CloudinaryStorage(StorageBackend):
+    name = "cloudinary"
+
+    def save(self, path: str, file_name: str, content_type: str) -> str:
+        return uploader.upload(path)["url"]
+
+    def save_as(self, path: str, name: str) -> str:
+        # "auto" stores non-image files such as exports as raw resources.
+        public_id = os.path.splitext(name)[0]
+        return uploader.upload(
+            path, public_id=public_id, overwrite=True, resource_type="auto"
+        )["url"]
+
+    def url(self, name: str) -> str:
+        public_id, extension = os.path.splitext(name)
+        return utils.cloudinary_url(public_id, format=extension.lstrip("."))[0]
+
+
+@cache
+def get_storage() -> StorageBackend:
+    """The backend named by the `IMAGE_STORAGE_BACKEND` setting."""
+    backend = settings.IMAGE_STORAGE_BACKEND
+    if backend == "local":
+        return LocalStorage(location=settings.MEDIA_ROOT, base_url=settings.MEDIA_URL)
+    if backend == "cloudinary":
+        return CloudinaryStorage()
+    raise ValueError(f"Unknown storage backend '{backend}'.")
+
+
+def serve_media(request: HttpRequest, path: str):
+    """
+    Serve a file of the local backend. Django's `static()` helper only does
+    while DEBUG is on, but the backend hands out `MEDIA_URL` links in every
+    environment.
+    """
+    if settings.IMAGE_STORAGE_BACKEND != "local":
+        raise Http404
+    return serve(request, path, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,205 @@
+"""
+Synthetic users, projects, tasks and annotations for benchmarks.
+
+Each unit of scale is one user with `projects_per_user` projects of
+`tasks_per_project` tasks. Annotations per task follow a long-tailed
+distribution around `annotations_per_task`, and their `data` is mostly a
+few attributes, sometimes a richer record and occasionally a large
+payload, so list and export paths see realistic row widths. Generation
+is seeded, so a scale and seed always describe the same dataset.
+"""
+
+import random
+from collections.abc import Iterator
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .counters import rebuild_counters
+from .geometry import geometry_values
+from .labels import sync_annotation_labels
+from .models import Annotations, Project, Task
+
+SYNTHETIC_PREFIX = "synthetic"
+SYNTHETIC_PASSWORD = "synthetic-password-1"
+LABEL_NAMES = (
+    "car",
+    "truck",
+    "bus",
+    "bicycle",
+    "motorcycle",
+    "pedestrian",
+    "traffic light",
+    "stop sign",
+    "dog",
+    "cat",
+    "tree",
+    "building",
+    "road",
+    "sidewalk",
+    "sky",
+    "person",
+    "bag",
+    "bench",
+    "pole",
+    "sign",
+)
+IMAGE_SIZE = 4096
+
+
+def synthetic_users(prefix: str = SYNTHETIC_PREFIX):
+    return User.objects.filter(username__startswith=f"{prefix}-")
+
+
+class SyntheticDataset:
+    """
+    Bulk-write a synthetic dataset.
+
+    Rows are written with `bulk_create` in batches of
+    `BULK_CREATE_BATCH_SIZE`, one transaction per project; label links
+    are written as the APIs write them, and the counters are rebuilt at
+    the end. `generate` yields a progress report after every user.
+    """
+
+    def __init__(
+        self,
+        scale: int,
+        seed: int = 0,
+        prefix: str = SYNTHETIC_PREFIX,
+        projects_per_user: int = 4,
+        tasks_per_project: int = 250,
+        annotations_per_task: int = 8,
+    ):
+        self.scale = scale
+        self.random = random.Random(seed)
+        self.prefix = prefix
+        self.projects_per_user = projects_per_user
+        self.tasks_per_project = tasks_per_project
+        self.annotations_per_task = annotations_per_task
+        self.batch_size = settings.BULK_CREATE_BATCH_SIZE
+        self.stats = {"users": 0, "projects": 0, "tasks": 0, "annotations": 0}
+
+    def annotation_count(self) -> int:
+        """Mostly close to the mean, with a few crowded images."""
+        count = int(self.random.expovariate(1 / self.annotations_per_task))
+        return min(count, self.annotations_per_task * 20)
+
+    def labels(self) -> str:
+        names = self.random.sample(LABEL_NAMES, self.random.choice((1, 1, 1, 2, 3)))
+        return ", ".join(names)
+
+    def geometry(self) -> tuple[str, dict]:
+        """Coordinates and geometry field values; a quarter are polygons."""
+        rng = self.random
+        x, y = rng.uniform(0, IMAGE_SIZE - 600), rng.uniform(0, IMAGE_SIZE - 600)
+        width, height = rng.uniform(8, 600), rng.uniform(8, 600)
+        coordinates = f"[{x:.1f}, {y:.1f}, {width:.1f}, {height:.1f}]"
+        if rng.random() < 0.75:  # noqa PLR2004
+            return coordinates, geometry_values(None, coordinates)
+
+        points = []
+        for _ in range(rng.randint(3, 40)):
+            points += [x + rng.uniform(0, width), y + rng.uniform(0, height)]
+        geometry = {"type": "polygon", "points": points}
+        return coordinates, geometry_values(geometry)
+
+    def data(self) -> dict:
+        """An annotation's `data`: from a few bytes to tens of kilobytes."""
+        rng = self.random
+        data = {
+            "confidence": round(rng.random(), 4),
+            "occluded": rng.random() < 0.2,  # noqa PLR2004
+        }
+        size = rng.random()
+        if size > 0.7:  # noqa PLR2004
+            data["attributes"] = {
+                f"attribute_{key}": {
+                    "value": round(rng.random(), 4),
+                    "tags": rng.sample(("truncated", "blurred", "night", "rain"), 2),
+                }
+                for key in range(rng.randint(5, 20))
+            }
+            data["review"] = {"reviewer": rng.randint(1, 50), "accepted": True}
+        if size > 0.97:  # noqa PLR2004
+            data["mask"] = [rng.randint(0, 255) for _ in range(rng.randint(2000, 8000))]
+        return data
+
+    def annotations(self, tasks: list[Task]) -> Iterator[Annotations]:
+        for task in tasks:
+            for _ in range(self.annotation_count()):
+                coordinates, geometry = self.geometry()
+                yield Annotations(
+                    task_id=task.id,
+                    coordinates=coordinates,
+                    labels=self.labels(),
+                    data=self.data(),
+                    **geometry,
+                )
+
+    def write_annotations(self, project: Project, tasks: list[Task]) -> None:
+        batch = []
+        for annotation in self.annotations(tasks):
+            batch.append(annotation)
+            if len(batch) >= self.batch_size:
+                self.write_batch(project, batch)
+                batch = []
+        if batch:
+            self.write_batch(project, batch)
+
+    def write_batch(self, project: Project, batch: list[Annotations]) -> None:
+        Annotations.objects.bulk_create(batch)
+        sync_annotation_labels((annotation, project.id) for annotation in batch)
+        self.stats["annotations"] += len(batch)
+
+    def write_project(self, user: User, number: int) -> None:
+        with transaction.atomic():
+            project = Project.objects.create(
+                user=user,
+                name=f"{user.username} project {number}",
+                description=f"Synthetic project {number} of {user.username}.",
+            )
+            tasks = Task.objects.bulk_create(
+                [
+                    Task(
+                        project=project,
+                        url=(
+                            f"https://images.example.com/{user.username}/"
+                            f"{number}/{index}.jpg"
+                        ),
+                    )
+                    for index in range(self.tasks_per_project)
+                ],
+                batch_size=self.batch_size,
+            )
+            self.write_annotations(project, tasks)
+        self.stats["projects"] += 1
+        self.stats["tasks"] += len(tasks)
+
+    def generate(self) -> Iterator[dict]:
+        if synthetic_users(self.prefix).exists():
+            raise ValueError(f"Synthetic users named '{self.prefix}-*' already exist.")
+
+        # Hashing is deliberately slow, so every user shares one hash.
+        password = make_password(SYNTHETIC_PASSWORD)
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=f"{self.prefix}-{number}",
+                    email=f"{self.prefix}-{number}@example.com",
+                    password=password,
+                )
+                for number in range(self.scale)
+            ]
+        )
+        if users and users[0].pk is None:
+            users = list(synthetic_users(self.prefix).order_by("id"))
+
+        for user in users:
+            for number in range(self.projects_per_user):
+                self.write_project(user, number)
+            self.stats["users"] += 1
+            yield dict(self.stats)
+
+        rebuild_counters(user_ids=[user.id for user in users])
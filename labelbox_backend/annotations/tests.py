@@ -1,10 +1,1345 @@
-from .usecases import SignupUseCase
+import hashlib
+import json
+import math
+import os
+import subprocess
+import threading
+import time
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import AsyncClient, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from ninja.errors import HttpError
+from ninja_jwt.tokens import AccessToken
+from PIL import Image
+from pydantic import ValidationError
 
+from .benchmarks import compare, nearest_rank
+from .caching import get_generation
+from .conditional import is_current
+from .counters import rebuild_counters
+from .counting import CachedCount, EstimatedCount, ExactCount, build_count_strategy
+from .derivatives import DerivativePool, derivative_pool, fetch_source
+from .dtos import (
+    CreateTaskSchema,
+    Paginator,
+    ProjectDetailFilter,
+    RebuildCountersJobParamsSchema,
+    SignupSchema,
+    UpdateAnnotationSchema,
+    UpdateTaskSchema,
+)
+from .exporters import export_path
+from .geometry import EMPTY_GEOMETRY, GEOMETRY_FIELDS, geometry_values
+from .instrumentation import (
+    LATENCY_BUCKETS,
+    QUERY_BUCKETS,
+    Registry,
+    RequestStats,
+    collect,
+    prometheus_metrics,
+    render,
+)
+from .jobs import (
+    JobCancelledError,
+    JobContext,
+    JobHandler,
+    claim_job,
+    handlers,
+    requeue_stale_jobs,
+    run_job,
+)
+from .labels import parse_labels
+from .models import (
+    AnnotationLabel,
+    Annotations,
+    ImageAsset,
+    ImageUpload,
+    Job,
+    Label,
+    Project,
+    ProjectCounters,
+    Task,
+    TilePyramid,
+)
+from .purging import purge_project
+from .pyramids import level_size, max_level, tile_box
+from .query_budgets import router_budgets
+from .remote import ForbiddenURLError
+from .renderers import dumps, encoder, loads
+from .response_cache import invalidate_responses, lookup
+from .storage import get_storage
+from .synthetic import SyntheticDataset, synthetic_users
+from .uploads import fail_stale_uploads, upload_pool
+from .usecases import (
+    BulkUpdateAnnotationsUseCase,
+    BulkUpdateTasksUseCase,
+    BulkUpdateUseCase,
+    CancelJobUseCase,
+    DeleteProjectUseCase,
+    DeleteTaskUseCase,
+    DownloadExportUseCase,
+    ExportProjectUseCase,
+    ImportTasksUseCase,
+    ListAnnotationsUseCase,
+    ListTasksUseCase,
+    SignupUseCase,
+    UpdateAnnotationUseCase,
+    UpdateTaskUseCase,
+)
+from .user_cache import LocalUserCache, build_user_cache, invalidate_user
+from .views import router
+
+
+@pytest.mark.django_db
 def test_signup_use_case():
-    response = SignupUseCase.execute(
+    data = SignupSchema(
         username="testuser",
         email="testuser@example.com",
-        password="securepassword",
+        password="securepassword1",
+    )
+    user = SignupUseCase(data).execute()
+
+    assert user.username == "testuser"
+    assert user.check_password("securepassword1")
+
+
+def test_paginator_cursor_round_trip():
+    payload = {"o": "-created_at", "v": "2024-12-21", "id": 42, "r": False}
+    cursor = Paginator.encode_cursor(payload)
+
+    assert "=" not in cursor
+    assert Paginator.decode_cursor(cursor) == payload
+
+
+def test_geometry_values_derive_bbox_from_polygon_and_coordinates():
+    polygon = geometry_values({"type": "polygon", "points": [4, 1, 9, 3, 6, 8]})
+    assert (polygon["bbox_x_min"], polygon["bbox_y_min"]) == (4, 1)
+    assert (polygon["bbox_x_max"], polygon["bbox_y_max"]) == (9, 8)
+
+    from_coordinates = geometry_values(None, "[10, 20, 5, 5]")
+    assert from_coordinates["points"] == [10, 20, 15, 25]
+    assert geometry_values(None, "not a box") == {}
+
+
+def test_parse_labels_accepts_json_and_separated_names():
+    assert parse_labels("cat, dog;cat\n bird ") == ["cat", "dog", "bird"]
+    assert parse_labels('["car", "truck", "car"]') == ["car", "truck"]
+    assert parse_labels(" , ; ") == []
+
+
+def test_local_user_cache_evicts_least_recently_used_and_expired():
+    users = LocalUserCache(ttl=60, max_size=2)
+    users.set(1, User(id=1, username="one"))
+    users.set(2, User(id=2, username="two"))
+    assert users.get(1).username == "one"
+
+    users.set(3, User(id=3, username="three"))
+    assert users.get(2) is None
+    assert users.get(1) is not users.get(1)
+
+    expired = LocalUserCache(ttl=0, max_size=2)
+    expired.set(1, User(id=1, username="one"))
+    assert expired.get(1) is None
+
+
+def test_shared_user_cache_needs_a_shared_cache(tmp_path):
+    with pytest.raises(ValueError, match="RESPONSE_CACHE_URL"):
+        build_user_cache("shared")
+
+    shared = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": str(tmp_path),
+    }
+    with override_settings(CACHES={"default": shared, "responses": shared}):
+        user_cache = build_user_cache("shared")
+        user_cache.set(7, User(id=7, username="seven"))
+        assert user_cache.get(7).username == "seven"
+
+
+def test_task_urls_must_be_http():
+    with pytest.raises(ValidationError):
+        CreateTaskSchema(project_id=1, url="file:///etc/passwd")
+    with pytest.raises(ValidationError):
+        UpdateTaskSchema(url="gopher://example.com/")
+    assert CreateTaskSchema(project_id=1, url="https://example.com").url == (
+        "https://example.com"
+    )
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "file:///etc/passwd",
+        "ftp://example.com/a.png",
+        "http://localhost/a.png",
+        "http://127.0.0.1:8000/admin/",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://10.0.0.5/a.png",
+        "http://[::1]/a.png",
+    ],
+)
+def test_derivative_sources_are_only_fetched_from_public_hosts(url, tmp_path):
+    with pytest.raises(ForbiddenURLError):
+        fetch_source(url, str(tmp_path))
+
+
+def test_derivative_pool_drops_requests_beyond_its_queue_limit():
+    pool = DerivativePool(workers=1, queue_limit=2)
+    release, ran = threading.Event(), []
+
+    def run(url):
+        ran.append(url)
+        release.wait(5)
+
+    with mock.patch.object(pool, "run", side_effect=run):
+        for n in range(3):
+            pool.request(f"https://images.example.com/{n}.jpg")
+        release.set()
+        pool.threads.shutdown()
+        pool.processes.shutdown()
+
+    assert ran == [f"https://images.example.com/{n}.jpg" for n in range(2)]
+    assert pool.slots.acquire(blocking=False)
+
+
+@pytest.mark.django_db
+def test_abandoned_pyramids_are_claimed_again(settings):
+    url = "https://images.example.com/a.jpg"
+    pyramid = TilePyramid.objects.create(
+        source_url=url, status=TilePyramid.Status.PROCESSING
+    )
+    assert DerivativePool.claim(url) is None
+
+    TilePyramid.objects.filter(id=pyramid.id).update(
+        updated_at=timezone.now()
+        - timedelta(seconds=settings.DERIVATIVE_STALE_SECONDS + 1)
+    )
+    assert DerivativePool.claim(url) == pyramid
+    assert DerivativePool.claim(url) is None
+
+
+def test_pyramid_geometry_clips_edge_tiles():
+    assert max_level(1000, 600) == 10  # noqa: PLR2004
+    assert level_size(1000, 600, 9, 10) == (500, 300)
+    assert tile_box(0, 0, (500, 300), 256, 1) == (0, 0, 257, 257)
+    assert tile_box(1, 1, (500, 300), 256, 1) == (255, 255, 500, 300)
+
+
+def test_is_current_compares_etags_weakly():
+    request = RequestFactory().get("/", HTTP_IF_NONE_MATCH='"p1.7", W/"p1.8"')
+    assert is_current(request, 'W/"p1.7"')
+    assert is_current(request, 'W/"p1.8"')
+    assert not is_current(request, 'W/"p1.9"')
+    assert is_current(RequestFactory().get("/", HTTP_IF_NONE_MATCH="*"), 'W/"x"')
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+def test_invalidate_responses_orphans_cached_keys():
+    request = RequestFactory().get("/api/projects/?limit=5")
+    request.user = User(id=7)
+    assert lookup("list_projects", "u7", request) is None
+    first = request.response_cache
+
+    assert lookup("list_projects", "u7", request) is None
+    assert request.response_cache == first
+
+    invalidate_responses(7, project_id=3)
+    assert lookup("list_projects", "u7", request) is None
+    assert request.response_cache != first
+
+
+def test_count_totals_are_only_cached_in_a_shared_cache(tmp_path):
+    assert isinstance(build_count_strategy("cached"), ExactCount)
+    assert isinstance(build_count_strategy("estimated"), EstimatedCount)
+
+    shared = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": str(tmp_path),
+    }
+    with override_settings(CACHES={"default": shared, "responses": shared}):
+        assert isinstance(build_count_strategy("cached"), CachedCount)
+
+
+def test_fast_json_matches_the_json_fallback():
+    value = {
+        "created_at": datetime(2024, 12, 21, 10, 30, 5, 123456, tzinfo=UTC),
+        "score": Decimal("0.50"),
+        "data": {"tags": ["a", "b"], "nested": {"id": 1}},
+    }
+    assert dumps(value) == encoder.encode(value).encode()
+    assert loads(dumps(value))["created_at"] == "2024-12-21T10:30:05.123456Z"
+
+
+def test_update_annotation_separates_version_from_changed_columns():
+    use_case = UpdateAnnotationUseCase(
+        annotation_id=1,
+        data=UpdateAnnotationSchema(coordinates="1,2,3,4", version=3),
+    )
+    assert use_case.version == 3  # noqa: PLR2004
+    assert use_case.data["bbox_x_max"] == 4  # noqa: PLR2004
+    assert "labels" not in use_case.data
+    assert "version" not in use_case.data
+
+
+def test_update_annotation_clears_geometry_when_coordinates_hold_no_box():
+    use_case = UpdateAnnotationUseCase(
+        annotation_id=1, data=UpdateAnnotationSchema(coordinates="not a box")
+    )
+    assert {name: use_case.data[name] for name in GEOMETRY_FIELDS} == EMPTY_GEOMETRY
+
+    bulk = BulkUpdateAnnotationsUseCase(
+        rows=[{"id": 1, "fields": {"coordinates": ""}}], user=User(id=1)
+    )
+    valid, _ = bulk.parse_rows()
+    fields = valid[0][1]["fields"]
+    assert {name: fields[name] for name in GEOMETRY_FIELDS} == EMPTY_GEOMETRY
+
+
+def test_bulk_update_reports_invalid_patches_by_index():
+    use_case = BulkUpdateAnnotationsUseCase(
+        rows=[
+            {"id": 4, "fields": {"labels": "car", "version": 2}},
+            {"fields": {"labels": "car"}},
+            {"id": 5, "fields": {"coordinates": "0,0,2,2"}},
+        ],
+        user=User(id=1),
+    )
+    valid, results = use_case.parse_rows()
+
+    assert [index for index, _ in valid] == [0, 2]
+    assert valid[0][1] == {"id": 4, "version": 2, "fields": {"labels": "car"}}
+    assert valid[1][1]["fields"]["bbox_x_max"] == 2  # noqa: PLR2004
+    assert results[1]["error"] == "id: Field required"
+
+
+def test_prometheus_render_writes_cumulative_histograms():
+    series = {
+        "requests": 2,
+        "seconds": 0.3,
+        "latency": [0, 0, 0, 0, 1] + [2] * (len(LATENCY_BUCKETS) - 5),
+        "queries": 7,
+        "query_buckets": [0, 0, 1, 1, 2, 2, 2, 2][: len(QUERY_BUCKETS)],
+        "query_seconds": 0.02,
+        "bytes": 512,
+    }
+    text = render({('api/tasks/"<id>"/', "GET", "200"): series})
+
+    key = 'endpoint="api/tasks/\\"<id>\\"/",method="GET",status="200"'
+    assert f'http_request_duration_seconds_bucket{{{key},le="0.1"}} 1' in text
+    assert f'http_request_duration_seconds_bucket{{{key},le="+Inf"}} 2' in text
+    assert f"http_request_db_queries_sum{{{key}}} 7" in text
+    assert f"http_response_size_bytes_total{{{key}}} 512" in text
+
+
+def test_metrics_of_exited_workers_are_retained(tmp_path, settings):
+    settings.METRICS_DIR = str(tmp_path)
+    key = ("api/x", "GET", "200")
+    exited = subprocess.Popen(["true"])
+    exited.wait()
+
+    def serve(registry: Registry, requests: int) -> None:
+        with mock.patch("os.getpid", return_value=exited.pid):
+            for _ in range(requests):
+                registry.observe(key, 0.1, RequestStats(queries=1), 5)
+            registry.flush()
+
+    serve(Registry(), 3)
+    (dead,) = os.listdir(tmp_path)
+    with mock.patch("annotations.instrumentation.registry", Registry()):
+        first = collect()
+        # A new worker that reuses the PID writes a file of its own.
+        serve(Registry(), 1)
+        second = collect()
+
+    assert [first[key]["requests"], second[key]["requests"]] == [3, 4]
+    assert dead not in os.listdir(tmp_path)
+    assert "retained.json" in os.listdir(tmp_path)
+
+
+def test_prometheus_scrapes_need_the_token(settings):
+    factory = RequestFactory()
+    settings.METRICS_TOKEN = ""
+    assert prometheus_metrics(factory.get("/metrics")).status_code == 403  # noqa: PLR2004
+
+    settings.METRICS_TOKEN = "secret"
+    assert prometheus_metrics(factory.get("/metrics")).status_code == 401  # noqa: PLR2004
+    request = factory.get("/metrics", headers={"Authorization": "Bearer secret"})
+    with mock.patch("annotations.instrumentation.collect", return_value={}):
+        assert prometheus_metrics(request).status_code == 200  # noqa: PLR2004
+
+
+def test_benchmark_compare_flags_extra_queries_and_slower_medians():
+    baseline = {
+        "get_project": {"median_ms": 2.0, "queries": 2},
+        "list_tasks": {"median_ms": 1.0, "queries": 1},
+        "signup": {"median_ms": 300.0, "queries": 3},
+    }
+    results = {
+        "get_project": {"median_ms": 2.1, "queries": 3},
+        "list_tasks": {"median_ms": 1.4, "queries": 1},
+        "signup": {"median_ms": 400.0, "queries": 3},
+        "new_case": {"median_ms": 9.0, "queries": 9},
+    }
+
+    assert compare(results, baseline, threshold=0.25, noise_ms=0.5) == [
+        "get_project: 2 -> 3 queries",
+        "signup: median 300.0 -> 400.0 ms",
+    ]
+
+
+def test_project_detail_expand_ignores_blank_names():
+    assert ProjectDetailFilter(expand=" annotations, ,").expand_set == {"annotations"}
+    assert ProjectDetailFilter(expand=" ").expand_set == set()
+
+
+def test_benchmark_p95_is_the_nearest_rank():
+    samples = [list(range(1, 11)), list(range(1, 21)), [3]]
+
+    assert [nearest_rank(ordered, 0.95) for ordered in samples] == [10, 19, 3]
+
+
+# Every operation of `views.router`, called against synthetic data. A
+# spec gives the request as client keyword arguments; `{names}` in the
+# path are filled in from the dataset, or from the spec's "ids".
+def manifest(name: str = "manifest.csv") -> dict:
+    rows = "".join(f"https://images.example.com/m/{i}.jpg\n" for i in range(5))
+    return {"manifest": SimpleUploadedFile(name, f"url\n{rows}".encode(), "text/csv")}
+
+
+def image() -> dict:
+    buffer = BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, "PNG")
+    return {"file": SimpleUploadedFile("i.png", buffer.getvalue(), "image/png")}
+
+
+ENDPOINT_REQUESTS = {
+    ("GET", "/projects/"): lambda d: {},
+    ("POST", "/projects/"): lambda d: {"json": {"name": "New", "description": ""}},
+    ("PUT", "/projects/{project_id}/"): lambda d: {"json": {"name": "Renamed"}},
+    ("GET", "/projects/{project_id}/"): lambda d: {"data": {"expand": "annotations"}},
+    ("DELETE", "/projects/{project_id}/"): lambda d: {},
+    ("GET", "/projects/{project_id}/export/"): lambda d: {},
+    ("GET", "/list-tasks/{project_id}"): lambda d: {},
+    ("POST", "/projects/{project_id}/import-tasks/"): lambda d: {"data": manifest()},
+    ("GET", "/tasks/{task_id}/pyramid/"): lambda d: {},
+    ("GET", "/tasks/{task_id}/tiles/"): lambda d: {
+        "data": {"level": 10, "x_min": 0, "y_min": 0, "x_max": 600, "y_max": 600}
+    },
+    ("PUT", "/update-task/{task_id}/"): lambda d: {
+        "json": {"url": "https://images.example.com/updated.jpg"}
+    },
+    ("DELETE", "/delete-task/{task_id}/"): lambda d: {},
+    ("POST", "/create-task/"): lambda d: {
+        "json": {"project_id": d.project.id, "url": "https://images.example.com/n.jpg"}
+    },
+    ("GET", "/list-annotations/{task_id}/"): lambda d: {},
+    ("GET", "/annotations/region/"): lambda d: {
+        "data": {
+            "project_id": d.project.id,
+            "x_min": 0,
+            "y_min": 0,
+            "x_max": 4096,
+            "y_max": 4096,
+        }
+    },
+    ("GET", "/label-stats/"): lambda d: {"data": {"project_id": d.project.id}},
+    ("PUT", "/update-annotation/{annotation_id}/"): lambda d: {
+        "json": {"labels": "bus, car"}
+    },
+    ("DELETE", "/delete-annotation/{annotation_id}/"): lambda d: {},
+    ("POST", "/create-annotation/"): lambda d: {
+        "json": {
+            "task_id": d.task.id,
+            "coordinates": "[1, 2, 3, 4]",
+            "labels": "car",
+            "data": {},
+        }
+    },
+    ("POST", "/bulk-create-annotations/"): lambda d: {
+        "json": [
+            {"task_id": i, "coordinates": "[1, 2, 3, 4]", "labels": "car", "data": {}}
+            for i in d.task_ids
+        ]
+    },
+    ("PATCH", "/bulk-update-annotations/"): lambda d: {
+        "json": [{"id": i, "fields": {"labels": "bus"}} for i in d.annotation_ids]
+    },
+    ("PATCH", "/bulk-update-tasks/"): lambda d: {
+        "json": [
+            {"id": i, "fields": {"url": f"https://images.example.com/b/{i}.jpg"}}
+            for i in d.task_ids
+        ]
+    },
+    ("GET", "/metrics"): lambda d: {},
+    ("POST", "/upload-image/"): lambda d: {"data": image()},
+    ("POST", "/uploads/"): lambda d: {"data": image()},
+    ("GET", "/uploads/{upload_id}/"): lambda d: {},
+    ("POST", "/jobs/"): lambda d: {
+        "json": {"kind": "export_project", "params": {"project_id": d.project.id}}
+    },
+    ("POST", "/projects/{project_id}/import-jobs/"): lambda d: {"data": manifest()},
+    ("GET", "/jobs/"): lambda d: {},
+    ("GET", "/jobs/{job_id}/"): lambda d: {},
+    ("POST", "/jobs/{job_id}/cancel/"): lambda d: {},
+    ("GET", "/jobs/{job_id}/download/"): lambda d: {"ids": {"job_id": d.export.id}},
+}
+PAGINATED = [
+    ("GET", "/projects/"),
+    ("GET", "/projects/{project_id}/"),
+    ("GET", "/list-tasks/{project_id}"),
+    ("GET", "/list-annotations/{task_id}/"),
+    ("GET", "/annotations/region/"),
+    ("GET", "/jobs/"),
+]
+
+
+@pytest.fixture
+def dataset(tmp_path, settings):
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    settings.UPLOAD_STAGING_DIR = str(tmp_path / "staging")
+    settings.EXPORT_DIR = str(tmp_path / "exports")
+    settings.IMAGE_STORAGE_BACKEND = "local"
+    get_storage.cache_clear()
+    for _ in SyntheticDataset(
+        scale=1, projects_per_user=3, tasks_per_project=10, annotations_per_task=4
+    ).generate():
+        pass
+
+    user = synthetic_users().get()
+    project = Project.objects.filter(user=user).order_by("id").first()
+    task = Task.objects.filter(project=project, annotations__isnull=False).first()
+    TilePyramid.objects.create(
+        source_url=task.url,
+        status=TilePyramid.Status.DONE,
+        width=1000,
+        height=600,
+        tile_size=256,
+        overlap=1,
+        format="jpeg",
+        max_level=10,
+    )
+    jobs = [
+        Job.objects.create(user=user, kind="export_project", params={})
+        for _ in range(3)
+    ]
+    upload = ImageUpload.objects.create(
+        user=user, backend="local", file_name="i.png", content_type="image/png", size=1
+    )
+    export = Job.objects.create(
+        user=user,
+        kind="export_project",
+        status=Job.Status.SUCCEEDED,
+        result={"file_name": f"project-{project.id}.ndjson"},
+    )
+    os.makedirs(settings.EXPORT_DIR)
+    with open(export_path(export.id), "w") as output:
+        output.write('{"id": 1}\n')
+    token = AccessToken.for_user(user)
+    with mock.patch.object(derivative_pool, "request"):
+        yield SimpleNamespace(
+            user=user,
+            project=project,
+            task=task,
+            export=export,
+            task_ids=list(project.tasks.values_list("id", flat=True)[:5]),
+            annotation_ids=list(
+                Annotations.objects.filter(task__project=project).values_list(
+                    "id", flat=True
+                )[:5]
+            ),
+            ids={
+                "project_id": project.id,
+                "task_id": task.id,
+                "annotation_id": task.annotations.first().id,
+                "upload_id": upload.id,
+                "job_id": jobs[0].id,
+            },
+            client=Client(HTTP_AUTHORIZATION=f"Bearer {token}"),
+        )
+    get_storage.cache_clear()
+
+
+def count_queries(dataset, method: str, path: str, **params) -> int:
+    """Queries of one cold call: no cached user, response or count."""
+    for cache in caches.all(initialized_only=False):
+        cache.clear()
+    invalidate_user(dataset.user.id)
+
+    kwargs = ENDPOINT_REQUESTS[method, path](dataset)
+    ids = {**dataset.ids, **kwargs.pop("ids", {})}
+    if "json" in kwargs:
+        kwargs = {
+            "data": json.dumps(kwargs["json"]),
+            "content_type": "application/json",
+        }
+    if params:
+        kwargs["data"] = {**kwargs.get("data", {}), **params}
+    call = getattr(dataset.client, method.lower())
+    with CaptureQueriesContext(connection) as captured:
+        response = call(f"/api{path.format(**ids)}", **kwargs)
+        if response.streaming:
+            b"".join(response.streaming_content)
+    assert response.status_code < 400, (path, response.content)  # noqa: PLR2004
+    return len(captured)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("method, path", sorted(router_budgets(router)))
+def test_endpoint_stays_within_its_query_budget(dataset, method, path):
+    budget = router_budgets(router)[method, path]
+    assert budget is not None, f"{method} {path} declares no @query_budget."
+
+    queries = count_queries(dataset, method, path)
+    assert queries <= budget, f"{method} {path}: {queries} queries, budget {budget}"
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("method, path", PAGINATED)
+def test_list_query_count_does_not_grow_with_page_size(dataset, method, path):
+    small = count_queries(dataset, method, path, page_size=1)
+    large = count_queries(dataset, method, path, page_size=100)
+    assert large == small, f"{method} {path}: {small} queries at 1 row, {large} at 100"
+
+
+@pytest.mark.django_db
+def test_delete_task_bumps_each_generation_once(dataset):
+    before = [get_generation(Task), get_generation(Annotations)]
+
+    DeleteTaskUseCase(dataset.task.id).execute()
+
+    assert [get_generation(Task), get_generation(Annotations)] == [
+        before[0] + 1,
+        before[1] + 1,
+    ]
+    assert not Annotations.objects.filter(task_id=dataset.task.id).exists()
+
+
+@pytest.mark.django_db
+def test_update_annotation_to_free_form_coordinates_drops_its_box(dataset):
+    annotation = Annotations.objects.filter(task=dataset.task).first()
+    Annotations.objects.filter(id=annotation.id).update(
+        coordinates="0,0,5,5", **geometry_values(None, "0,0,5,5")
+    )
+
+    UpdateAnnotationUseCase(
+        annotation.id, UpdateAnnotationSchema(coordinates="near the left edge")
+    ).execute()
+
+    annotation.refresh_from_db()
+    assert annotation.geometry is None
+    assert {name: getattr(annotation, name) for name in GEOMETRY_FIELDS} == (
+        EMPTY_GEOMETRY
+    )
+
+
+@pytest.mark.django_db
+def test_background_upload_is_stored_once_and_served_from_media(
+    dataset, settings, django_capture_on_commit_callbacks
+):
+    # Run the upload inline, on the connection of the test's transaction.
+    with (
+        mock.patch.object(upload_pool, "workers", 0),
+        mock.patch("annotations.uploads.close_old_connections"),
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            started = dataset.client.post("/api/uploads/", data=image()).json()
+        again = dataset.client.post("/api/uploads/", data=image()).json()
+
+    upload = dataset.client.get(f"/api/uploads/{started['id']}/").json()
+    assert [upload["status"], again["status"]] == ["done", "done"]
+    assert again["url"] == upload["url"]
+    assert ImageAsset.objects.filter(url=upload["url"]).count() == 1
+    assert os.listdir(settings.UPLOAD_STAGING_DIR) == []
+
+    assert not settings.DEBUG
+    response = dataset.client.get(urlparse(upload["url"]).path)
+    assert b"".join(response.streaming_content) == image()["file"].read()
+
+
+@pytest.mark.django_db
+def test_uploads_lost_with_their_process_are_failed(dataset, settings):
+    stale = ImageUpload.objects.get(user=dataset.user)
+    ImageUpload.objects.filter(id=stale.id).update(
+        updated_at=timezone.now() - timedelta(seconds=settings.UPLOAD_STALE_SECONDS + 1)
+    )
+    recent = ImageUpload.objects.create(
+        user=dataset.user, backend="local", file_name="j.png", size=1
+    )
+
+    assert fail_stale_uploads() == 1
+    stale.refresh_from_db()
+    recent.refresh_from_db()
+    assert [stale.status, recent.status] == ["failed", "pending"]
+
+
+@pytest.mark.django_db
+def test_claim_job_takes_queued_jobs_oldest_first():
+    user = User.objects.create_user("jobs")
+    first, second = (
+        Job.objects.create(user=user, kind="rebuild_counters") for _ in range(2)
+    )
+    Job.objects.create(user=user, kind="rebuild_counters", status="cancelled")
+
+    claimed = [claim_job("host:1"), claim_job("host:2"), claim_job("host:3")]
+
+    assert [job and job.id for job in claimed] == [first.id, second.id, None]
+    first.refresh_from_db()
+    assert [first.status, first.worker, first.attempts] == ["running", "host:1", 1]
+    assert first.heartbeat_at is not None
+
+
+@pytest.mark.django_db
+def test_run_job_records_how_the_handler_ended():
+    def succeed(job, params, context):
+        return {"ok": True}
+
+    def fail(job, params, context):
+        raise RuntimeError("Out of disk.")
+
+    def stop(job, params, context):
+        raise JobCancelledError
+
+    user = User.objects.create_user("jobs")
+    test_handlers = {
+        function.__name__: JobHandler(
+            function=function,
+            params=RebuildCountersJobParamsSchema,
+            public=False,
+            cancellable=True,
+            discard=None,
+        )
+        for function in (succeed, fail, stop)
+    }
+    with mock.patch.dict(handlers, test_handlers):
+        for kind in ("succeed", "fail", "stop", "unknown"):
+            Job.objects.create(user=user, kind=kind)
+            run_job(claim_job("host"))
+
+    assert list(
+        Job.objects.order_by("id").values_list("status", "result", "error")
+    ) == [
+        ("succeeded", {"ok": True}, ""),
+        ("failed", {}, "Out of disk."),
+        ("cancelled", {}, ""),
+        ("failed", {}, "Unknown job kind 'unknown'."),
+    ]
+
+
+@pytest.mark.django_db
+def test_requeue_stale_jobs_retries_until_attempts_run_out(settings):
+    user = User.objects.create_user("jobs")
+    silent_since = timezone.now() - timedelta(seconds=settings.JOB_STALE_SECONDS + 1)
+    for attempts, heartbeat_at in [
+        (1, silent_since),
+        (settings.JOB_MAX_ATTEMPTS, silent_since),
+        (1, timezone.now()),
+    ]:
+        Job.objects.create(
+            user=user,
+            kind="rebuild_counters",
+            status="running",
+            worker="host",
+            attempts=attempts,
+            heartbeat_at=heartbeat_at,
+        )
+
+    assert requeue_stale_jobs() == 2  # noqa: PLR2004
+    assert list(Job.objects.order_by("id").values_list("status", "worker")) == [
+        ("queued", ""),
+        ("failed", "host"),
+        ("running", "host"),
+    ]
+
+
+@pytest.mark.django_db
+def test_cancel_job_stops_queued_and_running_jobs(tmp_path):
+    user = User.objects.create_user("jobs")
+    manifest_path = tmp_path / "manifest.csv"
+    manifest_path.write_text("url\nhttps://images.example.com/1.jpg\n")
+    queued = Job.objects.create(
+        user=user,
+        kind="import_tasks",
+        params={"project_id": 1, "manifest_path": str(manifest_path), "format": "csv"},
+    )
+    running = Job.objects.create(user=user, kind="rebuild_counters", status="running")
+    finished = Job.objects.create(
+        user=user, kind="rebuild_counters", status="succeeded"
+    )
+
+    assert CancelJobUseCase(job_id=queued.id, user=user).execute().status == (
+        "cancelled"
+    )
+    assert not manifest_path.exists()
+
+    assert CancelJobUseCase(job_id=running.id, user=user).execute().cancel_requested
+    with pytest.raises(JobCancelledError):
+        JobContext(running).report({}, force=True)
+
+    with pytest.raises(HttpError) as error:
+        CancelJobUseCase(job_id=finished.id, user=user).execute()
+    assert error.value.status_code == 409  # noqa: PLR2004
+
+
+@pytest.mark.django_db
+def test_purge_of_a_deleted_project_cannot_be_cancelled(dataset):
+    job = DeleteProjectUseCase(
+        dataset.project.id, dataset.user, background=True
+    ).execute()
+
+    response = dataset.client.post(f"/api/jobs/{job.id}/cancel/")
+
+    assert response.status_code == 409  # noqa: PLR2004
+    job.refresh_from_db()
+    assert [job.status, job.cancel_requested] == ["queued", False]
+
+
+@pytest.mark.django_db
+def test_export_job_file_is_only_served_to_its_owner(dataset, settings):
+    Job.objects.filter(status="queued").delete()
+    job = Job.objects.create(
+        user=dataset.user,
+        kind="export_project",
+        params={"project_id": dataset.project.id},
+    )
+
+    run_job(claim_job("host"))
+
+    job.refresh_from_db()
+    assert job.status == "succeeded"
+    assert not os.path.exists(settings.MEDIA_ROOT)
+    response = dataset.client.get(job.result["download_url"])
+    lines = b"".join(response.streaming_content).splitlines()
+    assert len(lines) == dataset.project.tasks.count()
+    assert response["Content-Disposition"] == (
+        f'attachment; filename="project-{dataset.project.id}.ndjson"'
+    )
+
+    other = User.objects.create_user("other")
+    with pytest.raises(ValueError, match="Job does not exist."):
+        DownloadExportUseCase(job_id=job.id, user=other).execute()
+
+
+@pytest.mark.django_db
+def test_tasks_of_a_project_deleted_in_the_background_are_gone(dataset):
+    DeleteProjectUseCase(dataset.project.id, dataset.user, background=True).execute()
+
+    assert not ListTasksUseCase(dataset.project.id).execute().exists()
+    assert not ListAnnotationsUseCase(dataset.task.id).execute().exists()
+    with pytest.raises(ValueError, match="Task does not exist."):
+        UpdateTaskUseCase(dataset.task.id, url="https://example.com/a.png").execute()
+    with pytest.raises(ValueError, match="Task does not exist."):
+        async_to_sync(UpdateTaskUseCase(dataset.task.id).aexecute)()
+
+
+@pytest.mark.django_db
+def test_purge_project_deletes_every_row_of_the_project_only(dataset):
+    project = dataset.project
+    others = {
+        model: model.objects.exclude(**{lookup: project.id}).count()
+        for model, lookup in [
+            (Task, "project_id"),
+            (Annotations, "task__project_id"),
+            (AnnotationLabel, "task__project_id"),
+            (Label, "project_id"),
+        ]
+    }
+    expected = {
+        "total_tasks": project.tasks.count(),
+        "tasks": project.tasks.count(),
+        "annotations": Annotations.objects.filter(task__project=project).count(),
+    }
+    assert AnnotationLabel.objects.filter(task__project=project).exists()
+    DeleteProjectUseCase(project.id, dataset.user, background=True).execute()
+
+    reports = []
+    progress = purge_project(project.id, batch_size=4, report=reports.append)
+
+    assert progress == expected
+    assert len(reports) == math.ceil(expected["total_tasks"] / 4)
+    assert not Project.all_objects.filter(id=project.id).exists()
+    assert {model: model.objects.count() for model in others} == others
+
+
+@pytest.mark.django_db
+def test_bulk_create_writes_valid_rows_and_reports_the_rest(dataset):
+    stranger = User.objects.create_user("stranger")
+    other = Task.objects.create(
+        project=Project.objects.create(user=stranger, name="Theirs"),
+        url="https://images.example.com/theirs.jpg",
+    )
+    row = {"coordinates": "[1, 2, 3, 4]", "labels": "car, bus", "data": {}}
+    lines = [
+        {**row, "task_id": dataset.task.id},
+        "{not json",
+        {**row, "task_id": other.id},
+        {"task_id": dataset.task.id, "coordinates": "[1, 2, 3, 4]"},
+        {**row, "task_id": dataset.task.id},
+    ]
+    before = {
+        task: Annotations.objects.filter(task=task).count()
+        for task in (dataset.task, other)
+    }
+    counters = ProjectCounters.objects.get(project=dataset.project).annotations
+
+    response = dataset.client.post(
+        "/api/bulk-create-annotations/",
+        data="\n".join(
+            line if isinstance(line, str) else json.dumps(line) for line in lines
+        ),
+        content_type="application/x-ndjson",
+    )
+
+    result = response.json()
+    assert [result["total"], result["created"], result["failed"]] == [5, 2, 3]
+    assert [r["success"] for r in result["results"]] == [
+        True,
+        False,
+        False,
+        False,
+        True,
+    ]
+    assert result["results"][2]["error"] == "Task does not exist."
+    created = Annotations.objects.filter(
+        id__in=[result["results"][i]["id"] for i in (0, 4)]
+    )
+    assert {annotation.task_id for annotation in created} == {dataset.task.id}
+    assert {(a.bbox_x_max, a.bbox_y_max) for a in created} == {(4, 6)}
+    assert {task: Annotations.objects.filter(task=task).count() for task in before} == {
+        dataset.task: before[dataset.task] + 2,
+        other: before[other],
+    }
+    assert AnnotationLabel.objects.filter(annotation__in=created).count() == 4  # noqa: PLR2004
+    assert ProjectCounters.objects.get(project=dataset.project).annotations == (
+        counters + 2
+    )
+
+
+@pytest.mark.django_db
+def test_import_tasks_skips_urls_already_in_the_project(dataset, settings):
+    settings.BULK_CREATE_BATCH_SIZE = 2
+    existing = dataset.task.url
+    urls = [
+        "https://images.example.com/i/1.jpg",
+        "https://images.example.com/i/1.jpg",
+        existing,
+        "not a url",
+        "https://images.example.com/i/2.jpg",
+        "https://images.example.com/i/1.jpg",
+    ]
+    tasks = dataset.project.tasks.count()
+    body = "url\n" + "".join(f"{url}\n" for url in urls)
+
+    response = dataset.client.post(
+        f"/api/projects/{dataset.project.id}/import-tasks/",
+        data={"manifest": SimpleUploadedFile("m.csv", body.encode(), "text/csv")},
+    )
+
+    reports = [
+        json.loads(line) for line in b"".join(response.streaming_content).splitlines()
+    ]
+    assert [report["done"] for report in reports] == [False, False, True]
+    assert {
+        key: reports[-1][key]
+        for key in ("processed", "created", "duplicates", "invalid")
+    } == {"processed": 6, "created": 2, "duplicates": 3, "invalid": 1}
+    assert dataset.project.tasks.count() == tasks + 2
+    assert dataset.project.tasks.filter(url=urls[0]).count() == 1
+    assert dataset.project.tasks.filter(url=existing).count() == 1
+    assert ProjectCounters.objects.get(project=dataset.project).tasks == tasks + 2
+
+
+@pytest.mark.django_db
+def test_project_export_holds_each_task_with_its_own_annotations(dataset, settings):
+    settings.EXPORT_CHUNK_SIZE = 3
+    project = dataset.project
+    empty = Task.objects.create(project=project, url="https://images.example.com/e")
+    polygon = {"type": "polygon", "points": [0, 0, 4, 0, 4, 3]}
+    tagged = dataset.client.post(
+        "/api/create-annotation/",
+        data={
+            "task_id": dataset.task.id,
+            "coordinates": "",
+            "labels": "cat; dog",
+            "data": {},
+            "geometry": polygon,
+        },
+        content_type="application/json",
+    ).json()
+    bare = Annotations.objects.create(task=dataset.task, labels="", data={})
+    annotations = {
+        task.id: sorted(task.annotations.values_list("id", flat=True))
+        for task in project.tasks.all()
+    }
+    url = f"/api/projects/{project.id}/export/"
+
+    response = dataset.client.get(url)
+    lines = [
+        json.loads(line) for line in b"".join(response.streaming_content).splitlines()
+    ]
+    assert [line["id"] for line in lines] == sorted(annotations)
+    assert {
+        line["id"]: [annotation["id"] for annotation in line["annotations"]]
+        for line in lines
+    } == annotations
+    assert annotations[empty.id] == []
+
+    response = dataset.client.get(url, {"format": "coco"})
+    coco = json.loads(b"".join(response.streaming_content))
+    assert sorted(image["id"] for image in coco["images"]) == sorted(annotations)
+    labels = {category["id"]: category["name"] for category in coco["categories"]}
+    items = {}
+    for item in coco["annotations"]:
+        names = items.setdefault(item["attributes"]["annotation_id"], [])
+        names.append(labels[item["category_id"]])
+    assert sorted(items) == sorted(sum(annotations.values(), []))
+    assert len({item["id"] for item in coco["annotations"]}) == sum(
+        map(len, items.values())
     )
-    assert response["message"] == "User created successfully"
+    for annotation in Annotations.objects.filter(task__project=project):
+        assert sorted(items[annotation.id]) == sorted(
+            parse_labels(annotation.labels) or ["unlabeled"]
+        ), annotation.labels
+    assert sorted(items[tagged["id"]]) == ["cat", "dog"]
+    assert items[bare.id] == ["unlabeled"]
+
+    budget = router_budgets(router)["GET", "/projects/{project_id}/export/"]
+    path = "/projects/{project_id}/export/"
+    assert count_queries(dataset, "GET", path, format="coco") <= budget
+    assert {
+        item["area"]
+        for item in coco["annotations"]
+        if item["attributes"]["annotation_id"] == tagged["id"]
+    } == {6}
+
+    stranger = User.objects.create_user("stranger")
+    with pytest.raises(ValueError, match="Project does not exist."):
+        ExportProjectUseCase(project.id, stranger, "ndjson").execute()
+
+
+@pytest.mark.django_db
+def test_dashboard_counters_follow_every_write(
+    dataset, django_capture_on_commit_callbacks
+):
+    client, user = dataset.client, dataset.user
+
+    def dashboard() -> list[int]:
+        metrics = client.get("/api/metrics").json()
+        return [
+            metrics[f"total_{name}"] for name in ("projects", "tasks", "annotations")
+        ]
+
+    def counted() -> list[int]:
+        projects = Project.objects.filter(user=user)
+        return [
+            projects.count(),
+            Task.objects.filter(project__in=projects).count(),
+            Annotations.objects.filter(task__project__in=projects).count(),
+        ]
+
+    def write(method: str, path: str, payload: dict | None = None) -> dict:
+        with django_capture_on_commit_callbacks(execute=True):
+            response = getattr(client, method)(
+                f"/api{path}", data=json.dumps(payload), content_type="application/json"
+            )
+        assert response.status_code < 400, response.content  # noqa: PLR2004
+        return response.json() if response.content else {}
+
+    start = dashboard()
+    assert start == counted()
+
+    project = write("post", "/projects/", {"name": "Counted", "description": ""})
+    task = write(
+        "post",
+        "/create-task/",
+        {"project_id": project["id"], "url": "https://images.example.com/c.jpg"},
+    )
+    row = {"coordinates": "[1, 2, 3, 4]", "labels": "car", "data": {}}
+    annotation = write("post", "/create-annotation/", {**row, "task_id": task["id"]})
+    write("post", "/create-annotation/", {**row, "task_id": dataset.task.id})
+    assert dashboard() == counted() == [start[0] + 1, start[1] + 1, start[2] + 2]
+
+    write("delete", f"/delete-annotation/{annotation['id']}/")
+    write("delete", f"/delete-task/{dataset.task.id}/")
+    assert dashboard() == counted()
+
+    write("delete", f"/projects/{project['id']}/")
+    assert dashboard() == counted()
+    assert ProjectCounters.objects.get(project=dataset.project).tasks == (
+        dataset.project.tasks.count()
+    )
+
+    with django_capture_on_commit_callbacks(execute=True):
+        rebuild_counters([user.id])
+    assert dashboard() == counted()
+
+
+@pytest.mark.django_db
+def test_async_api_answers_like_the_sync_api(
+    dataset, django_capture_on_commit_callbacks
+):
+    client = AsyncClient()
+    headers = {"Authorization": dataset.client.defaults["HTTP_AUTHORIZATION"]}
+    project_id, task_id = dataset.project.id, dataset.task.id
+    reads = [
+        ("/projects/", {}),
+        (f"/projects/{project_id}/", {"expand": "annotations"}),
+        (f"/list-tasks/{project_id}", {}),
+        (f"/list-annotations/{task_id}/", {}),
+        ("/annotations/region/", {"project_id": project_id, "x_max": 4096}),
+        ("/label-stats/", {"project_id": project_id}),
+        ("/metrics", {}),
+    ]
+
+    async def call(method: str, path: str, payload: dict | None = None):
+        response = await getattr(client, method)(
+            f"/api/async{path}",
+            data=json.dumps(payload),
+            content_type="application/json",
+            headers=headers,
+        )
+        assert response.status_code < 400, response.content  # noqa: PLR2004
+        return response.json() if response.content else None
+
+    for path, params in reads:
+        caches["responses"].clear()
+        answer = async_to_sync(client.get)(
+            f"/api/async{path}", params, headers=headers
+        ).json()
+        assert answer == dataset.client.get(f"/api{path}", params).json(), path
+
+    row = {"coordinates": "[1, 2, 3, 4]", "labels": "car", "data": {}}
+    url = "https://images.example.com/async.jpg"
+    with django_capture_on_commit_callbacks(execute=True):
+        task = async_to_sync(call)(
+            "post", "/create-task/", {"project_id": project_id, "url": url}
+        )
+        async_to_sync(call)("put", f"/update-task/{task['id']}/", {"url": url + "?2"})
+        annotation = async_to_sync(call)(
+            "post", "/create-annotation/", {**row, "task_id": task["id"]}
+        )
+        async_to_sync(call)(
+            "put", f"/update-annotation/{annotation['id']}/", {"labels": "bus"}
+        )
+        async_to_sync(call)("delete", f"/delete-task/{task_id}/")
+
+    assert Task.objects.get(id=task["id"]).url == url + "?2"
+    assert Annotations.objects.get(id=annotation["id"]).labels == "bus"
+    assert not Task.objects.filter(id=task_id).exists()
+    path = f"/list-annotations/{task['id']}/"
+    answer = async_to_sync(client.get)(f"/api/async{path}", headers=headers).json()
+    assert answer == dataset.client.get(f"/api{path}").json()
+    assert [item["id"] for item in answer["data"]] == [annotation["id"]]
+
+
+@pytest.mark.django_db
+def test_uploads_of_the_same_content_share_one_stored_file(dataset, settings):
+    def upload(name: str, color: str) -> str:
+        buffer = BytesIO()
+        Image.new("RGB", (8, 8), color).save(buffer, "PNG")
+        file = SimpleUploadedFile(name, buffer.getvalue(), "image/png")
+        return dataset.client.post("/api/upload-image/", data={"file": file}).json()
+
+    first = upload("a.png", "red")
+    copy = upload("b.png", "red")
+    other = upload("a.png", "blue")
+
+    assert first == copy != other
+    assert ImageAsset.objects.count() == 2  # noqa: PLR2004
+    stored = os.path.join(settings.MEDIA_ROOT, "uploads")
+    assert len(os.listdir(stored)) == 2  # noqa: PLR2004
+    assert os.listdir(settings.UPLOAD_STAGING_DIR) == []
+
+    # An upload that loses the race to index new content gets the winner's URL.
+    storage = get_storage()
+    save = storage.save
+
+    def save_after_a_concurrent_upload(path, file_name, content_type):
+        url = save(path, file_name, content_type)
+        with open(path, "rb") as staged:
+            sha256 = hashlib.sha256(staged.read()).hexdigest()
+        ImageAsset.objects.create(
+            sha256=sha256,
+            backend=storage.name,
+            url="https://images.example.com/winner.png",
+            content_type=content_type,
+            size=os.path.getsize(path),
+        )
+        return url
+
+    with mock.patch.object(storage, "save", save_after_a_concurrent_upload):
+        assert upload("c.png", "green") == "https://images.example.com/winner.png"
+    assert ImageAsset.objects.count() == 3  # noqa: PLR2004
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"cursor": Paginator.encode_cursor({"o": "created_at", "v": "x", "id": 1})},
+        {"cursor": Paginator.encode_cursor({"o": "id", "v": 1, "id": "x"})},
+        {"cursor": Paginator.encode_cursor({"o": "id", "v": None, "id": 1})},
+        {"cursor": Paginator.encode_cursor({"o": 1, "v": 1, "id": 1})},
+        {"cursor": "not a cursor"},
+        {"mode": "cursor", "ordering": "-nope"},
+        {"mode": "cursor", "ordering": "annotations"},
+    ],
+)
+def test_tampered_cursors_and_orderings_are_bad_requests(dataset, params):
+    response = dataset.client.get(f"/api/list-tasks/{dataset.project.id}", params)
+    assert response.status_code == 400  # noqa: PLR2004
+
+
+@pytest.mark.django_db
+def test_cursor_pages_walk_every_row_once(dataset):
+    path = f"/api/list-tasks/{dataset.project.id}"
+    params = {"mode": "cursor", "ordering": "-created_at", "page_size": 3}
+    seen = []
+    while True:
+        page = dataset.client.get(path, params).json()
+        seen += [task["id"] for task in page["data"]]
+        if not page["next"]:
+            break
+        params = {"cursor": parse_qs(urlparse(page["next"]).query)["cursor"][0]}
+    assert sorted(seen) == sorted(dataset.project.tasks.values_list("id", flat=True))
+
+
+@pytest.mark.django_db
+def test_saves_bump_the_generation_once_they_commit(
+    dataset, django_capture_on_commit_callbacks
+):
+    before = get_generation(Task)
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        Task.objects.create(project=dataset.project, url="https://example.com/g.png")
+        assert get_generation(Task) == before
+
+    for callback in callbacks:
+        callback()
+    assert get_generation(Task) == before + 1
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("background", [True, False])
+def test_delete_project_bumps_every_generation_on_commit(
+    dataset, django_capture_on_commit_callbacks, background
+):
+    models = (Project, Task, Annotations)
+    before = [get_generation(model) for model in models]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        DeleteProjectUseCase(
+            dataset.project.id, dataset.user, background=background
+        ).execute()
+
+    assert [get_generation(model) for model in models] == [
+        generation + 1 for generation in before
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.skipif(
+    not connection.features.has_select_for_update, reason="needs row locks"
+)
+def test_concurrent_imports_into_one_project_insert_each_url_once():
+    user = User.objects.create_user("importer")
+    project = Project.objects.create(user=user, name="Imports")
+    ProjectCounters.objects.create(project=project)
+    urls = [f"https://images.example.com/c/{i}.jpg" for i in range(3)]
+    inserting = threading.Event()
+    bulk_create = Task.objects.bulk_create
+
+    def slow_bulk_create(tasks, **kwargs):
+        # Hold the first import between its duplicate check and its commit.
+        if not inserting.is_set():
+            inserting.set()
+            time.sleep(0.5)
+        return bulk_create(tasks, **kwargs)
+
+    def run_import():
+        try:
+            list(ImportTasksUseCase(project.id, urls, user).execute())
+        finally:
+            connection.close()
+
+    with mock.patch.object(Task.objects, "bulk_create", slow_bulk_create):
+        first = threading.Thread(target=run_import)
+        first.start()
+        inserting.wait(timeout=5)
+        run_import()
+        first.join()
+
+    assert sorted(project.tasks.values_list("url", flat=True)) == urls
+
+
+@pytest.mark.django_db
+def test_pyramids_missing_when_read_are_built_by_a_job(dataset, tmp_path):
+    source = tmp_path / "source.png"
+    Image.new("RGBA", (600, 300), "red").save(source)
+    url = get_storage().save(str(source), "source.png", "image/png")
+    task = Task.objects.create(project=dataset.project, url=url)
+    Job.objects.filter(status=Job.Status.QUEUED).delete()
+    path = f"/api/tasks/{task.id}/pyramid/"
+
+    assert dataset.client.get(path).status_code == 409  # noqa: PLR2004
+    assert dataset.client.get(path).status_code == 409  # noqa: PLR2004
+    job = Job.objects.get(status=Job.Status.QUEUED)
+    assert job.kind == "build_pyramid"
+    assert TilePyramid.objects.get(source_url=url).status == "pending"
+
+    with mock.patch.object(derivative_pool, "workers", 0):
+        run_job(claim_job("host"))
+
+    answer = dataset.client.get(path).json()
+    assert (answer["status"], answer["width"], answer["height"]) == ("done", 600, 300)
+    assert not Job.objects.filter(status=Job.Status.QUEUED).exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    ("use_case", "fields"),
+    [
+        (BulkUpdateTasksUseCase, {"url": "https://images.example.com/moved.jpg"}),
+        (BulkUpdateAnnotationsUseCase, {"labels": "moved"}),
+    ],
+)
+def test_bulk_updates_skip_rows_whose_project_went_away_after_the_check(
+    dataset, use_case, fields
+):
+    model = use_case.model
+    ids = dataset.task_ids if model is Task else dataset.annotation_ids
+    before = list(model.objects.filter(id__in=ids).order_by("id").values())
+    owned = use_case.owned
+
+    def owned_then_deleted(self, ids):
+        projects = owned(self, ids)
+        Project.objects.filter(id=dataset.project.id).update(deleted_at=timezone.now())
+        return projects
+
+    rows = [{"id": i, "fields": fields} for i in ids]
+    with mock.patch.object(use_case, "owned", owned_then_deleted):
+        answer = use_case(rows, dataset.user).execute()
+
+    assert (answer["updated"], answer["failed"]) == (0, len(ids))
+    assert not any(result["success"] for result in answer["results"])
+    assert list(model.objects.filter(id__in=ids).order_by("id").values()) == before
+
+
+def test_bulk_updates_must_say_which_rows_the_user_owns():
+    class Incomplete(BulkUpdateUseCase):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete([], User(id=1))
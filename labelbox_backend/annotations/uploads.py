@@ -0,0 +1,167 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from ninja.errors import HttpError
+
+from .derivatives import derivative_pool
+from .models import ImageAsset, ImageUpload
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+
+def stage_file(file) -> tuple[str, str]:
+    """
+    Copy an uploaded file to the staging directory.
+
+    Returns the staged path and the file's SHA-256, computed chunk by chunk
+    while copying so the file is read only once. Django removes its own
+    temporary upload files when the request ends, so anything processed
+    after the response needs its own copy.
+    """
+    os.makedirs(settings.UPLOAD_STAGING_DIR, exist_ok=True)
+    descriptor, path = tempfile.mkstemp(dir=settings.UPLOAD_STAGING_DIR)
+    digest = hashlib.sha256()
+    with os.fdopen(descriptor, "wb") as staged:
+        for chunk in file.chunks():
+            digest.update(chunk)
+            staged.write(chunk)
+    return path, digest.hexdigest()
+
+
+def discard_staged_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def find_asset(sha256: str, backend: str) -> ImageAsset | None:
+    return ImageAsset.objects.filter(sha256=sha256, backend=backend).first()
+
+
+def store_asset(
+    path: str, file_name: str, sha256: str, content_type: str, size: int
+) -> ImageAsset:
+    """
+    Store a staged file unless the same content is already stored.
+
+    Two concurrent uploads of a new image may both reach the backend; the
+    unique constraint keeps one index entry and both get its URL.
+    """
+    storage = get_storage()
+    asset = find_asset(sha256, storage.name)
+    if asset is not None:
+        return asset
+
+    url = storage.save(path, file_name, content_type)
+    ImageAsset.objects.bulk_create(
+        [
+            ImageAsset(
+                sha256=sha256,
+                backend=storage.name,
+                url=url,
+                content_type=content_type,
+                size=size,
+            )
+        ],
+        ignore_conflicts=True,
+    )
+    derivative_pool.request(url)
+    return find_asset(sha256, storage.name)
+
+
+def mark_upload(upload_id: int, **fields) -> None:
+    ImageUpload.objects.filter(id=upload_id).update(updated_at=timezone.now(), **fields)
+
+
+def run_upload(upload_id: int, path: str) -> None:
+    """Push a staged file to the storage backend and record the outcome."""
+    close_old_connections()
+    try:
+        upload = ImageUpload.objects.get(id=upload_id)
+        mark_upload(upload_id, status=ImageUpload.Status.UPLOADING)
+        asset = store_asset(
+            path, upload.file_name, upload.sha256, upload.content_type, upload.size
+        )
+    except Exception as e:
+        logger.exception("Image upload failed", extra={"upload_id": upload_id})
+        mark_upload(upload_id, status=ImageUpload.Status.FAILED, error=str(e))
+    else:
+        mark_upload(upload_id, status=ImageUpload.Status.DONE, url=asset.url)
+    finally:
+        discard_staged_file(path)
+        close_old_connections()
+
+
+def fail_stale_uploads() -> int:
+    """
+    Fail uploads left pending or uploading by a process that stopped; the
+    queue that held them went with it.
+    """
+    now = timezone.now()
+    return ImageUpload.objects.filter(
+        status__in=[ImageUpload.Status.PENDING, ImageUpload.Status.UPLOADING],
+        updated_at__lt=now - timedelta(seconds=settings.UPLOAD_STALE_SECONDS),
+    ).update(
+        status=ImageUpload.Status.FAILED,
+        error="The upload was interrupted.",
+        updated_at=now,
+    )
+
+
+class UploadPool:
+    """
+    Bounded thread pool that runs staged uploads after the response.
+
+    Callers `reserve` a slot before staging a file, which caps the uploads
+    waiting in this process at `queue_limit`; the slot is released when
+    the upload finishes. With no workers uploads run inline.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.slots = threading.BoundedSemaphore(queue_limit)
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def reserve(self) -> None:
+        if not self.slots.acquire(blocking=False):
+            raise HttpError(503, "Too many uploads in progress, retry later.")
+
+    def release(self, *args) -> None:
+        self.slots.release()
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        # Created on first use so forked workers each start their own threads.
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="image-upload"
+                )
+            return self.executor
+
+    def submit(self, upload_id: int, path: str) -> None:
+        if not self.workers:
+            try:
+                run_upload(upload_id, path)
+            finally:
+                self.release()
+            return
+
+        future = self.get_executor().submit(run_upload, upload_id, path)
+        future.add_done_callback(self.release)
+
+
+upload_pool = UploadPool(
+    workers=settings.UPLOAD_WORKERS,
+    queue_limit=settings.UPLOAD_QUEUE_LIMIT,
+)
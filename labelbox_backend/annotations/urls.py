@@ -1,11 +1,23 @@
 from ninja_extra import NinjaExtraAPI
 from ninja_jwt.controller import NinjaJWTDefaultController
 
+from .async_views import router as async_annotations_router
 from .auth_views import router as auth_router
+from .renderers import FastJSONParser, FastJSONRenderer
 from .views import router as annotations_router
 
-api = NinjaExtraAPI()
+api = NinjaExtraAPI(renderer=FastJSONRenderer(), parser=FastJSONParser())
 api.register_controllers(NinjaJWTDefaultController)
 
 api.add_router("", annotations_router)
 api.add_router("", auth_router)
+
+# Async endpoints get their own API so their URL names do not clash with
+# the sync ones; tokens come from the sync API's /token/ endpoints.
+async_api = NinjaExtraAPI(
+    urls_namespace="async-api",
+    title="Async API",
+    renderer=FastJSONRenderer(),
+    parser=FastJSONParser(),
+)
+async_api.add_router("", async_annotations_router)
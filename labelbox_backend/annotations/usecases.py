@@ -1,16 +1,76 @@
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import QuerySet
+from django.core.exceptions import (
+    ObjectDoesNotExist,
+)
+from django.core.exceptions import (
+    ValidationError as DjangoValidationError,
+)
+from django.db import transaction
+from django.db.models import Count, Model, Prefetch, QuerySet
+from django.utils import timezone
+from ninja import Schema, UploadedFile
 from ninja.errors import HttpError
+from pydantic import ValidationError
 
+from .bulk_updates import update_from_values
+from .caching import abump_generation, bump_generation
+from .counters import adjust_counters
+from .derivatives import derivative_pool, is_abandoned
 from .dtos import (
+    AnnotationPatchSchema,
     CreateAnnotationSchema,
+    CreateJobSchema,
+    Paginator,
     ProjectSchema,
+    RegionFilterSchema,
     SignupSchema,
+    TaskPatchSchema,
+    TileViewportSchema,
     UpdateAnnotationSchema,
     UpdateProjectSchema,
 )
-from .models import Annotations, Project, Task
+from .exporters import (
+    EXPORT_FORMATS,
+    export_path,
+    iter_coco_export,
+    iter_ndjson_export,
+)
+from .geometry import geometry_values, replaced_geometry
+from .jobs import handlers
+from .labels import sync_annotation_labels
+from .models import (
+    AnnotationLabel,
+    Annotations,
+    ImageUpload,
+    Job,
+    Label,
+    Project,
+    ProjectCounters,
+    Task,
+    TilePyramid,
+    UserCounters,
+)
+from .parsers import MalformedRow
+from .pyramids import level_size, tile_name
+from .response_cache import invalidate_responses
+from .storage import get_storage
+from .uploads import (
+    discard_staged_file,
+    find_asset,
+    stage_file,
+    store_asset,
+    upload_pool,
+)
+from .versioning import update_annotation
 
 
 class BaseUseCase:
@@ -18,38 +78,57 @@ class BaseUseCase:
         self.user = user
 
     def validate_user(self, project: Project):
-        if self.user != project.user:
+        if self.user.id != project.user_id:
             raise HttpError(400, "Not the creating user")
 
 
+class AtomicUseCaseMixin:
+    async def aexecute(self):
+        """
+        Run `execute` from async code.
+
+        Django's async ORM has no transaction support, so use cases that
+        write inside `transaction.atomic` run whole in one `sync_to_async`
+        call: a single thread hop per request instead of one per query.
+        """
+        return await sync_to_async(self.execute)()
+
+
 class DashboardMetricsUseCase:
     def __init__(self, user):
         self.user = user
 
-    def execute(self):
-        total_projects = Project.objects.filter(user=self.user).count()
-
-        total_tasks = Task.objects.filter(project__user=self.user).count()
-
-        total_annotations = Annotations.objects.filter(
-            task__project__user=self.user
-        ).count()
+    def recent_annotations(self) -> QuerySet:
+        return (
+            Annotations.objects.filter(
+                task__project__user=self.user, task__project__deleted_at__isnull=True
+            )
+            .order_by("-created_at", "-id")
+            .values("coordinates", "labels", "created_at")[:5]
+        )
 
-        recent_annotations = Annotations.objects.filter(
-            task__project__user=self.user
-        ).order_by("-created_at")[:5]
+    def metrics(self, counters: UserCounters | None, recent: list[dict]) -> dict:
+        if counters is None:
+            counters = UserCounters(user=self.user)
 
         return {
-            "total_projects": total_projects,
-            "total_tasks": total_tasks,
-            "total_annotations": total_annotations,
-            "recent_annotations": list(
-                recent_annotations.values("coordinates", "labels", "created_at")
-            ),
+            "total_projects": counters.projects,
+            "total_tasks": counters.tasks,
+            "total_annotations": counters.annotations,
+            "recent_annotations": recent,
         }
 
+    def execute(self):
+        counters = UserCounters.objects.filter(user=self.user).first()
+        return self.metrics(counters, list(self.recent_annotations()))
+
+    async def aexecute(self):
+        counters = await UserCounters.objects.filter(user=self.user).afirst()
+        recent = [row async for row in self.recent_annotations()]
+        return self.metrics(counters, recent)
+
 
-class CreateProjectUseCase:
+class CreateProjectUseCase(AtomicUseCaseMixin):
     def __init__(self, data: ProjectSchema, user: User):
         self.name = data.name
         self.description = data.description
@@ -57,7 +136,12 @@ class CreateProjectUseCase:
 
     def execute(self) -> Project:
         project = Project(name=self.name, description=self.description, user=self.user)
-        project.save()
+        with transaction.atomic():
+            project.save()
+            # Created up front so the project's first write to its counters
+            # is a single UPDATE, like every later one.
+            ProjectCounters.objects.create(project=project)
+            adjust_counters(self.user.id, projects=1)
         return project
 
 
@@ -77,48 +161,179 @@ class UpdateProjectUseCase(BaseUseCase):
         self.user = user
 
     def execute(self) -> Project:
-        project = Project.objects.filter(id=self.project_id)
-        if not project.exists():
+        project = Project.objects.filter(id=self.project_id).first()
+        if project is None:
             raise ValueError("Project does not exist.")
 
-        self.validate_user(project=project.first())
+        self.validate_user(project=project)
 
-        project.update(**self.data)
+        Project.objects.filter(id=self.project_id).update(**self.data)
+        adjust_counters(self.user.id, self.project_id)
+        bump_generation(Project)
+        for key, value in self.data.items():
+            setattr(project, key, value)
+        return project
+
+    async def aexecute(self) -> Project:
+        project = await Project.objects.filter(id=self.project_id).afirst()
+        if project is None:
+            raise ValueError("Project does not exist.")
+
+        self.validate_user(project=project)
+
+        await Project.objects.filter(id=self.project_id).aupdate(**self.data)
+        await sync_to_async(adjust_counters)(self.user.id, self.project_id)
+        await abump_generation(Project)
+        for key, value in self.data.items():
+            setattr(project, key, value)
         return project
 
 
 class GetProjectUseCase(BaseUseCase):
-    def __init__(self, project_id: int, user: User):
+    """
+    Fetch a project with the first page of its tasks.
+
+    The project, its ownership and its task counter come back in one query.
+    Only `page_size` tasks are loaded; `task_cursor` continues the listing
+    on `/list-tasks/` in cursor mode. Annotations are prefetched for that
+    page only, and only when `annotations` is in `expand`.
+    """
+
+    EXPANDABLE = {"annotations"}
+
+    def __init__(
+        self,
+        project_id: int,
+        user: User,
+        expand: set[str] | None = None,
+        page_size: int = 20,
+    ):
         super().__init__(user=user)
         self.project_id = project_id
+        self.expand = expand or set()
+        self.page_size = page_size
+
+    def project_queryset(self) -> QuerySet[Project]:
+        unknown = self.expand - self.EXPANDABLE
+        if unknown:
+            raise HttpError(400, f"Cannot expand {', '.join(sorted(unknown))}.")
+        return Project.objects.select_related("counters").filter(id=self.project_id)
+
+    def task_queryset(self, project: Project) -> QuerySet[Task]:
+        tasks = Task.objects.filter(project_id=project.id).order_by("id")
+        if "annotations" in self.expand:
+            tasks = tasks.prefetch_related(
+                Prefetch("annotations", queryset=Annotations.objects.order_by("id"))
+            )
+        return tasks[: self.page_size + 1]
+
+    def attach_tasks(self, project: Project, page: list[Task]) -> Project:
+        project.task_page = page[: self.page_size]
+        project.task_page_size = self.page_size
+        project.task_cursor = None
+        if len(page) > self.page_size:
+            last_id = project.task_page[-1].id
+            project.task_cursor = Paginator.encode_cursor(
+                {"o": "id", "v": last_id, "id": last_id, "r": False}
+            )
+        expand_annotations = "annotations" in self.expand
+        for task in project.task_page:
+            task.expanded_annotations = (
+                task.annotations.all() if expand_annotations else None
+            )
+        return project
 
     def execute(self) -> Project:
-        project = Project.objects.filter(id=self.project_id).prefetch_related(
-            "tasks", "tasks__annotations"
-        )
-        if not project.exists():
+        project = self.project_queryset().first()
+        if project is None:
+            raise ValueError("Project does not exist.")
+        self.validate_user(project=project)
+
+        return self.attach_tasks(project, list(self.task_queryset(project)))
+
+    async def aexecute(self) -> Project:
+        project = await self.project_queryset().afirst()
+        if project is None:
             raise ValueError("Project does not exist.")
+        self.validate_user(project=project)
 
-        self.validate_user(project=project.first())
-        return project.first()
+        page = [task async for task in self.task_queryset(project)]
+        return self.attach_tasks(project, page)
 
 
-class DeleteProjectUseCase(BaseUseCase):
-    def __init__(self, project_id: int, user: User):
+class ExportProjectUseCase:
+    def __init__(self, project_id: int, user: User, fmt: str):
+        self.project_id = project_id
+        self.user = user
+        self.fmt = fmt
+        self.chunk_size = settings.EXPORT_CHUNK_SIZE
+
+    def execute(self) -> Iterator[str]:
+        if self.fmt not in EXPORT_FORMATS:
+            raise HttpError(400, "Unsupported export format.")
+
+        if not Project.objects.filter(id=self.project_id, user=self.user).exists():
+            raise ValueError("Project does not exist.")
+
+        if self.fmt == "coco":
+            return iter_coco_export(self.project_id, self.chunk_size)
+        return iter_ndjson_export(self.project_id, self.chunk_size)
+
+
+class DeleteProjectUseCase(AtomicUseCaseMixin, BaseUseCase):
+    """
+    Delete a project with its tasks and annotations.
+
+    With `background` the project is only marked deleted, which hides it
+    at once, and the returned `purge_project` job deletes its rows in
+    batches.
+    """
+
+    def __init__(self, project_id: int, user: User, background: bool = False):
         super().__init__(user=user)
 
         self.project_id = project_id
+        self.background = background
 
-    def execute(self):
+    def execute(self) -> Job | None:
         try:
             project = Project.objects.get(id=self.project_id)
             self.validate_user(project=project)
-            project.delete()
         except ObjectDoesNotExist:
             raise ValueError("Project does not exist.")
 
-
-class CreateTaskUseCase:
+        job = None
+        with transaction.atomic():
+            counters = ProjectCounters.objects.filter(project=project).first()
+            if self.background:
+                now = timezone.now()
+                if not Project.objects.filter(id=project.id).update(
+                    deleted_at=now, updated_at=now
+                ):
+                    raise ValueError("Project does not exist.")
+                job = Job.objects.create(
+                    user=self.user,
+                    kind="purge_project",
+                    params={"project_id": project.id},
+                )
+            else:
+                project.delete()
+            adjust_counters(
+                project.user_id,
+                projects=-1,
+                tasks=-counters.tasks if counters else 0,
+                annotations=-counters.annotations if counters else 0,
+            )
+            transaction.on_commit(
+                lambda: invalidate_responses(project.user_id, project.id)
+            )
+            # Even when purged later, the project's tasks and annotations
+            # leave the lists (and their cached totals) now.
+            transaction.on_commit(lambda: bump_generation(Project, Task, Annotations))
+        return job
+
+
+class CreateTaskUseCase(AtomicUseCaseMixin):
     def __init__(self, project_id: int, url: str):
         self.project_id = project_id
         self.url = url
@@ -130,10 +345,104 @@ class CreateTaskUseCase:
             raise ValueError("Project does not exist.")
 
         task = Task(project=project, url=self.url)
-        task.save()
+        with transaction.atomic():
+            task.save()
+            adjust_counters(project.user_id, project.id, tasks=1)
+            transaction.on_commit(lambda: derivative_pool.request(task.url))
         return task
 
 
+class ImportTasksUseCase:
+    """
+    Create tasks for a project from a stream of image URLs.
+
+    URLs are consumed in batches of `BULK_CREATE_BATCH_SIZE`. Each batch is
+    deduplicated against itself and against the project's existing tasks,
+    so memory use is bounded by the batch size rather than the manifest.
+    `execute` yields a progress report after every committed batch; the
+    last report has `done` set.
+    """
+
+    def __init__(self, project_id: int, urls: Iterable[Any], user: User):
+        self.project_id = project_id
+        self.urls = urls
+        self.user = user
+        self.batch_size = settings.BULK_CREATE_BATCH_SIZE
+        self.url_field = Task._meta.get_field("url")
+        self.stats = {
+            "processed": 0,
+            "created": 0,
+            "duplicates": 0,
+            "invalid": 0,
+        }
+
+    def is_valid_url(self, url: Any) -> bool:
+        if isinstance(url, MalformedRow) or not url:
+            return False
+        try:
+            self.url_field.run_validators(url)
+        except DjangoValidationError:
+            return False
+        return True
+
+    def insert_batch(self, urls: list[str]) -> None:
+        unique_urls = list(dict.fromkeys(urls))
+        with transaction.atomic():
+            # Imports into one project take turns between the duplicate
+            # check and the insert, or both would insert the same URLs.
+            Project.objects.select_for_update().filter(id=self.project_id).first()
+            existing = set(
+                Task.objects.filter(
+                    project_id=self.project_id, url__in=unique_urls
+                ).values_list("url", flat=True)
+            )
+            new_urls = [url for url in unique_urls if url not in existing]
+            Task.objects.bulk_create(
+                [Task(project_id=self.project_id, url=url) for url in new_urls]
+            )
+            adjust_counters(self.user.id, self.project_id, tasks=len(new_urls))
+        if new_urls:
+            bump_generation(Task)
+        for url in new_urls:
+            derivative_pool.request(url)
+
+        self.stats["created"] += len(new_urls)
+        self.stats["duplicates"] += len(urls) - len(new_urls)
+
+    def report(self, started_at: float, done: bool = False) -> dict:
+        elapsed = time.monotonic() - started_at
+        return {
+            **self.stats,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.stats["processed"] / elapsed, 1)
+            if elapsed
+            else 0.0,
+            "done": done,
+        }
+
+    def execute(self) -> Iterator[dict]:
+        if not Project.objects.filter(id=self.project_id, user=self.user).exists():
+            raise ValueError("Project does not exist.")
+
+        started_at = time.monotonic()
+        batch = []
+        for url in self.urls:
+            self.stats["processed"] += 1
+            if not self.is_valid_url(url):
+                self.stats["invalid"] += 1
+                continue
+
+            batch.append(url)
+            if len(batch) >= self.batch_size:
+                self.insert_batch(batch)
+                batch = []
+                yield self.report(started_at)
+
+        if batch:
+            self.insert_batch(batch)
+        yield self.report(started_at, done=True)
+
+
 class UpdateTaskUseCase:
     def __init__(self, task_id: int, url: str = None):
         self.task_id = task_id
@@ -141,13 +450,35 @@ class UpdateTaskUseCase:
 
     def execute(self) -> Task:
         try:
-            task = Task.objects.get(id=self.task_id)
+            task = Task.objects.select_related("project").get(
+                id=self.task_id, project__deleted_at__isnull=True
+            )
+        except ObjectDoesNotExist:
+            raise ValueError("Task does not exist.")
+
+        if self.url is not None:
+            task.url = self.url
+        with transaction.atomic():
+            task.save()
+            adjust_counters(task.project.user_id, task.project_id)
+        if self.url is not None:
+            derivative_pool.request(task.url)
+        return task
+
+    async def aexecute(self) -> Task:
+        try:
+            task = await Task.objects.select_related("project").aget(
+                id=self.task_id, project__deleted_at__isnull=True
+            )
         except ObjectDoesNotExist:
             raise ValueError("Task does not exist.")
 
         if self.url is not None:
             task.url = self.url
-        task.save()
+        await task.asave()
+        await sync_to_async(adjust_counters)(task.project.user_id, task.project_id)
+        if self.url is not None:
+            await sync_to_async(derivative_pool.request)(task.url)
         return task
 
 
@@ -156,22 +487,36 @@ class ListTasksUseCase:
         self.project_id = project_id
 
     def execute(self) -> QuerySet[Task]:
-        return Task.objects.filter(project_id=self.project_id)
+        return Task.objects.filter(
+            project_id=self.project_id, project__deleted_at__isnull=True
+        )
 
 
-class DeleteTaskUseCase:
+class DeleteTaskUseCase(AtomicUseCaseMixin):
     def __init__(self, task_id: int):
         self.task_id = task_id
 
     def execute(self):
         try:
-            task = Task.objects.get(id=self.task_id)
-            task.delete()
+            task = Task.objects.select_related("project").get(
+                id=self.task_id, project__deleted_at__isnull=True
+            )
         except ObjectDoesNotExist:
             raise ValueError("Task does not exist.")
 
+        with transaction.atomic():
+            annotations = task.annotations.count()
+            task.delete()
+            adjust_counters(
+                task.project.user_id,
+                task.project_id,
+                tasks=-1,
+                annotations=-annotations,
+            )
+        bump_generation(Task, Annotations)
+
 
-class CreateAnnotationUseCase:
+class CreateAnnotationUseCase(AtomicUseCaseMixin):
     def __init__(self, data: CreateAnnotationSchema):
         self.data = data.model_dump(exclude_none=True)
         self.task_id = self.data.pop("task_id", None)
@@ -180,56 +525,789 @@ class CreateAnnotationUseCase:
 
     def execute(self) -> Annotations:
         try:
-            task = Task.objects.get(id=self.task_id)
+            task = Task.objects.select_related("project").get(
+                id=self.task_id, project__deleted_at__isnull=True
+            )
         except ObjectDoesNotExist:
             raise ValueError("Task does not exist.")
 
+        geometry = self.data.pop("geometry", None)
         annotation = Annotations(
             task=task,
             **self.data,
+            **geometry_values(geometry, self.data.get("coordinates")),
         )
-        annotation.save()
+        with transaction.atomic():
+            annotation.save()
+            sync_annotation_labels([(annotation, task.project_id)])
+            adjust_counters(task.project.user_id, task.project_id, annotations=1)
         return annotation
 
 
+class BulkRowsUseCase:
+    """
+    Validate the rows of a bulk request one at a time against `schema`.
+
+    Rows that fail are reported back by index instead of failing the
+    whole batch; `clean` turns a valid row into the data to write.
+    """
+
+    schema: type[Schema]
+
+    def __init__(self, rows: Iterable[Any], user: User, max_rows: int):
+        self.rows = rows
+        self.user = user
+        self.max_rows = max_rows
+
+    @staticmethod
+    def format_validation_error(error: ValidationError) -> str:
+        return "; ".join(
+            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+            for err in error.errors()
+        )
+
+    @staticmethod
+    def failure(index: int, error: str) -> dict:
+        return {"index": index, "success": False, "error": error}
+
+    def clean(self, payload: Schema) -> dict:
+        return payload.model_dump(exclude_none=True)
+
+    def parse_rows(self) -> tuple[list[tuple[int, dict]], dict[int, dict]]:
+        valid, results = [], {}
+        for index, row in enumerate(self.rows):
+            if index >= self.max_rows:
+                raise HttpError(
+                    413, f"A batch may contain at most {self.max_rows} rows."
+                )
+
+            if isinstance(row, MalformedRow):
+                results[index] = self.failure(index, row.error)
+                continue
+
+            try:
+                payload = self.schema.model_validate(row)
+            except ValidationError as e:
+                results[index] = self.failure(index, self.format_validation_error(e))
+                continue
+
+            valid.append((index, self.clean(payload)))
+        return valid, results
+
+
+class BulkCreateAnnotationsUseCase(BulkRowsUseCase):
+    """
+    Create many annotations, possibly across many tasks, in one request.
+
+    Rows are validated individually; task ownership is resolved with a
+    single query and valid rows are written with `bulk_create` in chunks
+    of `BULK_CREATE_BATCH_SIZE` inside one transaction. Invalid rows are
+    reported back by index instead of failing the whole batch.
+    """
+
+    schema = CreateAnnotationSchema
+
+    def __init__(self, rows: Iterable[Any], user: User):
+        super().__init__(rows, user, max_rows=settings.BULK_CREATE_MAX_ROWS)
+        self.batch_size = settings.BULK_CREATE_BATCH_SIZE
+
+    def clean(self, payload: CreateAnnotationSchema) -> dict:
+        data = payload.model_dump(exclude_none=True)
+        geometry = data.pop("geometry", None)
+        data.update(geometry_values(geometry, data.get("coordinates")))
+        return data
+
+    def execute(self) -> dict:
+        valid, results = self.parse_rows()
+
+        task_ids = {data["task_id"] for _, data in valid}
+        task_projects = dict(
+            Task.objects.filter(
+                id__in=task_ids,
+                project__user=self.user,
+                project__deleted_at__isnull=True,
+            ).values_list("id", "project_id")
+        )
+
+        pending = []
+        for index, data in valid:
+            if data["task_id"] not in task_projects:
+                results[index] = self.failure(index, "Task does not exist.")
+                continue
+            pending.append((index, Annotations(**data)))
+
+        with transaction.atomic():
+            for start in range(0, len(pending), self.batch_size):
+                chunk = pending[start : start + self.batch_size]
+                Annotations.objects.bulk_create([item for _, item in chunk])
+                for index, item in chunk:
+                    results[index] = {"index": index, "success": True, "id": item.id}
+
+            sync_annotation_labels(
+                (item, task_projects[item.task_id]) for _, item in pending
+            )
+            per_project = Counter(task_projects[item.task_id] for _, item in pending)
+            for project_id, created in per_project.items():
+                adjust_counters(self.user.id, project_id, annotations=created)
+
+        if pending:
+            bump_generation(Annotations)
+
+        created = len(pending)
+        return {
+            "total": len(results),
+            "created": created,
+            "failed": len(results) - created,
+            "results": [results[index] for index in sorted(results)],
+        }
+
+
+class BulkUpdateUseCase(BulkRowsUseCase, ABC):
+    """
+    Apply many `{id, fields}` patches in one request.
+
+    Ownership of every row is checked with one joined query. Patches
+    that set the same fields are applied together with one
+    `UPDATE ... FROM (VALUES ...)` per chunk of `BULK_UPDATE_BATCH_SIZE`,
+    all inside one transaction, and each patch gets its own result. The
+    update joins the row's project again, so rows whose project was
+    deleted or changed hands after the check fail instead.
+    """
+
+    model: type[Model]
+    noun: str
+    # Lookup from `model` to the project that owns its rows.
+    project_path: str
+    versioned = False
+
+    def __init__(self, rows: Iterable[Any], user: User):
+        super().__init__(rows, user, max_rows=settings.BULK_UPDATE_MAX_ROWS)
+        self.batch_size = settings.BULK_UPDATE_BATCH_SIZE
+
+    @abstractmethod
+    def owned(self, ids: set[int]) -> dict[int, int]:
+        """Map the ids of the user's live rows to their project ids."""
+
+    def applied(self, patches: list[dict], projects: dict[int, int]) -> None:
+        """Called inside the transaction with the patches that were applied."""
+
+    def conflict(self, patch: dict) -> str:
+        return f"{self.noun} does not exist."
+
+    def apply(self, pending: list[tuple[int, dict]], results: dict) -> list[dict]:
+        groups = {}
+        for index, patch in pending:
+            groups.setdefault(tuple(sorted(patch["fields"])), []).append((index, patch))
+
+        applied = []
+        for fields, items in groups.items():
+            for start in range(0, len(items), self.batch_size):
+                chunk = items[start : start + self.batch_size]
+                rows = [
+                    (
+                        patch["id"],
+                        *([patch["version"]] if self.versioned else []),
+                        *(patch["fields"][name] for name in fields),
+                    )
+                    for _, patch in chunk
+                ]
+                updated = update_from_values(
+                    self.model,
+                    list(fields),
+                    rows,
+                    self.versioned,
+                    owner=(self.project_path, self.user.id),
+                )
+                for index, patch in chunk:
+                    if patch["id"] not in updated:
+                        results[index] = self.failure(index, self.conflict(patch))
+                        continue
+                    results[index] = {
+                        "index": index,
+                        "success": True,
+                        "id": patch["id"],
+                        "version": updated[patch["id"]],
+                    }
+                    applied.append(patch)
+        return applied
+
+    def execute(self) -> dict:
+        valid, results = self.parse_rows()
+        projects = self.owned({patch["id"] for _, patch in valid})
+
+        pending, seen = [], set()
+        for index, patch in valid:
+            if patch["id"] not in projects:
+                results[index] = self.failure(index, f"{self.noun} does not exist.")
+            elif patch["id"] in seen:
+                results[index] = self.failure(index, "Duplicate id in the batch.")
+            else:
+                seen.add(patch["id"])
+                pending.append((index, patch))
+
+        with transaction.atomic():
+            applied = self.apply(pending, results)
+            self.applied(applied, projects)
+            for project_id in {projects[patch["id"]] for patch in applied}:
+                adjust_counters(self.user.id, project_id)
+
+        updated = len(applied)
+        return {
+            "total": len(results),
+            "updated": updated,
+            "failed": len(results) - updated,
+            "results": [results[index] for index in sorted(results)],
+        }
+
+
+class BulkUpdateAnnotationsUseCase(BulkUpdateUseCase):
+    """
+    Patch many annotations. A patch whose `fields` name a `version` is
+    only applied while the annotation is still at that version.
+    """
+
+    schema = AnnotationPatchSchema
+    model = Annotations
+    noun = "Annotation"
+    project_path = "task__project"
+    versioned = True
+
+    def clean(self, payload: AnnotationPatchSchema) -> dict:
+        fields = payload.fields.model_dump(exclude_none=True)
+        version = fields.pop("version", None)
+        geometry = fields.pop("geometry", None)
+        if geometry is not None or "coordinates" in fields:
+            fields.update(replaced_geometry(geometry, fields.get("coordinates")))
+        return {"id": payload.id, "version": version, "fields": fields}
+
+    def owned(self, ids: set[int]) -> dict[int, int]:
+        rows = Annotations.objects.filter(
+            id__in=ids,
+            task__project__user=self.user,
+            task__project__deleted_at__isnull=True,
+        ).values_list("id", "task_id", "task__project_id")
+        self.tasks = {}
+        projects = {}
+        for annotation_id, task_id, project_id in rows:
+            self.tasks[annotation_id] = task_id
+            projects[annotation_id] = project_id
+        return projects
+
+    def conflict(self, patch: dict) -> str:
+        if patch["version"] is None:
+            return super().conflict(patch)
+        return (
+            f"Annotation has changed since version {patch['version']}; "
+            "reload it and apply the change again."
+        )
+
+    def applied(self, patches: list[dict], projects: dict[int, int]) -> None:
+        relabeled = [
+            (
+                Annotations(
+                    id=patch["id"],
+                    task_id=self.tasks[patch["id"]],
+                    labels=patch["fields"]["labels"],
+                ),
+                projects[patch["id"]],
+            )
+            for patch in patches
+            if "labels" in patch["fields"]
+        ]
+        if relabeled:
+            sync_annotation_labels(relabeled, replace=True)
+
+
+class BulkUpdateTasksUseCase(BulkUpdateUseCase):
+    schema = TaskPatchSchema
+    model = Task
+    noun = "Task"
+    project_path = "project"
+
+    def clean(self, payload: TaskPatchSchema) -> dict:
+        return {
+            "id": payload.id,
+            "fields": payload.fields.model_dump(exclude_none=True),
+        }
+
+    def owned(self, ids: set[int]) -> dict[int, int]:
+        return dict(
+            Task.objects.filter(
+                id__in=ids, project__user=self.user, project__deleted_at__isnull=True
+            ).values_list("id", "project_id")
+        )
+
+    def applied(self, patches: list[dict], projects: dict[int, int]) -> None:
+        urls = [patch["fields"]["url"] for patch in patches if "url" in patch["fields"]]
+
+        def request_derivatives():
+            for url in urls:
+                derivative_pool.request(url)
+
+        if urls:
+            transaction.on_commit(request_derivatives)
+
+
+class LabelStatisticsUseCase:
+    """Per-label annotation counts for a project or a single task."""
+
+    def __init__(self, user: User, project_id: int | None, task_id: int | None):
+        self.user = user
+        self.project_id = project_id
+        self.task_id = task_id
+
+    def querysets(self) -> tuple[QuerySet, str, QuerySet]:
+        """Return the ownership check, its error and the label counts."""
+        if (self.project_id is None) == (self.task_id is None):
+            raise HttpError(400, "Pass exactly one of project_id or task_id.")
+
+        if self.task_id is not None:
+            owned = Task.objects.filter(
+                id=self.task_id,
+                project__user=self.user,
+                project__deleted_at__isnull=True,
+            )
+            error = "Task does not exist."
+            links = AnnotationLabel.objects.filter(task_id=self.task_id)
+        else:
+            owned = Project.objects.filter(id=self.project_id, user=self.user)
+            error = "Project does not exist."
+            links = AnnotationLabel.objects.filter(label__project_id=self.project_id)
+
+        counts = links.values_list("label_id").annotate(count=Count("id")).order_by()
+        return owned, error, counts
+
+    @staticmethod
+    def rows(counts: dict[int, int], names: dict[int, str]) -> list[dict]:
+        return sorted(
+            (
+                {"label_id": label_id, "name": names[label_id], "count": count}
+                for label_id, count in counts.items()
+            ),
+            key=lambda row: (-row["count"], row["name"]),
+        )
+
+    def execute(self) -> list[dict]:
+        owned, error, counts = self.querysets()
+        if not owned.exists():
+            raise ValueError(error)
+
+        counts = dict(counts)
+        names = dict(Label.objects.filter(id__in=counts).values_list("id", "name"))
+        return self.rows(counts, names)
+
+    async def aexecute(self) -> list[dict]:
+        owned, error, counts = self.querysets()
+        if not await owned.aexists():
+            raise ValueError(error)
+
+        counts = {label_id: count async for label_id, count in counts}
+        names = {
+            label_id: name
+            async for label_id, name in Label.objects.filter(id__in=counts).values_list(
+                "id", "name"
+            )
+        }
+        return self.rows(counts, names)
+
+
 class ListAnnotationsUseCase:
     def __init__(self, task_id: int):
         self.task_id = task_id
 
     def execute(self) -> QuerySet[Annotations]:
-        return Annotations.objects.filter(task_id=self.task_id)
+        return Annotations.objects.filter(
+            task_id=self.task_id, task__project__deleted_at__isnull=True
+        )
+
+
+class ListAnnotationsInRegionUseCase:
+    """
+    Annotations of a task or project whose bounding box intersects a
+    rectangle, answered from the derived bbox columns and their index.
+    """
+
+    def __init__(self, user: User, region: RegionFilterSchema):
+        self.user = user
+        self.region = region
+
+    def execute(self) -> QuerySet[Annotations]:
+        region = self.region
+        if (region.task_id is None) == (region.project_id is None):
+            raise HttpError(400, "Pass exactly one of task_id or project_id.")
+        if region.x_min > region.x_max or region.y_min > region.y_max:
+            raise HttpError(400, "Region minimums must not exceed its maximums.")
+
+        annotations = Annotations.objects.filter(
+            task__project__user=self.user,
+            task__project__deleted_at__isnull=True,
+            bbox_x_min__lte=region.x_max,
+            bbox_x_max__gte=region.x_min,
+            bbox_y_min__lte=region.y_max,
+            bbox_y_max__gte=region.y_min,
+        )
+        if region.task_id is not None:
+            return annotations.filter(task_id=region.task_id)
+        return annotations.filter(task__project_id=region.project_id)
+
 
+class UpdateAnnotationUseCase(AtomicUseCaseMixin):
+    """
+    Apply a partial update with one conditional UPDATE of the changed
+    columns. When the payload names the version it was based on and the
+    annotation has moved on since, the update is rejected with 409.
+    """
 
-class UpdateAnnotationUseCase:
     def __init__(self, annotation_id: int, data: UpdateAnnotationSchema):
         self.annotation_id = annotation_id
         self.data = data.model_dump(exclude_none=True)
+        self.version = self.data.pop("version", None)
+        geometry = self.data.pop("geometry", None)
+        if geometry is not None or "coordinates" in self.data:
+            self.data.update(replaced_geometry(geometry, self.data.get("coordinates")))
 
     def execute(self) -> Annotations:
-        try:
-            annotation = Annotations.objects.get(id=self.annotation_id)
-        except ObjectDoesNotExist:
-            raise ValueError("Annotation does not exist.")
-
-        for key, value in self.data.items():
-            if hasattr(annotation, key):
-                setattr(annotation, key, value)
-
-        annotation.save()
+        with transaction.atomic():
+            annotation = update_annotation(self.annotation_id, self.data, self.version)
+            if annotation is None:
+                current = (
+                    Annotations.objects.filter(
+                        id=self.annotation_id, task__project__deleted_at__isnull=True
+                    )
+                    .values_list("version", flat=True)
+                    .first()
+                )
+                if current is None:
+                    raise ValueError("Annotation does not exist.")
+                raise HttpError(
+                    409,
+                    f"Annotation is at version {current}, not {self.version}; "
+                    "reload it and apply the change again.",
+                )
+
+            if "labels" in self.data:
+                sync_annotation_labels(
+                    [(annotation, annotation.project_id)], replace=True
+                )
+            adjust_counters(annotation.project_user_id, annotation.project_id)
         return annotation
 
 
-class DeleteAnnotationUseCase:
+class DeleteAnnotationUseCase(AtomicUseCaseMixin):
     def __init__(self, annotation_id: int):
         self.annotation_id = annotation_id
 
     def execute(self) -> None:
         try:
-            annotation = Annotations.objects.get(id=self.annotation_id)
+            annotation = Annotations.objects.select_related("task__project").get(
+                id=self.annotation_id, task__project__deleted_at__isnull=True
+            )
         except ObjectDoesNotExist:
             raise ValueError("Annotation does not exist.")
 
-        annotation.delete()
+        project = annotation.task.project
+        with transaction.atomic():
+            annotation.delete()
+            adjust_counters(project.user_id, project.id, annotations=-1)
+        bump_generation(Annotations)
+
+
+class UploadImageUseCase:
+    """
+    Store an image with the configured backend and return its URL.
+
+    Content already stored is recognised by its SHA-256 and its existing
+    URL is returned without another upload.
+    """
+
+    def __init__(self, file: UploadedFile):
+        self.file = file
+
+    def execute(self) -> str:
+        path, sha256 = stage_file(self.file)
+        try:
+            asset = store_asset(
+                path, self.file.name, sha256, self.file.content_type, self.file.size
+            )
+        finally:
+            discard_staged_file(path)
+        return asset.url
+
+
+class StartImageUploadUseCase:
+    """
+    Accept an image and upload it to the storage backend in the background.
+
+    The file is staged on local disk and an `ImageUpload` row is returned
+    straight away; its status moves to `done` (with the URL) or `failed`
+    once a pool worker has pushed the file. Content that is already stored
+    comes back `done` at once.
+    """
+
+    def __init__(self, file: UploadedFile, user: User):
+        self.file = file
+        self.user = user
+
+    def execute(self) -> ImageUpload:
+        upload_pool.reserve()
+        try:
+            path, sha256 = stage_file(self.file)
+            backend = get_storage().name
+            upload = ImageUpload(
+                user=self.user,
+                backend=backend,
+                file_name=self.file.name,
+                content_type=self.file.content_type,
+                size=self.file.size,
+                sha256=sha256,
+            )
+
+            asset = find_asset(sha256, backend)
+            if asset is not None:
+                upload.status = ImageUpload.Status.DONE
+                upload.url = asset.url
+            upload.save()
+        except Exception:
+            upload_pool.release()
+            raise
+
+        if asset is not None:
+            upload_pool.release()
+            discard_staged_file(path)
+            return upload
+
+        transaction.on_commit(lambda: upload_pool.submit(upload.id, path))
+        return upload
+
+
+class GetImageUploadUseCase:
+    def __init__(self, upload_id: int, user: User):
+        self.upload_id = upload_id
+        self.user = user
+
+    def execute(self) -> ImageUpload:
+        upload = ImageUpload.objects.filter(id=self.upload_id, user=self.user).first()
+        if upload is None:
+            raise ValueError("Upload does not exist.")
+        return upload
+
+
+class GetTilePyramidUseCase:
+    """
+    Derivative status and geometry for a task's image.
+
+    Until the pyramid is built (or has failed) this answers 409. Images
+    whose build was never queued, such as those that predate the
+    derivative pipeline or were uploaded with no derivative workers, or
+    was abandoned, get a `build_pyramid` job when read: a build may need
+    far more time and memory than a request should spend.
+    """
+
+    def __init__(self, task_id: int, user: User):
+        self.task_id = task_id
+        self.user = user
+
+    def execute(self) -> TilePyramid:
+        url = (
+            Task.objects.filter(
+                id=self.task_id,
+                project__user=self.user,
+                project__deleted_at__isnull=True,
+            )
+            .values_list("url", flat=True)
+            .first()
+        )
+        if url is None:
+            raise ValueError("Task does not exist.")
+
+        pyramid = TilePyramid.objects.filter(source_url=url).first()
+        if pyramid is None or is_abandoned(pyramid):
+            claimed = derivative_pool.claim(url)
+            if claimed is not None:
+                Job.objects.create(
+                    user=self.user,
+                    kind="build_pyramid",
+                    params={"pyramid_id": claimed.id},
+                )
+            raise HttpError(409, "Tiles are not ready yet.")
+        if pyramid.status not in (TilePyramid.Status.DONE, TilePyramid.Status.FAILED):
+            raise HttpError(409, "Tiles are not ready yet.")
+        return pyramid
+
+
+class ListViewportTilesUseCase:
+    """
+    The tiles of one pyramid level that cover a viewport.
+
+    The viewport is given in full-resolution pixels, so the client can
+    keep one coordinate system while zooming through levels.
+    """
+
+    def __init__(self, task_id: int, user: User, viewport: TileViewportSchema):
+        self.task_id = task_id
+        self.user = user
+        self.viewport = viewport
+        self.max_tiles = settings.DERIVATIVE_MAX_VIEWPORT_TILES
+
+    def execute(self) -> list[dict]:
+        viewport = self.viewport
+        if viewport.x_min > viewport.x_max or viewport.y_min > viewport.y_max:
+            raise HttpError(400, "Viewport minimums must not exceed its maximums.")
+
+        pyramid = GetTilePyramidUseCase(self.task_id, self.user).execute()
+        if pyramid.status != TilePyramid.Status.DONE:
+            raise HttpError(409, "Tiles are not ready yet.")
+        if viewport.level > pyramid.max_level:
+            raise HttpError(400, f"The deepest level is {pyramid.max_level}.")
+
+        scale = 2 ** (pyramid.max_level - viewport.level)
+        tile_size = pyramid.tile_size
+        width, height = level_size(
+            pyramid.width, pyramid.height, viewport.level, pyramid.max_level
+        )
+
+        def tile_range(low: float, high: float, size: int) -> range:
+            last = min(int(high // scale // tile_size), (size - 1) // tile_size)
+            return range(max(int(low // scale // tile_size), 0), last + 1)
+
+        cols = tile_range(viewport.x_min, viewport.x_max, width)
+        rows = tile_range(viewport.y_min, viewport.y_max, height)
+        if len(cols) * len(rows) > self.max_tiles:
+            raise HttpError(400, "The viewport spans too many tiles at this level.")
+
+        storage = get_storage()
+        return [
+            {
+                "level": viewport.level,
+                "col": col,
+                "row": row,
+                "x": col * tile_size,
+                "y": row * tile_size,
+                "width": min(tile_size, width - col * tile_size),
+                "height": min(tile_size, height - row * tile_size),
+                "url": storage.url(
+                    pyramid.storage_name(tile_name(viewport.level, col, row))
+                ),
+            }
+            for row in rows
+            for col in cols
+        ]
+
+
+class CreateJobUseCase:
+    def __init__(self, data: CreateJobSchema, user: User):
+        self.data = data
+        self.user = user
+
+    def execute(self) -> Job:
+        handler = handlers.get(self.data.kind)
+        if handler is None or not handler.public:
+            raise HttpError(400, f"Unknown job kind '{self.data.kind}'.")
+
+        try:
+            params = handler.params.model_validate(self.data.params)
+        except ValidationError as e:
+            raise HttpError(
+                400, BulkCreateAnnotationsUseCase.format_validation_error(e)
+            )
+        return Job.objects.create(
+            user=self.user, kind=self.data.kind, params=params.model_dump()
+        )
+
+
+class StartImportJobUseCase:
+    """
+    Stage a manifest and queue its import. The staged file must be
+    readable by the job workers, so they share `UPLOAD_STAGING_DIR` with
+    the web processes.
+    """
+
+    def __init__(self, project_id: int, manifest: UploadedFile, fmt: str, user: User):
+        self.project_id = project_id
+        self.manifest = manifest
+        self.fmt = fmt
+        self.user = user
+
+    def execute(self) -> Job:
+        if not Project.objects.filter(id=self.project_id, user=self.user).exists():
+            raise ValueError("Project does not exist.")
+
+        path, _ = stage_file(self.manifest)
+        try:
+            return Job.objects.create(
+                user=self.user,
+                kind="import_tasks",
+                params={
+                    "project_id": self.project_id,
+                    "manifest_path": path,
+                    "format": self.fmt,
+                },
+            )
+        except Exception:
+            discard_staged_file(path)
+            raise
+
+
+class ListJobsUseCase:
+    def __init__(self, user: User):
+        self.user = user
+
+    def execute(self) -> QuerySet[Job]:
+        return Job.objects.filter(user=self.user)
+
+
+class GetJobUseCase:
+    def __init__(self, job_id: int, user: User):
+        self.job_id = job_id
+        self.user = user
+
+    def execute(self) -> Job:
+        job = Job.objects.filter(id=self.job_id, user=self.user).first()
+        if job is None:
+            raise ValueError("Job does not exist.")
+        return job
+
+
+class CancelJobUseCase(GetJobUseCase):
+    """
+    Cancel a queued job at once, or ask a running one to stop; handlers
+    notice the next time they report progress.
+    """
+
+    def execute(self) -> Job:
+        job = super().execute()
+        handler = handlers.get(job.kind)
+        if handler is not None and not handler.cancellable:
+            raise HttpError(409, "Job cannot be cancelled.")
+
+        now = timezone.now()
+        jobs = Job.objects.filter(id=job.id)
+        if jobs.filter(status=Job.Status.QUEUED).update(
+            status=Job.Status.CANCELLED, finished_at=now, updated_at=now
+        ):
+            if handler is not None and handler.discard is not None:
+                handler.discard(handler.params.model_validate(job.params))
+        elif not jobs.filter(status=Job.Status.RUNNING).update(
+            cancel_requested=True, updated_at=now
+        ):
+            raise HttpError(409, "Job has already finished.")
+
+        job.refresh_from_db()
+        return job
+
+
+class DownloadExportUseCase(GetJobUseCase):
+    """The file of one of the user's finished `export_project` jobs."""
+
+    def execute(self) -> tuple[str, str]:
+        job = super().execute()
+        if job.kind != "export_project" or job.status != Job.Status.SUCCEEDED:
+            raise HttpError(409, "Job has no export to download.")
+
+        path = export_path(job.id)
+        if not os.path.exists(path):
+            raise ValueError("Export does not exist.")
+        return path, job.result["file_name"]
 
 
 class SignupUseCase:
@@ -0,0 +1,112 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import BaseCache
+
+from .caching import shared_cache
+
+
+class LocalUserCache:
+    """
+    Per-process LRU of authenticated users with a TTL.
+
+    Invalidation only reaches the process it runs in; other workers see a
+    change once their entry expires, so keep the TTL short or use the
+    shared backend when that matters.
+    """
+
+    def __init__(self, ttl: int, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: OrderedDict[int, tuple[float, User]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id: int) -> User | None:
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+        # Requests must not share one instance and its cached relations.
+        return copy.copy(user)
+
+    def set(self, user_id: int, user: User) -> None:
+        with self.lock:
+            self.entries[user_id] = (time.monotonic() + self.ttl, copy.copy(user))
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, user_id: int) -> None:
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    # Entries live in memory, so the async API needs no thread hop.
+    async def aget(self, user_id: int) -> User | None:
+        return self.get(user_id)
+
+    async def aset(self, user_id: int, user: User) -> None:
+        self.set(user_id, user)
+
+
+class SharedUserCache:
+    """Users kept in a cache every worker sees, so invalidation reaches all."""
+
+    def __init__(self, store: BaseCache, ttl: int):
+        self.store = store
+        self.ttl = ttl
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f"auth-user:{user_id}"
+
+    def get(self, user_id: int) -> User | None:
+        return self.store.get(self.key(user_id))
+
+    def set(self, user_id: int, user: User) -> None:
+        self.store.set(self.key(user_id), user, timeout=self.ttl)
+
+    def delete(self, user_id: int) -> None:
+        self.store.delete(self.key(user_id))
+
+    async def aget(self, user_id: int) -> User | None:
+        return await self.store.aget(self.key(user_id))
+
+    async def aset(self, user_id: int, user: User) -> None:
+        await self.store.aset(self.key(user_id), user, timeout=self.ttl)
+
+
+def build_user_cache(backend: str) -> LocalUserCache | SharedUserCache | None:
+    """Build the cache named by the `AUTH_USER_CACHE_BACKEND` setting."""
+    if not backend:
+        return None
+    if backend == "local":
+        return LocalUserCache(
+            ttl=settings.AUTH_USER_CACHE_TTL,
+            max_size=settings.AUTH_USER_CACHE_MAX_SIZE,
+        )
+    if backend == "shared":
+        store = shared_cache()
+        if store is None:
+            raise ValueError(
+                "The shared user cache needs a cache shared by the workers; "
+                "set RESPONSE_CACHE_URL."
+            )
+        return SharedUserCache(store, ttl=settings.AUTH_USER_CACHE_TTL)
+    raise ValueError(f"Unknown user cache backend '{backend}'.")
+
+
+user_cache = build_user_cache(settings.AUTH_USER_CACHE_BACKEND)
+
+
+def invalidate_user(user_id: int) -> None:
+    if user_cache is not None:
+        user_cache.delete(user_id)
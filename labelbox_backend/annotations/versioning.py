@@ -0,0 +1,60 @@
+from typing import Any
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import Annotations, Project, Task
+
+
+def update_annotation(
+    annotation_id: int, values: dict[str, Any], version: int | None = None
+) -> Annotations | None:
+    """
+    Write `values` to a live annotation with one UPDATE and return the row.
+
+    Only the given columns are written, and the version is incremented.
+    With `version`, the row is only updated while it still has that
+    version: of two edits based on the same version, the second matches
+    no row instead of overwriting the first, and no lock is held between
+    reading the row and writing it. The returned annotation also carries
+    `project_id` and `project_user_id`. Returns None when no row matched.
+    """
+    quote = connection.ops.quote_name
+    meta = Annotations._meta
+    table = quote(meta.db_table)
+    task_table = quote(Task._meta.db_table)
+    project_table = quote(Project._meta.db_table)
+
+    assignments, params = [], []
+    for name, value in {**values, "updated_at": timezone.now()}.items():
+        field = meta.get_field(name)
+        assignments.append(f"{quote(field.column)} = %s")
+        params.append(field.get_db_prep_save(value, connection))
+    assignments.append("version = version + 1")
+
+    conditions = [f"{table}.id = %s"]
+    params.append(annotation_id)
+    if version is not None:
+        conditions.append(f"{table}.version = %s")
+        params.append(version)
+    task = f"{table}.task_id"
+    conditions.append(
+        f"EXISTS (SELECT 1 FROM {task_table} t "
+        f"INNER JOIN {project_table} p ON p.id = t.project_id "
+        f"WHERE t.id = {task} AND p.deleted_at IS NULL)"
+    )
+
+    columns = ", ".join(f"{table}.{quote(f.column)}" for f in meta.concrete_fields)
+    sql = (
+        f"UPDATE {table} SET {', '.join(assignments)} "
+        f"WHERE {' AND '.join(conditions)} "
+        f"RETURNING {columns}, "
+        f"(SELECT t.project_id FROM {task_table} t WHERE t.id = {task}) "
+        "AS project_id, "
+        f"(SELECT p.user_id FROM {task_table} t "
+        f"INNER JOIN {project_table} p ON p.id = t.project_id "
+        f"WHERE t.id = {task}) AS project_user_id"
+    )
+    # A raw queryset applies the fields' database converters to the row.
+    rows = list(Annotations.objects.raw(sql, params))
+    return rows[0] if rows else None
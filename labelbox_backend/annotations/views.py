@@ -1,41 +1,83 @@
-from cloudinary import uploader
+import json
+
 from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import render
-from ninja import File, UploadedFile
+from ninja import File, Query, UploadedFile
+from ninja.errors import HttpError
 from ninja.pagination import paginate
 from ninja_extra import Router
 
 from .bearer import JWTBearer
+from .conditional import conditional, project_version, task_version, user_version
 from .data_types import HttpRequest
 from .dtos import (
     AnnotationResponseSchema,
+    BulkCreateResultSchema,
+    BulkUpdateResultSchema,
     CreateAnnotationSchema,
+    CreateJobSchema,
     CreateTaskSchema,
     DashboardMetricsSchema,
+    ImageUploadSchema,
+    JobSchema,
+    LabelCountSchema,
     Paginator,
+    ProjectDetailFilter,
     ProjectDetailSchema,
     ProjectOutSchema,
     ProjectSchema,
+    RegionFilterSchema,
     TaskResponseSchema,
+    TilePyramidSchema,
+    TileSchema,
+    TileViewportSchema,
     UpdateAnnotationSchema,
     UpdateProjectSchema,
     UpdateTaskSchema,
 )
+from .exporters import buffered
+from .parsers import (
+    MANIFEST_FORMATS,
+    guess_manifest_format,
+    iter_manifest_urls,
+    iter_request_rows,
+)
+from .query_budgets import query_budget
+from .response_cache import cached_response, project_scope, user_scope
 from .usecases import (
+    BulkCreateAnnotationsUseCase,
+    BulkUpdateAnnotationsUseCase,
+    BulkUpdateTasksUseCase,
+    CancelJobUseCase,
     CreateAnnotationUseCase,
+    CreateJobUseCase,
     CreateProjectUseCase,
     CreateTaskUseCase,
     DashboardMetricsUseCase,
     DeleteAnnotationUseCase,
     DeleteProjectUseCase,
     DeleteTaskUseCase,
+    DownloadExportUseCase,
+    ExportProjectUseCase,
+    GetImageUploadUseCase,
+    GetJobUseCase,
     GetProjectUseCase,
+    GetTilePyramidUseCase,
+    ImportTasksUseCase,
+    LabelStatisticsUseCase,
+    ListAnnotationsInRegionUseCase,
     ListAnnotationsUseCase,
+    ListJobsUseCase,
     ListProjectsUseCase,
     ListTasksUseCase,
+    ListViewportTilesUseCase,
+    StartImageUploadUseCase,
+    StartImportJobUseCase,
     UpdateAnnotationUseCase,
     UpdateProjectUseCase,
     UpdateTaskUseCase,
+    UploadImageUseCase,
 )
 
 router = Router(
@@ -45,18 +87,23 @@ router = Router(
 
 
 @router.post("/projects/", response={201: ProjectOutSchema})
+@query_budget(6)
 def create_project(request: HttpRequest, data: ProjectSchema):
     project = CreateProjectUseCase(data=data, user=request.user).execute()
     return project
 
 
 @router.get("/projects/", response=list[ProjectOutSchema])
+@query_budget(5)
+@conditional(user_version)
+@cached_response("list_projects", user_scope)
 @paginate(Paginator)
 def list_projects(request: HttpRequest):
     return ListProjectsUseCase(user=request.user).execute()
 
 
 @router.put("/projects/{project_id}/", response=ProjectOutSchema)
+@query_budget(5)
 def update_project(request: HttpRequest, project_id: int, payload: UpdateProjectSchema):
     use_case = UpdateProjectUseCase(
         project_id=project_id,
@@ -68,26 +115,64 @@ def update_project(request: HttpRequest, project_id: int, payload: UpdateProject
 
 
 @router.get("/projects/{project_id}/", response=ProjectDetailSchema)
-def get_project(request: HttpRequest, project_id: int):
+@query_budget(5)
+@conditional(project_version)
+@cached_response("get_project", project_scope)
+def get_project(
+    request: HttpRequest, project_id: int, filters: Query[ProjectDetailFilter]
+):
     use_case = GetProjectUseCase(
         project_id=project_id,
         user=request.user,
+        expand=filters.expand_set,
+        page_size=filters.page_size,
     )
     project = use_case.execute()
     return project
 
 
-@router.delete("/projects/{project_id}/", response={204: None})
-def delete_project(request, project_id: int):
+@router.delete("/projects/{project_id}/", response={202: JobSchema, 204: None})
+@query_budget(17)
+def delete_project(request, project_id: int, background: bool = False):
+    """
+    Delete a project. With `background` it disappears at once and the
+    returned job purges its tasks and annotations.
+    """
     use_case = DeleteProjectUseCase(
         project_id=project_id,
         user=request.user,
+        background=background,
     )
-    use_case.execute()
+    job = use_case.execute()
+    if job is not None:
+        return 202, job
     return 204, None
 
 
+@router.get("/projects/{project_id}/export/")
+@query_budget(6)
+def export_project(request: HttpRequest, project_id: int, format: str = "ndjson"):
+    """Stream a project's tasks and annotations as NDJSON or COCO JSON."""
+    use_case = ExportProjectUseCase(
+        project_id=project_id,
+        user=request.user,
+        fmt=format,
+    )
+    chunks = use_case.execute()
+
+    extension = "json" if format == "coco" else "ndjson"
+    content_type = "application/json" if format == "coco" else "application/x-ndjson"
+    response = StreamingHttpResponse(buffered(chunks), content_type=content_type)
+    response["Content-Disposition"] = (
+        f'attachment; filename="project-{project_id}.{extension}"'
+    )
+    return response
+
+
 @router.get("/list-tasks/{project_id}", response=list[TaskResponseSchema])
+@query_budget(5)
+@conditional(project_version)
+@cached_response("list_tasks", project_scope)
 @paginate(Paginator)
 def list_tasks(request: HttpRequest, project_id: int):
     use_case = ListTasksUseCase(project_id=project_id)
@@ -95,14 +180,70 @@ def list_tasks(request: HttpRequest, project_id: int):
     return tasks
 
 
+@router.post("/projects/{project_id}/import-tasks/")
+@query_budget(9)
+def import_tasks(
+    request: HttpRequest,
+    project_id: int,
+    manifest: UploadedFile = File(...),
+    format: str | None = None,
+):
+    """
+    Create tasks from a CSV or NDJSON manifest of image URLs.
+
+    The manifest is read as a stream and progress reports are streamed
+    back as NDJSON, one line per committed batch.
+    """
+    fmt = format or guess_manifest_format(manifest.name, manifest.content_type)
+    if fmt not in MANIFEST_FORMATS:
+        raise HttpError(400, "Unsupported manifest format.")
+
+    use_case = ImportTasksUseCase(
+        project_id=project_id,
+        urls=iter_manifest_urls(manifest, fmt),
+        user=request.user,
+    )
+    reports = use_case.execute()
+    first_report = next(reports)
+
+    def stream():
+        yield json.dumps(first_report) + "\n"
+        for report in reports:
+            yield json.dumps(report) + "\n"
+
+    return StreamingHttpResponse(stream(), content_type="application/x-ndjson")
+
+
+@router.get("/tasks/{task_id}/pyramid/", response=TilePyramidSchema)
+@query_budget(3)
+def get_tile_pyramid(request: HttpRequest, task_id: int):
+    """Thumbnail and deep-zoom geometry of a task's image."""
+    use_case = GetTilePyramidUseCase(task_id=task_id, user=request.user)
+    return use_case.execute()
+
+
+@router.get("/tasks/{task_id}/tiles/", response=list[TileSchema])
+@query_budget(3)
+def list_viewport_tiles(
+    request: HttpRequest, task_id: int, viewport: Query[TileViewportSchema]
+):
+    """The tiles of one level that cover the given viewport."""
+    use_case = ListViewportTilesUseCase(
+        task_id=task_id, user=request.user, viewport=viewport
+    )
+    return use_case.execute()
+
+
 @router.put("/update-task/{task_id}/", response=TaskResponseSchema)
+@query_budget(7)
 def update_task(request, task_id: int, payload: UpdateTaskSchema):
     use_case = UpdateTaskUseCase(task_id=task_id, url=payload.url)
     task = use_case.execute()
-    return task.to_dict()
+    return task
 
 
 @router.delete("/delete-task/{task_id}/", response={204: None})
+@query_budget(12)
 def delete_task(request, task_id: int):
     use_case = DeleteTaskUseCase(task_id=task_id)
     use_case.execute()
@@ -110,6 +251,7 @@ def delete_task(request, task_id: int):
 
 
 @router.post("/create-task/", response=TaskResponseSchema)
+@query_budget(7)
 def create_task(request: HttpRequest, payload: CreateTaskSchema):
     use_case = CreateTaskUseCase(project_id=payload.project_id, url=payload.url)
     task = use_case.execute()
@@ -117,6 +259,8 @@ def create_task(request: HttpRequest, payload: CreateTaskSchema):
 
 
 @router.get("/list-annotations/{task_id}/", response=list[AnnotationResponseSchema])
+@query_budget(5)
+@conditional(task_version)
 @paginate(Paginator)
 def list_annotations(request: HttpRequest, task_id: int):
     use_case = ListAnnotationsUseCase(task_id=task_id)
@@ -124,17 +268,44 @@ def list_annotations(request: HttpRequest, task_id: int):
     return annotations
 
 
+@router.get("/annotations/region/", response=list[AnnotationResponseSchema])
+@query_budget(4)
+@paginate(Paginator)
+def list_annotations_in_region(request: HttpRequest, region: Query[RegionFilterSchema]):
+    """Annotations of a task or project that intersect the given rectangle."""
+    use_case = ListAnnotationsInRegionUseCase(user=request.user, region=region)
+    return use_case.execute()
+
+
+@router.get("/label-stats/", response=list[LabelCountSchema])
+@query_budget(4)
+def label_statistics(
+    request: HttpRequest,
+    project_id: int | None = None,
+    task_id: int | None = None,
+):
+    """Number of annotations per label in a project or a task."""
+    use_case = LabelStatisticsUseCase(
+        user=request.user,
+        project_id=project_id,
+        task_id=task_id,
+    )
+    return use_case.execute()
+
+
 @router.put("/update-annotation/{annotation_id}/", response=AnnotationResponseSchema)
+@query_budget(10)
 def update_annotation(request, annotation_id: int, payload: UpdateAnnotationSchema):
     use_case = UpdateAnnotationUseCase(
         annotation_id=annotation_id,
         data=payload,
     )
     annotation = use_case.execute()
-    return annotation.to_dict()
+    return annotation
 
 
 @router.delete("/delete-annotation/{annotation_id}/", response={204: None})
+@query_budget(8)
 def delete_annotation(request, annotation_id: int):
     use_case = DeleteAnnotationUseCase(annotation_id=annotation_id)
     use_case.execute()
@@ -142,6 +313,7 @@ def delete_annotation(request, annotation_id: int):
 
 
 @router.post("/create-annotation/", response=AnnotationResponseSchema)
+@query_budget(10)
 def create_annotation(request: HttpRequest, payload: CreateAnnotationSchema):
     use_case = CreateAnnotationUseCase(
         data=payload,
@@ -150,7 +322,52 @@ def create_annotation(request: HttpRequest, payload: CreateAnnotationSchema):
     return annotation
 
 
+@router.post("/bulk-create-annotations/", response=BulkCreateResultSchema)
+@query_budget(10)
+def bulk_create_annotations(request: HttpRequest):
+    """
+    Create annotations in bulk from a JSON array or an NDJSON stream
+    (`Content-Type: application/x-ndjson`) of `CreateAnnotationSchema` rows.
+    """
+    use_case = BulkCreateAnnotationsUseCase(
+        rows=iter_request_rows(request),
+        user=request.user,
+    )
+    return use_case.execute()
+
+
+@router.patch("/bulk-update-annotations/", response=BulkUpdateResultSchema)
+@query_budget(11)
+def bulk_update_annotations(request: HttpRequest):
+    """
+    Patch annotations in bulk from a JSON array or an NDJSON stream of
+    `{"id": ..., "fields": UpdateAnnotationSchema}` rows.
+    """
+    use_case = BulkUpdateAnnotationsUseCase(
+        rows=iter_request_rows(request),
+        user=request.user,
+    )
+    return use_case.execute()
+
+
+@router.patch("/bulk-update-tasks/", response=BulkUpdateResultSchema)
+@query_budget(7)
+def bulk_update_tasks(request: HttpRequest):
+    """
+    Patch tasks in bulk from a JSON array or an NDJSON stream of
+    `{"id": ..., "fields": UpdateTaskSchema}` rows.
+    """
+    use_case = BulkUpdateTasksUseCase(
+        rows=iter_request_rows(request),
+        user=request.user,
+    )
+    return use_case.execute()
+
+
 @router.get("/metrics", response=DashboardMetricsSchema)
+@query_budget(4)
+@conditional(user_version)
+@cached_response("dashboard_metrics", user_scope)
 def get_dashboard_metrics(request: HttpRequest):
     use_case = DashboardMetricsUseCase(user=request.user)
     metrics = use_case.execute()
@@ -159,17 +376,94 @@ def get_dashboard_metrics(request: HttpRequest):
 
 
 @router.post("/upload-image/", response={200: str, 400: dict})
+@query_budget(4)
 def upload_image(request: HttpRequest, file: UploadedFile = File(...)):
-    """Upload an image to Cloudinary and return the URL."""
+    """Upload an image to the storage backend and return the URL."""
     if file.content_type not in settings.ALLOWED_FILE_TYPES:
         return 400, {"error": "Unsupported file type"}
 
     try:
-        upload_result = uploader.upload(file.file)
-        return upload_result["url"]
+        return UploadImageUseCase(file=file).execute()
     except Exception as e:
         return 400, {"error": str(e)}
 
 
+@router.post("/uploads/", response={202: ImageUploadSchema, 400: dict})
+@query_budget(3)
+def start_image_upload(request: HttpRequest, file: UploadedFile = File(...)):
+    """
+    Accept an image and upload it in the background; poll
+    `/uploads/{upload_id}/` for its status and URL.
+    """
+    if file.content_type not in settings.ALLOWED_FILE_TYPES:
+        return 400, {"error": "Unsupported file type"}
+
+    use_case = StartImageUploadUseCase(file=file, user=request.user)
+    return 202, use_case.execute()
+
+
+@router.get("/uploads/{upload_id}/", response=ImageUploadSchema)
+@query_budget(2)
+def get_image_upload(request: HttpRequest, upload_id: int):
+    use_case = GetImageUploadUseCase(upload_id=upload_id, user=request.user)
+    return use_case.execute()
+
+
+@router.post("/jobs/", response={202: JobSchema})
+@query_budget(2)
+def create_job(request: HttpRequest, payload: CreateJobSchema):
+    """
+    Queue an `export_project` or `rebuild_counters` job; poll
+    `/jobs/{job_id}/` for its progress and result.
+    """
+    return 202, CreateJobUseCase(data=payload, user=request.user).execute()
+
+
+@router.post("/projects/{project_id}/import-jobs/", response={202: JobSchema})
+@query_budget(3)
+def start_import_job(
+    request: HttpRequest,
+    project_id: int,
+    manifest: UploadedFile = File(...),
+    format: str | None = None,
+):
+    """Queue the import of a CSV or NDJSON manifest of image URLs."""
+    fmt = format or guess_manifest_format(manifest.name, manifest.content_type)
+    if fmt not in MANIFEST_FORMATS:
+        raise HttpError(400, "Unsupported manifest format.")
+
+    use_case = StartImportJobUseCase(
+        project_id=project_id, manifest=manifest, fmt=fmt, user=request.user
+    )
+    return 202, use_case.execute()
+
+
+@router.get("/jobs/", response=list[JobSchema])
+@query_budget(4)
+@paginate(Paginator)
+def list_jobs(request: HttpRequest):
+    return ListJobsUseCase(user=request.user).execute()
+
+
+@router.get("/jobs/{job_id}/", response=JobSchema)
+@query_budget(2)
+def get_job(request: HttpRequest, job_id: int):
+    return GetJobUseCase(job_id=job_id, user=request.user).execute()
+
+
+@router.get("/jobs/{job_id}/download/")
+@query_budget(2)
+def download_export(request: HttpRequest, job_id: int):
+    """Download the file of a finished `export_project` job."""
+    path, file_name = DownloadExportUseCase(job_id=job_id, user=request.user).execute()
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=file_name)
+
+
+@router.post("/jobs/{job_id}/cancel/", response=JobSchema)
+@query_budget(4)
+def cancel_job(request: HttpRequest, job_id: int):
+    return CancelJobUseCase(job_id=job_id, user=request.user).execute()
+
+
 def index(request):
     return render(request, "index.html")
@@ -52,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "annotations.instrumentation.RequestMetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -161,6 +162,136 @@ cloudinary.config(
 )
 
 ALLOWED_FILE_TYPES = ["image/jpeg", "image/png"]
+
+# Where uploaded images are stored: "cloudinary" or "local" (MEDIA_ROOT).
+IMAGE_STORAGE_BACKEND = config("IMAGE_STORAGE_BACKEND", default="cloudinary")
+MEDIA_URL = "media/"
+MEDIA_ROOT = config("MEDIA_ROOT", default=str(BASE_DIR / "media"))
+
+# Background uploads are staged on local disk and handed to a pool of
+# UPLOAD_WORKERS threads; 0 runs them inline. At most UPLOAD_QUEUE_LIMIT
+# uploads may be pending per process before new ones are refused. The
+# staging directory must stay outside MEDIA_ROOT, which is served publicly.
+# Uploads still unfinished after UPLOAD_STALE_SECONDS were lost with the
+# process that queued them; `run_jobs` workers mark them failed.
+UPLOAD_STAGING_DIR = config("UPLOAD_STAGING_DIR", default=str(BASE_DIR / "staging"))
+UPLOAD_WORKERS = 4
+UPLOAD_QUEUE_LIMIT = 32
+UPLOAD_STALE_SECONDS = 900
+
+# Thumbnails and deep-zoom tile pyramids are built on a pool of
+# DERIVATIVE_WORKERS processes (with 0, uploads queue nothing). Images with
+# no pyramid are never built in a request: reading one answers 409 and
+# queues a job for the `run_jobs` workers. Sources larger than
+# DERIVATIVE_MAX_PIXELS are refused; a build holds about 4 bytes per pixel
+# for the source plus a third of that for the smaller levels, so the cap
+# keeps each worker under roughly 600 MB. Up to DERIVATIVE_QUEUE_LIMIT
+# images wait per process; the rest are built when first read.
+# Pending or processing pyramids untouched for DERIVATIVE_STALE_SECONDS
+# were abandoned by a stopped process and are built again.
+DERIVATIVE_WORKERS = 2
+DERIVATIVE_QUEUE_LIMIT = 256
+DERIVATIVE_STALE_SECONDS = 1800
+DERIVATIVE_TILE_SIZE = 256
+DERIVATIVE_TILE_OVERLAP = 1
+DERIVATIVE_THUMBNAIL_SIZE = 256
+DERIVATIVE_MAX_PIXELS = 120_000_000
+DERIVATIVE_MAX_VIEWPORT_TILES = 1024
+
+# Background jobs are run by `manage.py run_jobs` workers, which must share
+# UPLOAD_STAGING_DIR and EXPORT_DIR with the web processes for manifest
+# imports and export downloads. Exports stay outside MEDIA_ROOT: only their
+# owner may download them. Running jobs save progress at most every
+# JOB_PROGRESS_INTERVAL seconds; one with no heartbeat for JOB_STALE_SECONDS
+# is requeued, up to JOB_MAX_ATTEMPTS runs.
+EXPORT_DIR = config("EXPORT_DIR", default=str(BASE_DIR / "exports"))
+JOB_WORKER_PROCESSES = 2
+JOB_POLL_INTERVAL = 1.0
+JOB_PROGRESS_INTERVAL = 2.0
+JOB_STALE_SECONDS = 300
+JOB_MAX_ATTEMPTS = 3
+
+# Projects deleted in the background are purged PURGE_BATCH_SIZE task ids
+# at a time, each range in its own short transaction.
+PURGE_BATCH_SIZE = 1000
+
+# Bulk ingest: rows are inserted in chunks of BULK_CREATE_BATCH_SIZE and a
+# single request may carry at most BULK_CREATE_MAX_ROWS rows.
+BULK_CREATE_BATCH_SIZE = 1000
+BULK_CREATE_MAX_ROWS = 50000
+
+# Bulk patches: patches setting the same fields are applied with one
+# UPDATE per BULK_UPDATE_BATCH_SIZE rows; a request carries at most
+# BULK_UPDATE_MAX_ROWS patches.
+BULK_UPDATE_BATCH_SIZE = 1000
+BULK_UPDATE_MAX_ROWS = 50000
+
+# Request metrics, served in the Prometheus text format at /metrics. Each
+# worker writes its totals to its own file in METRICS_DIR at most every
+# METRICS_FLUSH_INTERVAL seconds and a scrape sums them. Give each
+# deployment its own directory, local to its host, and empty it on deploy;
+# the totals of workers that have exited are kept in its retained.json.
+# Scrapes must send METRICS_TOKEN as a bearer token; while it is empty,
+# /metrics refuses every scrape.
+METRICS_ENABLED = config("METRICS_ENABLED", default=True, cast=bool)
+METRICS_DIR = config("METRICS_DIR", default=str(BASE_DIR / "metrics"))
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Totals of paginated lists: "exact" counts every time, "cached" caches exact
+# counts until the model is written, "estimated" also switches to planner
+# estimates once a list is larger than PAGINATION_ESTIMATE_THRESHOLD rows.
+# Totals are only cached when RESPONSE_CACHE_URL gives the workers a shared
+# cache; a per-process copy would go stale on writes through other workers.
+PAGINATION_COUNT_STRATEGY = "estimated"
+PAGINATION_COUNT_CACHE_TIMEOUT = 300
+PAGINATION_ESTIMATE_THRESHOLD = 100000
+
+# Exports read rows through server-side cursors, EXPORT_CHUNK_SIZE at a time.
+EXPORT_CHUNK_SIZE = 2000
+
+# Users resolved from JWTs are cached so authentication needs no query.
+# "local" is a per-process LRU, "shared" uses the "responses" cache so that
+# invalidation reaches every worker and needs RESPONSE_CACHE_URL; an empty
+# value disables the cache.
+AUTH_USER_CACHE_BACKEND = "local"
+AUTH_USER_CACHE_TTL = 60
+AUTH_USER_CACHE_MAX_SIZE = 10000
+
+# Serialized responses of the polled read endpoints are cached per user in
+# the "responses" cache and invalidated after every committed write. The
+# invalidation only reaches the cache it is sent to, so set
+# RESPONSE_CACHE_URL to a Redis server whenever more than one process serves
+# the API; without it the cache is per-process and off unless enabled.
+# Responses larger than RESPONSE_CACHE_MAX_ENTRY_BYTES are not stored.
+RESPONSE_CACHE_URL = config("RESPONSE_CACHE_URL", default="")
+RESPONSE_CACHE_ENABLED = config(
+    "RESPONSE_CACHE_ENABLED", default=bool(RESPONSE_CACHE_URL), cast=bool
+)
+RESPONSE_CACHE_TIMEOUT = 300
+RESPONSE_CACHE_MAX_ENTRIES = 10000
+RESPONSE_CACHE_MAX_ENTRY_BYTES = 512 * 1024
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "responses": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": RESPONSE_CACHE_URL,
+            "TIMEOUT": RESPONSE_CACHE_TIMEOUT,
+        }
+        if RESPONSE_CACHE_URL
+        else {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "responses",
+            "TIMEOUT": RESPONSE_CACHE_TIMEOUT,
+            "OPTIONS": {"MAX_ENTRIES": RESPONSE_CACHE_MAX_ENTRIES},
+        }
+    ),
+}
+
 LIVE_URL = config("LIVE_URL")
 
 STATICFILES_DIRS = [
@@ -15,18 +15,29 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+import re
+
 from django.conf import settings
 from django.contrib import admin
 from django.urls import path, re_path
 from django.views.generic import TemplateView
 from django.conf.urls.static import static
 
-from annotations.urls import api
+from annotations.instrumentation import prometheus_metrics
+from annotations.storage import serve_media
+from annotations.urls import api, async_api
 from annotations.views import index
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("api/async/", async_api.urls),
     path("api/", api.urls),
+    path("metrics", prometheus_metrics, name="prometheus-metrics"),
+    re_path(
+        rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<path>.*)$",
+        serve_media,
+        name="media",
+    ),
     re_path(r"^.*$", TemplateView.as_view(template_name="index.html")),
     path("static/", TemplateView.as_view(template_name="index.html")),
     # path("", index, name="index"),